@@ -0,0 +1,76 @@
+"""
+Lexical Retrieval Benchmark
+Measures load time of the memory-mapped BM25 index and per-query retrieval latency
+(search only, and search plus shaping into retrievalResults) over EN/ES questions.
+
+    python scripts/build_lexical_index.py --skip-web
+    python benchmarks/bench_lexical.py --repeat 200
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'lambda', 'chat-lambda'))
+
+from lexical_index import LexicalIndex  # noqa: E402
+
+QUERIES = [
+    "How often can I donate blood?",
+    "What are the eligibility requirements?",
+    "What is the FDA IDA change?",
+    "Can people with alpha-gal syndrome donate blood?",
+    "How many people donate blood in the U.S.?",
+    "Is blood transfusion available on ambulances?",
+    "What tick and mosquito borne illnesses affect the blood supply?",
+    "¿Con qué frecuencia puedo donar sangre?",
+    "¿Es seguro donar sangre?",
+    "Why is donor diversity important for patients?",
+]
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--index', default=os.path.join(BACKEND_DIR, 'lambda', 'chat-lambda', 'lexical_index.bin'))
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.index):
+        sys.exit(f"{args.index} not found, build it with scripts/build_lexical_index.py")
+
+    start = time.perf_counter()
+    index = LexicalIndex(args.index)
+    load_ms = (time.perf_counter() - start) * 1000
+    print(f"index: {index.doc_count} passages, {index.term_count} terms, "
+          f"{os.path.getsize(args.index) / 1024:.0f} KiB, load {load_ms:.3f} ms")
+
+    for label, run in (('search', lambda q: index.search(q, args.k)),
+                       ('retrieve', lambda q: index.retrieve(q, args.k, 'documents-bucket'))):
+        samples = []
+        for _ in range(args.repeat):
+            for query in QUERIES:
+                start = time.perf_counter()
+                run(query)
+                samples.append((time.perf_counter() - start) * 1000)
+        print(f"{label:>9}: p50 {percentile(samples, 50):.3f} ms  p95 {percentile(samples, 95):.3f} ms  "
+              f"p99 {percentile(samples, 99):.3f} ms  mean {statistics.mean(samples):.3f} ms")
+
+    print()
+    for query in QUERIES[2:4]:
+        top = index.retrieve(query, 3, 'documents-bucket')
+        print(query)
+        for result in top:
+            print(f"  {result['score']:.2f}  {result['metadata']['source']}")
+
+
+if __name__ == '__main__':
+    main()
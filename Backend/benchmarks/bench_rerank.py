@@ -0,0 +1,67 @@
+"""
+Rerank Benchmark
+Cost of the local rerank stage against the prompt tokens it saves. Retrieval results are
+the top 20 passages of the lexical index for each question (real corpus text), with the
+lexical score standing in for the knowledge base score. Context tokens are counted with
+the chat Lambda's packer, once for all 20 results and once for the reranked ones.
+
+    python scripts/build_lexical_index.py --skip-web
+    python benchmarks/bench_rerank.py --repeat 200
+"""
+
+import argparse
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'lambda', 'chat-lambda'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_lexical import QUERIES, percentile  # noqa: E402
+from context_packer import pack_context  # noqa: E402
+from lexical_index import LexicalIndex  # noqa: E402
+from reranker import rerank  # noqa: E402
+
+# Large enough that only the rerank decides what is kept
+UNBOUNDED_BUDGET = 10 ** 6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--index', default=os.path.join(BACKEND_DIR, 'lambda', 'chat-lambda', 'lexical_index.bin'))
+    parser.add_argument('--results', type=int, default=20)
+    parser.add_argument('--top-k', type=int, default=8)
+    parser.add_argument('--budget-ms', type=float, default=3.0)
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.index):
+        sys.exit(f"{args.index} not found, build it with scripts/build_lexical_index.py")
+    index = LexicalIndex(args.index)
+
+    print(f"{'question':<58} {'kept':>5} {'raw tok':>8} {'kept tok':>9} {'saved':>6} {'p50 ms':>7} {'p95 ms':>7}")
+    total_raw = total_kept = 0
+    all_samples = []
+    for query in QUERIES:
+        results = index.retrieve(query, args.results, 'documents-bucket')
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            kept, stats = rerank(query, results, args.top_k, args.budget_ms)
+            samples.append((time.perf_counter() - start) * 1000)
+        all_samples.extend(samples)
+
+        raw_tokens = pack_context(results, UNBOUNDED_BUDGET, duplicate_threshold=1.1)['packedTokens']
+        kept_tokens = pack_context(kept, UNBOUNDED_BUDGET, duplicate_threshold=1.1)['packedTokens']
+        total_raw += raw_tokens
+        total_kept += kept_tokens
+        print(f"{query[:58]:<58} {len(kept):>2}/{len(results):<2} {raw_tokens:>8} {kept_tokens:>9} "
+              f"{(1 - kept_tokens / raw_tokens) if raw_tokens else 0:>6.0%} {percentile(samples, 50):>7.3f} {percentile(samples, 95):>7.3f}")
+
+    print(f"\ntotal: {total_raw} -> {total_kept} context tokens ({1 - total_kept / max(total_raw, 1):.0%} saved), "
+          f"rerank p50 {percentile(all_samples, 50):.3f} ms, p99 {percentile(all_samples, 99):.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
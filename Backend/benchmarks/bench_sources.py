@@ -0,0 +1,202 @@
+"""
+Source Resolution Benchmark
+Compares the single-pass resolver (source_resolver.resolve_sources) with the previous
+extract_sources implementation, reproduced below without signing or logging, over
+synthetic retrieval result sets of 20-200 results. Outputs are checked for equality.
+
+    python benchmarks/bench_sources.py --sizes 20 50 100 200 --repeat 200
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'lambda', 'chat-lambda'))
+
+import source_resolver  # noqa: E402
+from source_resolver import resolve_sources  # noqa: E402
+
+PDF_DIR = os.path.join(BACKEND_DIR, 'data-sources', 'pdfs')
+WEB_PATHS = [
+    'news/', 'news/page/{n}/', 'news/paged-{n}/5/', 'for-donors/', 'for-donors/page/{n}/',
+    'for-donors/americas-blood-supply/', 'one-pagers-faqs/', 'one-pagers-faqs/p{n}/',
+    'newsroom/', 'newsroom/?page={n}', 'blog/post-{n}/', 'category/updates/page/{n}/',
+]
+
+
+def legacy_normalize_paginated_url(url):
+    if not url:
+        return url
+    pagination_patterns = [
+        r'/paged-\d+/\d+/?$', r'/page/\d+/?$', r'/p\d+/?$',
+        r'\?page=\d+', r'&page=\d+', r'\?p=\d+', r'&p=\d+',
+    ]
+    normalized_url = url
+    for pattern in pagination_patterns:
+        normalized_url = re.sub(pattern, '', normalized_url)
+    normalized_url = normalized_url.rstrip('/')
+    if normalized_url and not normalized_url.endswith(('.html', '.htm', '.php', '.aspx')):
+        normalized_url += '/'
+    return normalized_url
+
+
+def legacy_get_normalized_title(normalized_url, original_title):
+    if not normalized_url:
+        return original_title
+    try:
+        from urllib.parse import urlparse
+        path = urlparse(normalized_url).path.strip('/')
+        if '/news' in path:
+            return "America's Blood Centers - News"
+        elif '/for-donors' in path:
+            return "America's Blood Centers - For Donors"
+        elif '/one-pagers-faqs' in path:
+            return "America's Blood Centers - FAQs"
+        elif '/newsroom' in path:
+            return "America's Blood Centers - Newsroom"
+        else:
+            if 'Page' in original_title and any(char.isdigit() for char in original_title):
+                clean_title = re.sub(r'\s*-?\s*Page\s*\d+.*$', '', original_title, flags=re.IGNORECASE)
+                return clean_title.strip() or original_title
+            return original_title
+    except Exception:
+        return original_title
+
+
+def legacy_extract_sources(context_results):
+    sources = []
+    for result in context_results:
+        location = result.get('location', {})
+        metadata = result.get('metadata', {})
+        source_url = None
+        source_title = None
+        if 's3Location' in location:
+            s3_uri = location['s3Location'].get('uri', '')
+            if s3_uri:
+                source_url = s3_uri
+                filename = s3_uri.split('/')[-1] if '/' in s3_uri else s3_uri
+                source_title = filename.replace('.pdf', '')
+        elif 'webLocation' in location:
+            source_url = location['webLocation'].get('url', '')
+            source_title = metadata.get('title', metadata.get('source', 'Web Page'))
+        if not source_url:
+            source_url = (metadata.get('x-amz-bedrock-kb-source-uri') or metadata.get('source') or
+                          metadata.get('uri') or metadata.get('url', ''))
+            if source_url and 's3://' in source_url:
+                filename = source_url.split('/')[-1] if '/' in source_url else source_url
+                source_title = filename.replace('.pdf', '')
+            else:
+                source_title = metadata.get('title', metadata.get('source', 'Document'))
+        if source_url:
+            normalized_url = legacy_normalize_paginated_url(source_url)
+            is_document = any(ext in source_url.lower() for ext in ['.pdf', '.docx', '.txt']) or 's3://' in source_url
+            accessible_url = source_url if source_url.startswith('s3://') else normalized_url
+            if normalized_url != source_url:
+                source_title = legacy_get_normalized_title(normalized_url, source_title)
+            sources.append({
+                "title": source_title or f"Source {len(sources) + 1}",
+                "url": accessible_url,
+                "uri": source_url,
+                "type": "DOCUMENT" if is_document else "WEB",
+                "score": result.get('score', 0)
+            })
+
+    unique_sources = []
+    seen_documents = {}
+    for source in sorted(sources, key=lambda x: x.get('score', 0), reverse=True):
+        if 's3://' in source['uri'] or 'amazonaws.com' in source['url']:
+            if 's3://' in source['uri']:
+                doc_key = source['uri'].split('/')[-1].lower()
+            else:
+                doc_key = source['url'].split('/')[-1].split('?')[0].lower()
+        else:
+            normalized_url = legacy_normalize_paginated_url(source['url'])
+            try:
+                from urllib.parse import urlparse
+                parsed = urlparse(normalized_url)
+                doc_key = f"{parsed.netloc}{parsed.path}".lower().rstrip('/')
+            except Exception:
+                doc_key = normalized_url.lower()
+        if doc_key and doc_key not in seen_documents:
+            unique_sources.append(source)
+            seen_documents[doc_key] = source
+        elif doc_key and doc_key in seen_documents:
+            existing_source = seen_documents[doc_key]
+            is_current_public = not ('amazonaws.com' in source['url'] or 's3://' in source['uri'])
+            is_existing_s3 = 'amazonaws.com' in existing_source['url'] or 's3://' in existing_source['uri']
+            if is_current_public and is_existing_s3:
+                for i, us in enumerate(unique_sources):
+                    if us == existing_source:
+                        unique_sources[i] = source
+                        seen_documents[doc_key] = source
+                        break
+    return unique_sources
+
+
+def synthetic_results(rng, pdf_names, count):
+    """
+    Mix of S3 PDF chunks, paginated web pages and metadata-only results with many duplicates
+    """
+    results = []
+    for _ in range(count):
+        kind = rng.random()
+        score = round(rng.random(), 6)
+        if kind < 0.4:
+            results.append({'location': {'s3Location': {'uri': f's3://docs/pdfs/{rng.choice(pdf_names)}'}},
+                            'metadata': {}, 'score': score})
+        elif kind < 0.9:
+            path = rng.choice(WEB_PATHS).format(n=rng.randint(2, 9))
+            results.append({'location': {'webLocation': {'url': f'https://americasblood.org/{path}'}},
+                            'metadata': {'title': f'Blood News - Page {rng.randint(2, 9)}'}, 'score': score})
+        else:
+            results.append({'location': {}, 'metadata': {'x-amz-bedrock-kb-source-uri': f's3://docs/{rng.randint(1, 30)}.txt'},
+                            'score': score})
+    return results
+
+
+def timed(fn, result_sets, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for results in result_sets:
+            fn(results)
+    return (time.perf_counter() - start) * 1e6 / (repeat * len(result_sets))
+
+
+def resolve_cold(results):
+    """
+    Resolver with the per-URL memo cleared first, i.e. the first request in a fresh container
+    """
+    source_resolver._analyze_url.cache_clear()
+    return resolve_sources(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20, 50, 100, 200])
+    parser.add_argument('--sets', type=int, default=20, help='distinct result sets per size')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=11)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pdf_names = sorted(name for name in os.listdir(PDF_DIR) if name.endswith('.pdf'))
+
+    print(f"{'results':>8} {'legacy us':>10} {'cold us':>9} {'warm us':>9} {'speedup':>8}  equal")
+    for size in args.sizes:
+        result_sets = [synthetic_results(rng, pdf_names, size) for _ in range(args.sets)]
+        equal = all(
+            legacy_extract_sources(results) == [source.to_dict() for source in resolve_sources(results)]
+            for results in result_sets
+        )
+        legacy = timed(legacy_extract_sources, result_sets, args.repeat)
+        cold = timed(resolve_cold, result_sets, args.repeat)
+        warm = timed(resolve_sources, result_sets, args.repeat)
+        print(f"{size:>8} {legacy:>10.1f} {cold:>9.1f} {warm:>9.1f} {legacy / warm:>7.1f}x  {equal}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""
+Answer Cache
+Two-tier answer cache (in-process LRU + shared DynamoDB table) for the chat Lambda.
+Entries are stamped with a cache generation that is bumped whenever a knowledge base
+ingestion job ends (see cache_generation), so answers generated before a sync stop being
+served once a container sees the new generation.
+
+Containers re-read the generation instead of being told about it, which bounds how long
+a warm container may still serve pre-sync answers after the bump: pending_check_seconds
+(default 5) while it knows an ingestion job is in flight, generation_check_seconds
+(default 30) for a job it had not seen start yet.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from cache_generation import GENERATION_KEY, TERMINAL_JOB_STATUSES, complete_ingestion_job
+
+# Configure logging
+logger = logging.getLogger()
+
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+_EDGE_PUNCTUATION = ' ?!.,;:¿¡"\''
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalize a question so trivial variations (case, spacing, punctuation) share a cache entry
+    """
+    if not question:
+        return ''
+    return _WHITESPACE_PATTERN.sub(' ', question.casefold()).strip(_EDGE_PUNCTUATION)
+
+
+def make_cache_key(question: str, language: str) -> str:
+    """
+    Build the cache key from the normalized question and the response language
+    """
+    digest = hashlib.sha256(f"{language}\n{normalize_question(question)}".encode('utf-8')).hexdigest()
+    return f"answer#{digest}"
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU map with per-entry expiry, kept across warm invocations
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry['expires_at'] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class AnswerCache:
+    """
+    Answer cache keyed by normalized question plus language.
+
+    Lookups go to the in-process LRU first, then to the shared DynamoDB table. Both tiers
+    only return entries stamped with the current generation. The generation is read from
+    the table at most once every generation_check_seconds, or every pending_check_seconds
+    while ingestion jobs are pending. The status of pending jobs is polled at most once
+    every generation_check_seconds, so completion is noticed even when nobody else is
+    watching the job (daily sync, admin-triggered sync).
+    """
+
+    def __init__(self, table: Any, ttl_seconds: int = 86400, max_entries: int = 256,
+                 generation_check_seconds: int = 30, bedrock_agent: Any = None,
+                 knowledge_base_id: Optional[str] = None, pending_check_seconds: int = 5):
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.generation_check_seconds = generation_check_seconds
+        self.pending_check_seconds = pending_check_seconds
+        self.bedrock_agent = bedrock_agent
+        self.knowledge_base_id = knowledge_base_id
+        self.local = LRUCache(max_entries)
+        self._generation: Optional[int] = None
+        self._generation_checked_at = 0.0
+        self._jobs_pending = False
+        self._jobs_polled_at = 0.0
+
+    def current_generation(self, refresh: bool = False) -> Optional[int]:
+        """
+        Get the current cache generation, or None if it cannot be determined (cache is bypassed).
+        refresh skips the locally remembered value and reads the table.
+        """
+        now = time.time()
+        check_seconds = self.pending_check_seconds if self._jobs_pending else self.generation_check_seconds
+        if (not refresh and self._generation is not None
+                and now - self._generation_checked_at < check_seconds):
+            return self._generation
+
+        try:
+            item = self.table.get_item(Key={'cache_key': GENERATION_KEY}).get('Item') or {}
+            generation = int(item.get('generation', 0))
+            pending_jobs = list(item.get('pending_jobs') or [])
+            self._jobs_pending = bool(pending_jobs)
+
+            if pending_jobs and (refresh or now - self._jobs_polled_at >= self.generation_check_seconds):
+                self._jobs_polled_at = now
+                for job_ref in pending_jobs:
+                    new_generation = self._complete_if_finished(job_ref)
+                    if new_generation is not None:
+                        generation = max(generation, new_generation)
+        except Exception as e:
+            logger.error(f"Could not read answer cache generation: {str(e)}")
+            return None
+
+        if generation != self._generation:
+            if self._generation is not None:
+                logger.info(f"Answer cache generation changed {self._generation} -> {generation}, clearing local tier")
+            self.local.clear()
+            self._generation = generation
+        self._generation_checked_at = now
+        return generation
+
+    def _complete_if_finished(self, job_ref: str) -> Optional[int]:
+        """
+        Poll a pending ingestion job and complete it if it reached a terminal status
+        """
+        if not self.bedrock_agent or ':' not in job_ref:
+            return None
+
+        data_source_id, job_id = job_ref.split(':', 1)
+        try:
+            response = self.bedrock_agent.get_ingestion_job(
+                knowledgeBaseId=self.knowledge_base_id,
+                dataSourceId=data_source_id,
+                ingestionJobId=job_id
+            )
+            status = response.get('ingestionJob', {}).get('status', 'UNKNOWN')
+        except Exception as e:
+            logger.error(f"Could not check ingestion job {job_ref}: {str(e)}")
+            return None
+
+        if status not in TERMINAL_JOB_STATUSES:
+            return None
+        return complete_ingestion_job(self.table, data_source_id, job_id, status)
+
+    def lookup(self, question: str, language: str) -> Tuple[Optional[Dict[str, Any]], Optional[str], Optional[int]]:
+        """
+        Look up an answer. Returns (entry, tier, generation) where tier is 'memory', 'dynamodb' or None.
+        The generation must be passed back to store() so answers computed across a sync are discarded.
+        """
+        generation = self.current_generation()
+        if generation is None:
+            return None, None, None
+
+        key = make_cache_key(question, language)
+
+        entry = self.local.get(key)
+        if entry and entry['generation'] == generation:
+            return entry, 'memory', generation
+
+        try:
+            item = self.table.get_item(Key={'cache_key': key}).get('Item')
+        except Exception as e:
+            logger.error(f"Answer cache read failed: {str(e)}")
+            return None, None, generation
+
+        if not item or int(item.get('generation', -1)) != generation or int(item.get('ttl', 0)) <= time.time():
+            return None, None, generation
+
+        entry = {
+            'answer': item.get('answer', ''),
+            'sources': json.loads(item.get('sources_json', '[]')),
+            'retrievalResults': int(item.get('retrieval_results', 0)),
+            'generation': generation,
+            'expires_at': int(item['ttl'])
+        }
+        self.local.put(key, entry)
+        return entry, 'dynamodb', generation
+
+    def store(self, question: str, language: str, answer: str, sources: List[Dict[str, Any]],
+              retrieval_results: int, generation: Optional[int]) -> None:
+        """
+        Store an answer in both tiers, stamped with the generation it was computed under
+        """
+        if generation is None or generation != self._generation:
+            # A sync completed while this answer was being generated
+            return
+
+        key = make_cache_key(question, language)
+        expires_at = int(time.time()) + self.ttl_seconds
+        entry = {
+            'answer': answer,
+            'sources': sources,
+            'retrievalResults': retrieval_results,
+            'generation': generation,
+            'expires_at': expires_at
+        }
+        self.local.put(key, entry)
+
+        try:
+            self.table.put_item(Item={
+                'cache_key': key,
+                'question': normalize_question(question),
+                'language': language,
+                'answer': answer,
+                'sources_json': json.dumps(sources),
+                'retrieval_results': retrieval_results,
+                'generation': generation,
+                'ttl': expires_at
+            })
+        except Exception as e:
+            logger.error(f"Answer cache write failed: {str(e)}")
@@ -0,0 +1,94 @@
+"""
+AWS Clients
+Lazily created, memoized boto3 clients and DynamoDB tables for the chat Lambda. Nothing is
+built at import: a proxy creates its client on first use and keeps it for the life of the
+container, so health checks and CORS preflights never pay for client construction.
+Construction times are recorded for the cold-start report.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Any, Callable, Optional
+
+import boto3
+from botocore.config import Config
+
+# Configure logging
+logger = logging.getLogger()
+
+# Milliseconds spent building each client, in creation order
+init_timings: Dict[str, float] = {}
+
+# boto3's default session is not safe to build clients from concurrently; re-entrant
+# because a table is built from the (lazy) DynamoDB resource
+_lock = threading.RLock()
+
+
+class LazyClient:
+    """
+    Stand-in for a boto3 client, resource or table that builds it on first attribute access
+    """
+    __slots__ = ('_name', '_factory', '_target')
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self._name = name
+        self._factory = factory
+        self._target = None
+
+    def resolve(self) -> Any:
+        """
+        The underlying object, created on the first call
+        """
+        if self._target is None:
+            with _lock:
+                if self._target is None:
+                    started = time.perf_counter()
+                    self._target = self._factory()
+                    init_timings[self._name] = round((time.perf_counter() - started) * 1000, 2)
+                    logger.info(f"Initialized {self._name} in {init_timings[self._name]} ms")
+        return self._target
+
+    @property
+    def initialized(self) -> bool:
+        return self._target is not None
+
+    @property
+    def available(self) -> bool:
+        """
+        Whether the object can be built; False (logged) when construction fails, e.g. a
+        table handle without a configured name
+        """
+        try:
+            self.resolve()
+            return True
+        except Exception as e:
+            logger.error(f"Could not initialize {self._name}: {str(e)}")
+            return False
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.resolve(), attr)
+
+    def __repr__(self) -> str:
+        return f"LazyClient({self._name!r}, initialized={self.initialized})"
+
+
+def client(service_name: str, config: Optional[Config] = None) -> LazyClient:
+    """
+    Lazy boto3 client for a service
+    """
+    return LazyClient(service_name, lambda: boto3.client(service_name, config=config))
+
+
+def resource(service_name: str, config: Optional[Config] = None) -> LazyClient:
+    """
+    Lazy boto3 resource for a service
+    """
+    return LazyClient(f"{service_name} resource", lambda: boto3.resource(service_name, config=config))
+
+
+def table(dynamodb: LazyClient, table_name: str) -> LazyClient:
+    """
+    Lazy Table handle on a (lazy) DynamoDB resource
+    """
+    return LazyClient(f"table {table_name}", lambda: dynamodb.Table(table_name))
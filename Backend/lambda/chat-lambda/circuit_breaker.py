@@ -0,0 +1,222 @@
+"""
+Circuit Breaker
+Per-dependency circuit breakers for the chat Lambda (knowledge base retrieve, model
+invocation, DynamoDB writes). While a dependency keeps failing, calls to it fail fast with
+CircuitOpen so requests fall back right away instead of adding load to a throttled service.
+
+    closed     calls pass; failure_threshold failures within window_seconds open the breaker
+    open       calls fail fast until cooldown_seconds have passed
+    half-open  one probe call is let through; success closes the breaker, failure reopens it
+
+State is kept per container and shared through one item per breaker in the answer cache
+table (cache_key 'breaker#<name>'): a container that opens a breaker publishes it, the
+others pick it up within sync_seconds, and a conditional write makes sure only one
+container probes at a time. Without a table the breakers work per container.
+
+Shared state is read and published on a background thread (stale-while-revalidate), so
+allow() never waits on DynamoDB while holding the breaker lock; only the rare probe claim
+at the end of a cooldown is a request-path call, and it is made outside the lock. A
+container that loses the claim stays open for another sync_seconds rather than claiming
+again on every call.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Optional
+
+# Configure logging
+logger = logging.getLogger()
+
+BREAKER_KEY_PREFIX = 'breaker#'
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# One worker keeps each breaker's publishes in order
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='breaker')
+
+
+class CircuitOpen(Exception):
+    """
+    The dependency's breaker is open; the call was not made
+    """
+
+    def __init__(self, name: str):
+        super().__init__(f"circuit {name} is open")
+        self.name = name
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one dependency, optionally shared across containers through DynamoDB
+    """
+
+    def __init__(self, name: str, table: Any = None, failure_threshold: int = 5, window_seconds: float = 30,
+                 cooldown_seconds: float = 30, sync_seconds: float = 5,
+                 is_failure: Optional[Callable[[Exception], bool]] = None,
+                 clock: Callable[[], float] = time.time):
+        self.name = name
+        self.table = table
+        self.failure_threshold = failure_threshold
+        self.window_seconds = window_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.sync_seconds = sync_seconds
+        self.is_failure = is_failure or (lambda error: True)
+        self._clock = clock
+        self._key = f"{BREAKER_KEY_PREFIX}{name}"
+        self._lock = threading.Lock()
+        self._failures: Deque[float] = deque()
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.opened_until = 0.0
+        self._synced_at = float('-inf')
+        self._refreshing = False
+
+    def _refresh(self) -> None:
+        """
+        Read the shared state (background thread) and adopt it under the lock
+        """
+        item = None
+        try:
+            item = self.table.get_item(Key={'cache_key': self._key}).get('Item')
+        except Exception as e:
+            logger.warning(f"Could not read shared state of circuit {self.name}: {str(e)}")
+        with self._lock:
+            self._refreshing = False
+            if item:
+                self._adopt(item)
+
+    def _adopt(self, item: Any) -> None:
+        """
+        Adopt the shared state when another container opened or closed the breaker
+        """
+        updated_at = float(item.get('updated_at', 0))
+        if item.get('state') == OPEN and float(item.get('opened_until', 0)) > self.opened_until:
+            self.state = OPEN
+            self.opened_at = updated_at
+            self.opened_until = float(item['opened_until'])
+            self._failures.clear()
+            logger.warning(f"Circuit {self.name} opened by another container")
+        elif item.get('state') == CLOSED and self.state == OPEN and updated_at > self.opened_at:
+            self.state = CLOSED
+            logger.info(f"Circuit {self.name} closed by another container")
+
+    def _publish(self, now: float) -> None:
+        """
+        Share the current state; called under the lock, written in the background
+        """
+        if self.table:
+            _executor.submit(self._write_shared, self.state, self.opened_until, now)
+
+    def _write_shared(self, state: str, opened_until: float, now: float) -> None:
+        try:
+            self.table.put_item(Item={
+                'cache_key': self._key,
+                'state': state,
+                'opened_until': int(opened_until),
+                'updated_at': int(now)
+            })
+        except Exception as e:
+            logger.warning(f"Could not publish state of circuit {self.name}: {str(e)}")
+
+    def _claim_probe(self, now: float) -> bool:
+        """
+        Make this container the only one probing until the next cooldown ends. If the
+        table cannot be reached the container probes on its own.
+        """
+        if not self.table:
+            return True
+        try:
+            self.table.update_item(
+                Key={'cache_key': self._key},
+                UpdateExpression='SET probe_until = :until',
+                ConditionExpression='attribute_not_exists(probe_until) OR probe_until < :now',
+                ExpressionAttributeValues={':until': int(now + self.cooldown_seconds), ':now': int(now)}
+            )
+            return True
+        except self.table.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+        except Exception as e:
+            logger.warning(f"Could not claim probe of circuit {self.name}: {str(e)}")
+            return True
+
+    def _open(self, now: float) -> None:
+        self.state = OPEN
+        self.opened_at = now
+        self.opened_until = now + self.cooldown_seconds
+        self._failures.clear()
+        logger.warning(f"Circuit {self.name} opened for {self.cooldown_seconds:.0f} s")
+        self._publish(now)
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go out now. Once the cooldown is over the first caller gets to
+        probe (half-open); everyone else keeps failing fast until the probe reports back.
+        Decides from local state; a due shared-state refresh is started in the background.
+        """
+        with self._lock:
+            now = self._clock()
+            if self.table and not self._refreshing and now - self._synced_at >= self.sync_seconds:
+                self._synced_at = now
+                self._refreshing = True
+                _executor.submit(self._refresh)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN or now < self.opened_until:
+                return False
+            # Half-open locally first, so other threads fail fast while the claim is made
+            self.state = HALF_OPEN
+
+        if not self._claim_probe(now):
+            with self._lock:
+                if self.state == HALF_OPEN:
+                    # Another container is probing; its result arrives through the shared
+                    # state, so do not try to claim again before the next refresh
+                    self.state = OPEN
+                    self.opened_until = now + self.sync_seconds
+            return False
+        logger.info(f"Circuit {self.name} half-open, probing")
+        return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                self.state = CLOSED
+                self._failures.clear()
+                logger.info(f"Circuit {self.name} closed")
+                self._publish(self._clock())
+
+    def record_failure(self) -> None:
+        with self._lock:
+            now = self._clock()
+            if self.state == HALF_OPEN:
+                self._open(now)
+                return
+            self._failures.append(now)
+            while self._failures and self._failures[0] < now - self.window_seconds:
+                self._failures.popleft()
+            if self.state == CLOSED and len(self._failures) >= self.failure_threshold:
+                self._open(now)
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Call fn through the breaker. Raises CircuitOpen without calling fn while open.
+        Errors the is_failure predicate rejects (e.g. a validation error) count as success,
+        since the dependency did answer.
+        """
+        if not self.allow():
+            raise CircuitOpen(self.name)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+        return result
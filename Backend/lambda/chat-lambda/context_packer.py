@@ -0,0 +1,123 @@
+"""
+Context Packer
+Turns Bedrock retrieval results into the prompt context under a token budget. Chunks are
+packed in the rerank order they arrive in, near-duplicates of already packed chunks (the
+same article repeated across paginated listing pages, overlapping PDF chunks) are
+dropped, and packing stops adding chunks once the budget is used up.
+"""
+
+import logging
+import re
+from typing import Dict, Any, List, Set
+
+# Configure logging
+logger = logging.getLogger()
+
+# Rough characters-per-token ratio for Claude tokenizers on English/Spanish prose
+CHARS_PER_TOKEN = 4
+
+# Word n-gram size used for near-duplicate detection
+SHINGLE_SIZE = 5
+
+_WORD_PATTERN = re.compile(r'\w+')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (no tokenizer is available in the Lambda runtime)
+    """
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def shingles(text: str) -> Set[int]:
+    """
+    Hashed word n-grams of a chunk; short chunks fall back to their individual words
+    """
+    words = _WORD_PATTERN.findall(text.casefold())
+    if len(words) < SHINGLE_SIZE:
+        return {hash(word) for word in words}
+    return {hash(tuple(words[i:i + SHINGLE_SIZE])) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def resemblance(a: Set[int], b: Set[int]) -> float:
+    """
+    Jaccard similarity of two shingle sets
+    """
+    if not a or not b:
+        return 0.0
+    intersection = len(a & b)
+    return intersection / (len(a) + len(b) - intersection)
+
+
+def format_chunk(position: int, content: str) -> str:
+    return f"Context {position}: {content}"
+
+
+def pack_context(context_results: List[Dict[str, Any]], token_budget: int,
+                 duplicate_threshold: float = 0.8) -> Dict[str, Any]:
+    """
+    Pack retrieval results into context text.
+
+    Packing keeps the rerank order: chunks are considered in input order, never re-sorted
+    by their retrieval score. A chunk is skipped when its resemblance to a packed chunk
+    reaches duplicate_threshold, or when it does not fit in what is left of token_budget
+    (smaller chunks further down may still fit). If even the first chunk exceeds the
+    budget it is truncated so the prompt is never empty when context exists.
+
+    Returns the text plus rawTokens (what concatenating every chunk would have cost),
+    packedTokens, chunksUsed, duplicatesRemoved and overBudget counts.
+    """
+    contents = [result.get('content', {}).get('text', '') for result in context_results]
+    raw_tokens = estimate_tokens("\n\n".join(
+        format_chunk(i, content) for i, content in enumerate(contents, 1) if content
+    ))
+
+    candidates = [content for content in contents if content]
+
+    packed_parts: List[str] = []
+    packed_shingles: List[Set[int]] = []
+    packed_tokens = 0
+    duplicates = 0
+    over_budget = 0
+    separator_tokens = estimate_tokens("\n\n")
+
+    for content in candidates:
+        remaining = token_budget - packed_tokens - (separator_tokens if packed_parts else 0)
+        part = format_chunk(len(packed_parts) + 1, content)
+        part_tokens = estimate_tokens(part)
+
+        if part_tokens > remaining and packed_parts:
+            over_budget += 1
+            continue
+
+        chunk_shingles = shingles(content)
+        if any(resemblance(chunk_shingles, seen) >= duplicate_threshold for seen in packed_shingles):
+            duplicates += 1
+            continue
+
+        if part_tokens > remaining:
+            part = part[:max(remaining, 0) * CHARS_PER_TOKEN]
+            part_tokens = estimate_tokens(part)
+
+        if packed_parts:
+            packed_tokens += separator_tokens
+        packed_parts.append(part)
+        packed_shingles.append(chunk_shingles)
+        packed_tokens += part_tokens
+
+    text = "\n\n".join(packed_parts)
+    packed_tokens = estimate_tokens(text)
+
+    logger.info(f"Packed {len(packed_parts)}/{len(candidates)} context chunks: ~{packed_tokens} of ~{raw_tokens} tokens "
+                f"({duplicates} near-duplicates, {over_budget} over budget)")
+
+    return {
+        'text': text,
+        'rawTokens': raw_tokens,
+        'packedTokens': packed_tokens,
+        'chunksUsed': len(packed_parts),
+        'duplicatesRemoved': duplicates,
+        'overBudget': over_budget
+    }
@@ -0,0 +1,186 @@
+"""
+Conversation Pages
+Key-based cursor pagination over the chat history table. Pages are read with Query
+against the date-partitioned GSIs, newest first, so the cost of a page depends on the
+page size and the number of days walked, not on the size of the table.
+"""
+
+import base64
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger()
+
+DATE_INDEX = 'date-timestamp-index'
+DATE_LANGUAGE_INDEX = 'date-language-timestamp-index'
+
+# Chat history items expire after 90 days, so no day partition older than this can hold data
+RETENTION_DAYS = 90
+
+# Number of day partitions queried concurrently while filling a page
+DAY_FANOUT = 7
+
+
+def date_language_key(date: str, language: str) -> str:
+    """
+    Partition key of the date-language-timestamp-index GSI
+    """
+    return f"{date}#{language}"
+
+
+def resolve_day_range(date_filter: Optional[str] = None, start_date: Optional[str] = None,
+                      end_date: Optional[str] = None, today: Optional[datetime] = None) -> List[str]:
+    """
+    Resolve the requested date range into day partitions, newest first.
+    date_filter may be a full day (YYYY-MM-DD) or a prefix such as YYYY-MM.
+    Raises ValueError for malformed dates.
+    """
+    today = (today or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+    oldest = today - timedelta(days=RETENTION_DAYS)
+
+    first = datetime.strptime(start_date, '%Y-%m-%d') if start_date else oldest
+    last = datetime.strptime(end_date, '%Y-%m-%d') if end_date else today
+    first, last = max(first, oldest), min(last, today)
+
+    days = []
+    day = last
+    while day >= first:
+        days.append(day.strftime('%Y-%m-%d'))
+        day -= timedelta(days=1)
+
+    if date_filter:
+        days = [d for d in days if d.startswith(date_filter)]
+    return days
+
+
+def encode_cursor(direction: str, item: Dict[str, Any]) -> str:
+    """
+    Build an opaque cursor pointing just past the given item in the given direction
+    """
+    payload = {
+        'd': direction,
+        'date': item['date'],
+        'ts': item['timestamp'],
+        'id': item['conversation_id']
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str) -> Dict[str, str]:
+    """
+    Decode a cursor produced by encode_cursor. Raises ValueError for invalid tokens.
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if payload['d'] not in ('next', 'prev'):
+            raise ValueError(payload['d'])
+        return {'d': payload['d'], 'date': payload['date'], 'ts': payload['ts'], 'id': payload['id']}
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {str(e)}")
+
+
+def _query_day(table: Any, day: str, language: Optional[str], limit: int, forward: bool,
+               cursor: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """
+    Read up to limit items from a single day partition in timestamp order
+    """
+    if language:
+        partition_value = date_language_key(day, language)
+        query_params = {
+            'IndexName': DATE_LANGUAGE_INDEX,
+            'KeyConditionExpression': 'date_language = :pk',
+            'ExpressionAttributeValues': {':pk': partition_value}
+        }
+        partition_name = 'date_language'
+    else:
+        partition_value = day
+        query_params = {
+            'IndexName': DATE_INDEX,
+            'KeyConditionExpression': '#date = :pk',
+            'ExpressionAttributeNames': {'#date': 'date'},
+            'ExpressionAttributeValues': {':pk': day}
+        }
+        partition_name = 'date'
+
+    query_params['ScanIndexForward'] = forward
+    if cursor:
+        query_params['ExclusiveStartKey'] = {
+            partition_name: partition_value,
+            'timestamp': cursor['ts'],
+            'conversation_id': cursor['id']
+        }
+
+    items = []
+    while len(items) < limit:
+        query_params['Limit'] = limit - len(items)
+        response = table.query(**query_params)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return items
+
+
+def query_conversation_page(table: Any, days: List[str], limit: int, language: Optional[str] = None,
+                            cursor: Optional[Dict[str, str]] = None) -> Tuple[List[Dict[str, Any]], Optional[str], Optional[str]]:
+    """
+    Read one page of conversations, newest first.
+
+    days must be newest first (see resolve_day_range). Day partitions are walked in order
+    and queried DAY_FANOUT at a time in parallel; because days partition time, concatenating
+    the per-day results in day order is already globally sorted. One extra item is read to
+    know whether another page exists.
+
+    Returns (items, next_cursor, prev_cursor).
+    """
+    direction = cursor['d'] if cursor else 'next'
+    forward = direction == 'prev'
+    ordered_days = list(reversed(days)) if forward else list(days)
+
+    start = 0
+    if cursor:
+        if cursor['date'] not in ordered_days:
+            raise ValueError("Cursor does not belong to the requested date range")
+        start = ordered_days.index(cursor['date'])
+
+    wanted = limit + 1
+    collected: List[Dict[str, Any]] = []
+
+    with ThreadPoolExecutor(max_workers=DAY_FANOUT) as pool:
+        position = start
+        while position < len(ordered_days) and len(collected) < wanted:
+            window = ordered_days[position:position + DAY_FANOUT]
+            remaining = wanted - len(collected)
+            futures = [
+                pool.submit(_query_day, table, day, language, remaining, forward,
+                            cursor if cursor and day == cursor['date'] else None)
+                for day in window
+            ]
+            for future in futures:
+                collected.extend(future.result())
+                if len(collected) >= wanted:
+                    break
+            position += DAY_FANOUT
+
+    has_more = len(collected) > limit
+    page = collected[:limit]
+    if forward:
+        page.reverse()
+
+    if not page:
+        return page, None, None
+
+    if direction == 'next':
+        next_cursor = encode_cursor('next', page[-1]) if has_more else None
+        prev_cursor = encode_cursor('prev', page[0]) if cursor else None
+    else:
+        next_cursor = encode_cursor('next', page[-1])
+        prev_cursor = encode_cursor('prev', page[0]) if has_more else None
+
+    logger.info(f"Read conversation page of {len(page)} items from {len(ordered_days) - start} candidate days")
+    return page, next_cursor, prev_cursor
@@ -0,0 +1,351 @@
+"""
+Conversation Stats
+Pre-aggregated chat history counters for the admin dashboard. Every persisted
+conversation increments counters on a per-day item and a per-day-per-language item in
+one transaction, so totals and time series are answered in O(days) reads instead of O(items).
+
+Counter items (stat_key):
+- day#YYYY-MM-DD            conversations, sessions, language_<lang>, source_type_<TYPE>,
+                            usage#<model>#<lang>#<metric>
+- day#YYYY-MM-DD#lang#<lang> conversations, sessions, source_type_<TYPE>
+Markers make the counting idempotent: conversation#<id>#<timestamp> is written in the
+same transaction as the counter updates, and session#... keeps the distinct-session
+counters distinct per day.
+
+Model token usage is only counted on the day item, keyed by model and language, so one
+read per day answers the usage report for every model/language pair.
+"""
+
+import logging
+import re
+import time
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger()
+
+# Aggregates outlive the 90-day chat history so trends stay visible
+STATS_TTL_DAYS = 400
+# Markers outlive the 90-day chat history, so recounting any stored conversation is a no-op
+MARKER_TTL_DAYS = 91
+
+_ATTRIBUTE_SAFE_PATTERN = re.compile(r'[^A-Za-z0-9_]')
+
+# Usage counters per model and language: conversation item usage field -> counter metric
+USAGE_METRICS = {
+    'input_tokens': 'input_tokens',
+    'output_tokens': 'output_tokens',
+    'cache_read_input_tokens': 'cache_read_tokens',
+    'cache_write_input_tokens': 'cache_write_tokens',
+    'generate_ms': 'generate_ms'
+}
+USAGE_PREFIX = 'usage#'
+
+# On-demand USD prices per million tokens (input, output, cache read, cache write), matched
+# by model family so regional and global inference profiles share a price
+DEFAULT_MODEL_PRICES = {
+    'claude-sonnet-4-5': {'input': 3.0, 'output': 15.0, 'cacheRead': 0.30, 'cacheWrite': 3.75},
+    'claude-haiku-4-5': {'input': 1.0, 'output': 5.0, 'cacheRead': 0.10, 'cacheWrite': 1.25}
+}
+
+
+def day_key(date: str, language: Optional[str] = None) -> str:
+    """
+    Key of the counter item for a day, optionally narrowed to one language
+    """
+    return f"day#{date}#lang#{language}" if language else f"day#{date}"
+
+
+def _counter_name(prefix: str, value: str) -> str:
+    return f"{prefix}_{_ATTRIBUTE_SAFE_PATTERN.sub('_', value or 'unknown')}"
+
+
+def _usage_counter(model: str, language: str, metric: str) -> str:
+    # '#' separates the parts; model IDs and language codes never contain it
+    return f"{USAGE_PREFIX}{model.replace('#', '_')}#{language.replace('#', '_')}#{metric}"
+
+
+def _counter_update(table_name: str, key: str, counters: Dict[str, int], expires_at: int) -> Dict[str, Any]:
+    """
+    Transaction item adding counter deltas to a single aggregate item
+    """
+    names = {'#ttl': 'ttl'}
+    values = {':ttl': expires_at}
+    clauses = []
+    for i, (name, delta) in enumerate(sorted(counters.items())):
+        if not delta:
+            continue
+        names[f"#c{i}"] = name
+        values[f":c{i}"] = delta
+        clauses.append(f"#c{i} :c{i}")
+
+    return {'Update': {
+        'TableName': table_name,
+        'Key': {'stat_key': key},
+        'UpdateExpression': f"ADD {', '.join(clauses)} SET #ttl = :ttl",
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': values
+    }}
+
+
+def _marker_put(table_name: str, marker_key: str, expires_at: int) -> Dict[str, Any]:
+    """
+    Transaction item writing a marker that must not exist yet
+    """
+    return {'Put': {
+        'TableName': table_name,
+        'Item': {'stat_key': marker_key, 'ttl': expires_at},
+        'ConditionExpression': 'attribute_not_exists(stat_key)'
+    }}
+
+
+def _conversation_counters(item: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+    """
+    Counter deltas of one conversation, by aggregate item
+    """
+    date = item['date']
+    language = item.get('language', 'en')
+    day = day_key(date)
+    deltas: Dict[str, Dict[str, int]] = {day: defaultdict(int), day_key(date, language): defaultdict(int)}
+
+    for counters in deltas.values():
+        counters['conversations'] += 1
+        for source in item.get('sources', []):
+            counters[_counter_name('source_type', source.get('type', 'WEB'))] += 1
+    deltas[day][_counter_name('language', language)] += 1
+
+    usage = item.get('usage')
+    if usage and usage.get('model'):
+        deltas[day][_usage_counter(usage['model'], language, 'requests')] += 1
+        for field, metric in USAGE_METRICS.items():
+            deltas[day][_usage_counter(usage['model'], language, metric)] += int(usage.get(field, 0) or 0)
+    return deltas
+
+
+def _record_conversation(stats_table: Any, item: Dict[str, Any], seen_sessions: set, expires_at: Dict[str, int]) -> bool:
+    """
+    Count one conversation in a single transaction: its marker, any new session markers and
+    the counter updates commit together or not at all. Returns False if the conversation
+    was already counted.
+    """
+    client = stats_table.meta.client
+    deltas = _conversation_counters(item)
+    session_id = item.get('session_id')
+    sessions = [key for key in deltas if session_id and f"session#{key}#{session_id}" not in seen_sessions]
+    conversation_marker = f"conversation#{item['conversation_id']}#{item['timestamp']}"
+
+    while True:
+        transaction = [_marker_put(stats_table.name, conversation_marker, expires_at['marker'])]
+        transaction += [_marker_put(stats_table.name, f"session#{key}#{session_id}", expires_at['marker'])
+                        for key in sessions]
+        transaction += [_counter_update(stats_table.name, key, {**counters, 'sessions': int(key in sessions)},
+                                        expires_at['stats'])
+                        for key, counters in deltas.items()]
+        try:
+            client.transact_write_items(TransactItems=transaction)
+            seen_sessions.update(f"session#{key}#{session_id}" for key in sessions)
+            return True
+        except client.exceptions.TransactionCanceledException as e:
+            reasons = [reason.get('Code') for reason in e.response.get('CancellationReasons', [])]
+            if reasons and reasons[0] == 'ConditionalCheckFailed':
+                return False
+            # Sessions already counted today: mark them seen and count the conversation alone
+            taken = [key for key, code in zip(sessions, reasons[1:]) if code == 'ConditionalCheckFailed']
+            if not taken:
+                raise
+            seen_sessions.update(f"session#{key}#{session_id}" for key in taken)
+            sessions = [key for key in sessions if key not in taken]
+
+
+def record_conversations(stats_table: Any, items: List[Dict[str, Any]]) -> None:
+    """
+    Fold chat history items into the aggregates, idempotently: the conversation writer
+    retries batches and SQS delivers at least once, so each conversation leaves a
+    conversation marker and is counted only by the write that created it.
+    """
+    if not stats_table or not items:
+        return
+
+    now = int(time.time())
+    expires_at = {'stats': now + STATS_TTL_DAYS * 86400, 'marker': now + MARKER_TTL_DAYS * 86400}
+    seen_sessions = set()
+
+    for item in items:
+        if not item.get('date'):
+            continue
+        try:
+            if not _record_conversation(stats_table, item, seen_sessions, expires_at):
+                logger.info(f"Conversation {item['conversation_id']} already counted")
+        except Exception as e:
+            logger.error(f"Failed to update conversation stats for {item.get('conversation_id')}: {str(e)}")
+
+
+def _summarize_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn a counter item into the API shape
+    """
+    languages = {}
+    source_types = {}
+    for name, value in item.items():
+        if name.startswith('language_'):
+            languages[name[len('language_'):]] = int(value)
+        elif name.startswith('source_type_'):
+            source_types[name[len('source_type_'):]] = int(value)
+    return {
+        'conversations': int(item.get('conversations', 0)),
+        'sessions': int(item.get('sessions', 0)),
+        'languages': languages,
+        'sourceTypes': source_types
+    }
+
+
+def _read_day_items(dynamodb: Any, table_name: str, days: List[str],
+                    language: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Counter items by day (one key per day, batched 100 at a time); days without an item
+    are left out
+    """
+    keys = {day_key(day, language): day for day in days}
+    key_list = list(keys)
+    items_by_day: Dict[str, Dict[str, Any]] = {}
+
+    for start in range(0, len(key_list), 100):
+        request = {table_name: {'Keys': [{'stat_key': key} for key in key_list[start:start + 100]]}}
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(table_name, []):
+                items_by_day[keys[item['stat_key']]] = item
+            request = response.get('UnprocessedKeys') or None
+
+    return items_by_day
+
+
+def get_stats(dynamodb: Any, table_name: str, days: List[str], language: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Read the aggregates for the given days and return totals plus an oldest-first daily series. Session totals are the sum of daily
+    distinct sessions.
+    """
+    items_by_day = _read_day_items(dynamodb, table_name, days, language)
+
+    series = []
+    totals = {'conversations': 0, 'sessions': 0, 'languages': defaultdict(int), 'sourceTypes': defaultdict(int)}
+    for day in sorted(days):
+        summary = _summarize_item(items_by_day.get(day, {}))
+        summary['date'] = day
+        series.append(summary)
+        totals['conversations'] += summary['conversations']
+        totals['sessions'] += summary['sessions']
+        for name, value in summary['languages'].items():
+            totals['languages'][name] += value
+        for name, value in summary['sourceTypes'].items():
+            totals['sourceTypes'][name] += value
+
+    totals['languages'] = dict(totals['languages'])
+    totals['sourceTypes'] = dict(totals['sourceTypes'])
+    return {'totals': totals, 'series': series}
+
+
+def model_price(model: str, prices: Dict[str, Dict[str, float]]) -> Optional[Dict[str, float]]:
+    """
+    Price entry for a model ID: an exact match, else the first model family it contains
+    """
+    if model in prices:
+        return prices[model]
+    for family, price in prices.items():
+        if family in model:
+            return price
+    return None
+
+
+def _usage_summary(counters: Dict[str, int], price: Optional[Dict[str, float]]) -> Dict[str, Any]:
+    """
+    API shape of one usage group: token totals, per-request and per-second rates, and the
+    estimated cost (None when the model has no price)
+    """
+    requests = counters.get('requests', 0)
+    input_tokens = counters.get('input_tokens', 0)
+    output_tokens = counters.get('output_tokens', 0)
+    cache_read = counters.get('cache_read_tokens', 0)
+    cache_write = counters.get('cache_write_tokens', 0)
+    generate_ms = counters.get('generate_ms', 0)
+    cost = None
+    if price:
+        cost = round((input_tokens * price['input'] + output_tokens * price['output'] +
+                      cache_read * price['cacheRead'] + cache_write * price['cacheWrite']) / 1_000_000, 6)
+
+    return {
+        'requests': requests,
+        'inputTokens': input_tokens,
+        'outputTokens': output_tokens,
+        'cacheReadTokens': cache_read,
+        'cacheWriteTokens': cache_write,
+        'inputTokensPerRequest': round(input_tokens / requests, 1) if requests else None,
+        'outputTokensPerRequest': round(output_tokens / requests, 1) if requests else None,
+        'outputTokensPerSecond': round(output_tokens * 1000 / generate_ms, 1) if generate_ms else None,
+        'estimatedCostUsd': cost
+    }
+
+
+def _combine(pairs: Dict[Tuple[str, str], Dict[str, int]], prices: Dict[str, Dict[str, float]]) -> Dict[str, Any]:
+    """
+    Summary over several (model, language) groups; the cost is the sum of the per-model costs
+    """
+    counters: Dict[str, int] = defaultdict(int)
+    cost = 0.0
+    priced = True
+    for (model, _), group in pairs.items():
+        for metric, value in group.items():
+            counters[metric] += value
+        group_cost = _usage_summary(group, model_price(model, prices))['estimatedCostUsd']
+        if group_cost is None:
+            priced = False
+        else:
+            cost += group_cost
+
+    summary = _usage_summary(counters, None)
+    summary['estimatedCostUsd'] = round(cost, 6) if priced else None
+    return summary
+
+
+def get_usage(dynamodb: Any, table_name: str, days: List[str],
+              prices: Dict[str, Dict[str, float]]) -> Dict[str, Any]:
+    """
+    Model token usage for the given days, grouped by model, by language, by model and
+    language, and per day (oldest first). Costs are estimates from the on-demand prices;
+    per-day and per-language costs add up over the models they cover.
+    """
+    items_by_day = _read_day_items(dynamodb, table_name, days)
+    by_pair: Dict[Tuple[str, str], Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    series = []
+
+    for day in sorted(days):
+        day_pairs: Dict[Tuple[str, str], Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        for name, value in items_by_day.get(day, {}).items():
+            if not name.startswith(USAGE_PREFIX):
+                continue
+            model, language, metric = name[len(USAGE_PREFIX):].rsplit('#', 2)
+            day_pairs[(model, language)][metric] += int(value)
+            by_pair[(model, language)][metric] += int(value)
+
+        day_summary = _combine(day_pairs, prices)
+        day_summary['date'] = day
+        series.append(day_summary)
+
+    by_model: Dict[str, Dict[Tuple[str, str], Dict[str, int]]] = defaultdict(dict)
+    by_language: Dict[str, Dict[Tuple[str, str], Dict[str, int]]] = defaultdict(dict)
+    for pair, counters in by_pair.items():
+        by_model[pair[0]][pair] = counters
+        by_language[pair[1]][pair] = counters
+
+    return {
+        'totals': _combine(by_pair, prices),
+        'byModel': {model: _combine(pairs, prices) for model, pairs in by_model.items()},
+        'byLanguage': {language: _combine(pairs, prices) for language, pairs in by_language.items()},
+        'byModelLanguage': [
+            {'model': model, 'language': language, **_usage_summary(counters, model_price(model, prices))}
+            for (model, language), counters in sorted(by_pair.items())
+        ],
+        'series': series
+    }
+
@@ -0,0 +1,68 @@
+"""
+Conversation Writer Lambda
+Drains chat conversations queued by the chat Lambda into the chat history table,
+writing each SQS batch with a DynamoDB batch writer and folding it into the
+pre-aggregated conversation stats. Deployed from the chat Lambda code asset.
+"""
+
+import json
+import logging
+import os
+import boto3
+from decimal import Decimal
+from conversation_stats import record_conversations
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Initialize AWS clients
+dynamodb = boto3.resource('dynamodb')
+
+# Environment variables
+CHAT_HISTORY_TABLE = os.environ.get('CHAT_HISTORY_TABLE', 'BloodCentersChatHistory')
+CONVERSATION_STATS_TABLE = os.environ.get('CONVERSATION_STATS_TABLE')
+
+chat_table = dynamodb.Table(CHAT_HISTORY_TABLE)
+stats_table = dynamodb.Table(CONVERSATION_STATS_TABLE) if CONVERSATION_STATS_TABLE else None
+
+def lambda_handler(event, context):
+    """
+    Write a batch of queued conversations. Messages that could not be written are reported
+    as batch item failures so SQS redelivers only those (and eventually dead-letters them).
+    """
+    records = event.get('Records', [])
+    items = []
+    failed_message_ids = []
+
+    for record in records:
+        try:
+            # DynamoDB rejects floats, so parse any numeric fields as Decimal
+            items.append((record['messageId'], json.loads(record['body'], parse_float=Decimal)))
+        except Exception as e:
+            logger.error(f"Malformed conversation message {record.get('messageId')}: {str(e)}")
+            failed_message_ids.append(record.get('messageId'))
+
+    written = 0
+    try:
+        # batch_writer groups puts into BatchWriteItem calls and retries unprocessed items;
+        # redelivered duplicates within a batch collapse on the table key
+        with chat_table.batch_writer(overwrite_by_pkeys=['conversation_id', 'timestamp']) as batch:
+            for message_id, item in items:
+                batch.put_item(Item=item)
+                written += 1
+    except Exception as e:
+        logger.error(f"Error writing conversation batch after {written} items: {str(e)}")
+        failed_message_ids.extend(message_id for message_id, _ in items)
+        items = []
+
+    # Only count conversations that were actually written
+    record_conversations(stats_table, [item for _, item in items])
+
+    logger.info(f"Persisted {len(items)} conversation(s), {len(failed_message_ids)} failed")
+
+    return {
+        'batchItemFailures': [
+            {'itemIdentifier': message_id} for message_id in failed_message_ids if message_id
+        ]
+    }
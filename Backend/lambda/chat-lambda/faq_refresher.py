@@ -0,0 +1,167 @@
+"""
+FAQ Refresher Lambda
+Regenerates the precomputed FAQ answers (see faq_store) after knowledge base ingestion.
+Runs on a schedule and only does work when the answer cache generation has moved past the
+generation of the stored answers, i.e. after an ingestion job ended. Answers are only
+regenerated when a job COMPLETEd since they were built; after failed or stopped jobs the
+knowledge base content is unchanged and the stored answers are re-stamped with the new
+generation instead. Answers are produced by the same retrieve/generate pipeline as the
+chat Lambda.
+"""
+
+import json
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+import lambda_function as chat
+from answer_cache import normalize_question
+from cache_generation import read_content_generation
+from conversation_pages import DATE_INDEX
+from faq_store import CURATED_QUESTIONS, read_store, write_store
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Frequent questions: asked at least FREQUENT_MIN_COUNT times over the last FREQUENT_DAYS days
+FREQUENT_DAYS = 7
+FREQUENT_MIN_COUNT = 3
+FREQUENT_LIMIT = 20
+FREQUENT_MAX_ITEMS = 5000
+
+GENERATION_WORKERS = 4
+
+
+def lambda_handler(event, context):
+    """
+    Regenerate the FAQ store when it is stale (or always with {"force": true})
+    """
+    if not chat.answer_cache:
+        logger.info("Answer cache table not configured, FAQ store disabled")
+        return {'success': True, 'regenerated': False}
+
+    generation = chat.answer_cache.current_generation()
+    if generation is None:
+        return {'success': False, 'error': 'Answer cache generation unavailable'}
+
+    store = read_store(chat.answer_cache.table)
+    if int(store.get('generation', -1)) == generation and not event.get('force'):
+        logger.info(f"FAQ store is current (generation {generation})")
+        return {'success': True, 'regenerated': False, 'generation': generation}
+
+    content_generation = read_content_generation(chat.answer_cache.table)
+    if int(store.get('content_generation', -1)) == content_generation and not event.get('force'):
+        # Only failed or stopped ingestion jobs since the answers were built
+        write_store(chat.answer_cache.table, generation, json.loads(store.get('entries_json', '[]')),
+                    content_generation)
+        logger.info(f"No ingestion job completed since the FAQ answers were built, re-stamped them "
+                    f"for generation {generation}")
+        return {'success': True, 'regenerated': False, 'generation': generation}
+
+    questions = collect_questions()
+    logger.info(f"Regenerating {len(questions)} FAQ answers for generation {generation}")
+
+    with ThreadPoolExecutor(max_workers=GENERATION_WORKERS) as pool:
+        results = list(pool.map(lambda q: answer_question(*q), questions))
+    entries = [entry for entry in results if entry]
+
+    # An ingestion job that finished meanwhile makes these answers stale already
+    if chat.answer_cache.current_generation(refresh=True) != generation:
+        logger.info("Answer cache generation changed during regeneration, not storing FAQ answers")
+        return {'success': True, 'regenerated': False, 'generation': generation}
+
+    write_store(chat.answer_cache.table, generation, entries, content_generation)
+    logger.info(f"Stored {len(entries)}/{len(questions)} FAQ answers for generation {generation}")
+    return {'success': True, 'regenerated': True, 'generation': generation,
+            'answers': len(entries), 'questions': len(questions)}
+
+
+def collect_questions() -> List[Tuple[str, str]]:
+    """
+    Curated starter questions plus the most frequent recent questions, as (question, language)
+    """
+    questions = [(question, language) for language, items in CURATED_QUESTIONS.items() for question in items]
+    seen = {(normalize_question(question), language) for question, language in questions}
+
+    try:
+        for question, language in frequent_questions():
+            key = (normalize_question(question), language)
+            if key not in seen:
+                seen.add(key)
+                questions.append((question, language))
+    except Exception as e:
+        logger.error(f"Could not read frequent questions: {str(e)}")
+
+    return questions
+
+
+def frequent_questions() -> List[Tuple[str, str]]:
+    """
+    Most asked questions of the last FREQUENT_DAYS days from the chat history date index
+    """
+    if not chat.chat_table or not chat.chat_table.available:
+        return []
+
+    counts: Counter = Counter()
+    originals: Dict[Tuple[str, str], str] = {}
+    read = 0
+    today = datetime.utcnow()
+
+    for offset in range(FREQUENT_DAYS):
+        day = (today - timedelta(days=offset)).strftime('%Y-%m-%d')
+        query_params = {
+            'IndexName': DATE_INDEX,
+            'KeyConditionExpression': '#date = :day',
+            'ExpressionAttributeNames': {'#date': 'date', '#lang': 'language'},
+            'ExpressionAttributeValues': {':day': day},
+            'ProjectionExpression': 'question, #lang'
+        }
+        while read < FREQUENT_MAX_ITEMS:
+            response = chat.chat_table.query(**query_params)
+            for item in response.get('Items', []):
+                key = (normalize_question(item.get('question', '')), item.get('language', 'en'))
+                if key[0]:
+                    counts[key] += 1
+                    originals.setdefault(key, item['question'])
+            read += len(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    return [
+        (originals[key], key[1])
+        for key, count in counts.most_common(FREQUENT_LIMIT)
+        if count >= FREQUENT_MIN_COUNT
+    ]
+
+
+def answer_question(question: str, language: str) -> Optional[Dict[str, Any]]:
+    """
+    Answer one question with the chat pipeline; None when generation failed or the answer
+    is degraded (no knowledge base context), so it is retried on the next refresh
+    """
+    try:
+        context_results, retrieval_plan = chat.retrieve_context(question)
+        retrieval_count = len(context_results)
+        context_results, _ = chat.rerank(question, context_results, chat.RERANK_TOP_K, chat.RERANK_BUDGET_MS)
+        sources = chat.extract_sources(context_results)
+        packed_context = chat.build_context_text(context_results)
+        response_data = chat.generate_response(question, packed_context['text'], language)
+        if not chat.is_cacheable_answer(retrieval_plan, context_results, response_data):
+            logger.warning(f"Not precomputing a degraded answer for '{question}' ({retrieval_plan['retriever']}, "
+                           f"{len(context_results)} context result(s))")
+            return None
+
+        return {
+            'question': question,
+            'language': language,
+            'answer': chat.process_markdown_response(response_data['response']),
+            'sources': chat.add_blood_center_link_if_needed(question, sources),
+            'retrievalResults': retrieval_count
+        }
+    except Exception as e:
+        logger.error(f"Could not precompute answer for '{question}': {str(e)}")
+        return None
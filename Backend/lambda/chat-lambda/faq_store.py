@@ -0,0 +1,108 @@
+"""
+FAQ Store
+Precomputed answers for the suggested FAQ questions and for questions users ask often.
+Answers are generated offline by the FAQ refresher Lambda and saved as one item in the
+answer cache table, stamped with the cache generation they were computed under. The chat
+Lambda keeps the entries in memory and serves a matching question with a dict lookup,
+without calling Bedrock; entries from an older generation are never served.
+"""
+
+import json
+import logging
+import time
+from typing import Dict, Any, List, Optional
+
+from answer_cache import make_cache_key
+
+# Configure logging
+logger = logging.getLogger()
+
+FAQ_STORE_KEY = 'faq#store'
+
+# Starter questions shown by the frontend (Frontend/src/utilities/constants.js, FAQS)
+CURATED_QUESTIONS = {
+    'en': [
+        "How often can I donate blood?",
+        "What are the eligibility requirements?",
+        "Where can I find a blood center near me?",
+        "What is the current blood supply status?",
+        "Is it safe to donate blood?",
+        "What should I do before donating?"
+    ],
+    'es': [
+        "¿Con qué frecuencia puedo donar sangre?",
+        "¿Cuáles son los requisitos de elegibilidad?",
+        "¿Dónde puedo encontrar un centro de sangre cerca de mí?",
+        "¿Cuál es el estado actual del suministro de sangre?",
+        "¿Es seguro donar sangre?",
+        "¿Qué debo hacer antes de donar?"
+    ]
+}
+
+
+def read_store(table: Any) -> Dict[str, Any]:
+    """
+    Read the stored FAQ item ({} when none has been generated yet)
+    """
+    return table.get_item(Key={'cache_key': FAQ_STORE_KEY}).get('Item') or {}
+
+
+def write_store(table: Any, generation: int, entries: List[Dict[str, Any]], content_generation: int = 0) -> None:
+    """
+    Replace the FAQ answers. Each entry has question, language, answer, sources and retrievalResults.
+    content_generation is the knowledge base content the answers were generated from.
+    """
+    table.put_item(Item={
+        'cache_key': FAQ_STORE_KEY,
+        'generation': generation,
+        'content_generation': content_generation,
+        'entries_json': json.dumps(entries),
+        'entry_count': len(entries),
+        'updated_at': int(time.time())
+    })
+
+
+class FaqStore:
+    """
+    In-memory view of the FAQ store. The item is re-read when the cache generation changes,
+    and while the stored answers are missing or stale at most once every recheck_seconds,
+    so a freshly regenerated store is picked up without reading it on every request.
+    """
+
+    def __init__(self, table: Any, recheck_seconds: int = 60):
+        self.table = table
+        self.recheck_seconds = recheck_seconds
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._generation: Optional[int] = None
+        self._loaded_at = 0.0
+
+    def _load(self, generation: int) -> None:
+        try:
+            item = read_store(self.table)
+        except Exception as e:
+            logger.error(f"Could not read FAQ store: {str(e)}")
+            item = {}
+
+        entries = {}
+        if item and int(item.get('generation', -1)) == generation:
+            for entry in json.loads(item.get('entries_json', '[]')):
+                entries[make_cache_key(entry['question'], entry['language'])] = entry
+        else:
+            logger.info(f"FAQ store is missing or stale for answer cache generation {generation}")
+
+        self._entries = entries
+        self._generation = generation
+        self._loaded_at = time.time()
+
+    def lookup(self, question: str, language: str, generation: Optional[int]) -> Optional[Dict[str, Any]]:
+        """
+        Find the precomputed answer for a question under the current generation
+        """
+        if generation is None:
+            return None
+
+        if generation != self._generation or (
+                not self._entries and time.time() - self._loaded_at >= self.recheck_seconds):
+            self._load(generation)
+
+        return self._entries.get(make_cache_key(question, language))
@@ -0,0 +1,119 @@
+"""
+Hedging
+Hedged model invocation for the chat Lambda. If the primary model has not answered after
+a high percentile of its own recent latency, the same request is sent to a secondary model
+or inference profile and whichever answers first wins; the other answer is ignored (and
+released through the discard callback when it arrives).
+
+Hedges cost a second model call, so they are capped to a fraction of recent requests.
+Latency windows are kept per primary model, since the fast and large models differ by
+seconds.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, TimeoutError as FutureTimeoutError, wait
+from typing import Dict, Any, Callable, Deque, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger()
+
+# Own pool: hedged calls already run inside a request-budget worker
+_executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix='hedge')
+
+
+class Hedger:
+    """
+    Latency-triggered hedging with a cap on how often it may fire
+    """
+
+    def __init__(self, percentile: float = 95.0, max_rate: float = 0.05, default_delay_ms: float = 6000,
+                 min_delay_ms: float = 1500, window: int = 200, min_samples: int = 20):
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.default_delay_ms = default_delay_ms
+        self.min_delay_ms = min_delay_ms
+        self.window = window
+        self.min_samples = min_samples
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._decisions: Deque[bool] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def delay_ms(self, key: str) -> float:
+        """
+        How long to wait for the primary before hedging: the configured percentile of its
+        recent latencies, or the default until enough samples exist
+        """
+        with self._lock:
+            samples = sorted(self._latencies.get(key, ()))
+        if len(samples) < self.min_samples:
+            return self.default_delay_ms
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return max(samples[index], self.min_delay_ms)
+
+    def record(self, key: str, latency_ms: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=self.window)).append(latency_ms)
+
+    def _decide(self, wants_hedge: bool) -> bool:
+        """
+        Record one call and whether it hedged; a hedge is refused once max_rate of the
+        last `window` calls already hedged
+        """
+        with self._lock:
+            allowed = wants_hedge and sum(self._decisions) + 1 <= self.max_rate * self.window
+            self._decisions.append(allowed)
+            return allowed
+
+    def call(self, key: str, primary: Callable[[], Any], secondary: Optional[Callable[[], Any]] = None,
+             discard: Optional[Callable[[Any], None]] = None) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Run primary, hedged with secondary when primary is slow. Returns (result, info);
+        info tells whether a hedge fired and which call won. Errors of the winning call
+        are raised; when one call fails the other one is still awaited.
+        """
+        delay_ms = self.delay_ms(key)
+        started = time.monotonic()
+        first = _executor.submit(primary)
+
+        def record_primary(future) -> None:
+            if not future.cancelled() and future.exception() is None:
+                self.record(key, (time.monotonic() - started) * 1000)
+
+        first.add_done_callback(record_primary)
+
+        try:
+            result = first.result(timeout=delay_ms / 1000.0)
+            self._decide(False)
+            return result, {'hedged': False, 'winner': 'primary', 'delayMs': round(delay_ms)}
+        except FutureTimeoutError:
+            pass
+
+        if secondary is None or not self._decide(True):
+            info = {'hedged': False, 'winner': 'primary', 'delayMs': round(delay_ms),
+                    'capped': secondary is not None}
+            return first.result(), info
+
+        logger.warning(f"{key} has not answered after {delay_ms:.0f} ms, hedging with the secondary")
+        second = _executor.submit(secondary)
+        pending = {first, second}
+        failed = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            succeeded = [future for future in done if future.exception() is None]
+            if not succeeded:
+                failed = done.pop()
+                continue
+
+            future = succeeded[0]
+            winner = 'primary' if future is first else 'secondary'
+            for loser in pending | set(succeeded[1:]):
+                if not loser.cancel() and discard:
+                    loser.add_done_callback(lambda f: discard(f.result()) if f.exception() is None else None)
+            logger.info(f"Hedged call won by the {winner}")
+            return future.result(), {'hedged': True, 'winner': winner, 'delayMs': round(delay_ms)}
+
+        # Both calls failed
+        return failed.result(), {}
@@ -3,40 +3,227 @@ America's Blood Centers Chatbot - Bedrock Implementation
 Lambda function for handling chat requests using Bedrock Knowledge Base and Foundation Models
 """
 
+import time
+
+# Taken before the other imports so the cold-start report includes them
+IMPORT_STARTED = time.perf_counter()
+
 import json
 import logging
 import os
 import re
-from typing import Dict, Any, List
-import boto3
+from typing import Dict, Any, List, Callable, Tuple
 from datetime import datetime, timedelta
 import uuid
 from decimal import Decimal
+from botocore.config import Config
+from answer_cache import AnswerCache
+from conversation_pages import resolve_day_range, decode_cursor, query_conversation_page, date_language_key
+from conversation_stats import record_conversations, get_stats, get_usage, DEFAULT_MODEL_PRICES
+from source_resolver import resolve_sources
+from context_packer import pack_context, estimate_tokens
+from retrieval_policy import plan_retrieval, should_widen, MAX_RESULTS
+from session_memory import SessionMemory, SessionHistory, history_messages
+from faq_store import FaqStore
+from lexical_index import LexicalIndex, boost_results
+from reranker import rerank
+from request_budget import RequestBudget, StageTimeout
+from model_router import route_query, RouteLatency
+from hedging import Hedger
+from circuit_breaker import CircuitBreaker, CircuitOpen, CLOSED
+from metrics import StageTimings, emf_record, emit
+from stage_graph import StageGraph
+from data_source_registry import registry_from_environment, PDF, WEB, DAILY
+from cache_generation import register_ingestion_job
+import aws_clients
 
 # Configure logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-
-# Initialize AWS clients
-bedrock_runtime = boto3.client('bedrock-runtime')
-bedrock_agent_runtime = boto3.client('bedrock-agent-runtime')
-s3_client = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
+
+# Client settings: explicit timeouts so a slow dependency fails inside the request budget
+# (see request_budget) rather than at the gateway, TCP keep-alive on pooled connections,
+# and adaptive retries that back off client-side when Bedrock or DynamoDB throttle
+BEDROCK_RUNTIME_CONFIG = Config(connect_timeout=2, read_timeout=25, tcp_keepalive=True,
+                                max_pool_connections=16, retries={'mode': 'adaptive', 'max_attempts': 2})
+RETRIEVE_CONFIG = Config(connect_timeout=2, read_timeout=6, tcp_keepalive=True,
+                         max_pool_connections=16, retries={'mode': 'adaptive', 'max_attempts': 2})
+STORAGE_CONFIG = Config(connect_timeout=1, read_timeout=3, tcp_keepalive=True,
+                        max_pool_connections=16, retries={'mode': 'adaptive', 'max_attempts': 3})
+
+# AWS clients, created on first use (see aws_clients)
+bedrock_runtime = aws_clients.client('bedrock-runtime', BEDROCK_RUNTIME_CONFIG)
+bedrock_agent_runtime = aws_clients.client('bedrock-agent-runtime', RETRIEVE_CONFIG)
+bedrock_agent = aws_clients.client('bedrock-agent', STORAGE_CONFIG)
+s3_client = aws_clients.client('s3', STORAGE_CONFIG)
+sqs_client = aws_clients.client('sqs', STORAGE_CONFIG)
+dynamodb = aws_clients.resource('dynamodb', STORAGE_CONFIG)
 
 # Environment variables
 KNOWLEDGE_BASE_ID = os.environ.get('KNOWLEDGE_BASE_ID')
 MODEL_ID = os.environ.get('MODEL_ID', 'global.anthropic.claude-sonnet-4-5-20250929-v1:0')
 MAX_TOKENS = int(os.environ.get('MAX_TOKENS', '1000'))
+# Faster, cheaper model and tighter max_tokens for simple questions (see model_router)
+FAST_MODEL_ID = os.environ.get('FAST_MODEL_ID', 'global.anthropic.claude-haiku-4-5-20251001-v1:0')
+FAST_MAX_TOKENS = int(os.environ.get('FAST_MAX_TOKENS', '400'))
+MODEL_ROUTING_ENABLED = os.environ.get('MODEL_ROUTING_ENABLED', 'true') == 'true'
+# Hedged generation (see hedging): a slow primary model is raced against HEDGE_MODEL_ID, or
+# by default against the other of MODEL_ID / FAST_MODEL_ID, for at most HEDGE_MAX_RATE of requests
+HEDGING_ENABLED = os.environ.get('HEDGING_ENABLED', 'true') == 'true'
+HEDGE_MODEL_ID = os.environ.get('HEDGE_MODEL_ID')
+HEDGE_PERCENTILE = float(os.environ.get('HEDGE_PERCENTILE', '95'))
+HEDGE_MAX_RATE = float(os.environ.get('HEDGE_MAX_RATE', '0.05'))
+HEDGE_DEFAULT_DELAY_MS = float(os.environ.get('HEDGE_DEFAULT_DELAY_MS', '6000'))
+# Circuit breakers per dependency (see circuit_breaker)
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', '5'))
+BREAKER_WINDOW_SECONDS = float(os.environ.get('BREAKER_WINDOW_SECONDS', '30'))
+BREAKER_COOLDOWN_SECONDS = float(os.environ.get('BREAKER_COOLDOWN_SECONDS', '30'))
+# Per-stage timings: EMF metrics in the logs, and a metadata.timings block when
+# RESPONSE_TIMINGS is set or the request asks for it ("timings": true)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true') == 'true'
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'AmericasBloodCenters/Chatbot')
+RESPONSE_TIMINGS = os.environ.get('RESPONSE_TIMINGS', 'false') == 'true'
+# USD per million tokens for the /admin/usage cost estimate, by model ID or family:
+# {"claude-sonnet-4-5": {"input": 3, "output": 15, "cacheRead": 0.3, "cacheWrite": 3.75}}
+MODEL_PRICES = {**DEFAULT_MODEL_PRICES, **json.loads(os.environ.get('MODEL_PRICING') or '{}')}
 TEMPERATURE = float(os.environ.get('TEMPERATURE', '0.0'))
 CHAT_HISTORY_TABLE = os.environ.get('CHAT_HISTORY_TABLE', 'BloodCentersChatHistory')
+CONVERSATION_QUEUE_URL = os.environ.get('CONVERSATION_QUEUE_URL')
+CONVERSATION_STATS_TABLE = os.environ.get('CONVERSATION_STATS_TABLE')
+ANSWER_CACHE_TABLE = os.environ.get('ANSWER_CACHE_TABLE')
+ANSWER_CACHE_TTL_SECONDS = int(os.environ.get('ANSWER_CACHE_TTL_SECONDS', '86400'))
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get('ANSWER_CACHE_MAX_ENTRIES', '256'))
+ANSWER_CACHE_GENERATION_CHECK_SECONDS = int(os.environ.get('ANSWER_CACHE_GENERATION_CHECK_SECONDS', '30'))
+ANSWER_CACHE_PENDING_CHECK_SECONDS = int(os.environ.get('ANSWER_CACHE_PENDING_CHECK_SECONDS', '5'))
+CONTEXT_TOKEN_BUDGET = int(os.environ.get('CONTEXT_TOKEN_BUDGET', '3000'))
+CONTEXT_DUPLICATE_THRESHOLD = float(os.environ.get('CONTEXT_DUPLICATE_THRESHOLD', '0.8'))
+PROMPT_CACHE_ENABLED = os.environ.get('PROMPT_CACHE_ENABLED', 'true') == 'true'
+DOCUMENTS_BUCKET = os.environ.get('DOCUMENTS_BUCKET')
+LEXICAL_INDEX_PATH = os.environ.get('LEXICAL_INDEX_PATH',
+                                    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lexical_index.bin'))
+LEXICAL_BOOST_WEIGHT = float(os.environ.get('LEXICAL_BOOST_WEIGHT', '0.1'))
+RERANK_TOP_K = int(os.environ.get('RERANK_TOP_K', '8'))
+RERANK_BUDGET_MS = float(os.environ.get('RERANK_BUDGET_MS', '3'))
+
+# Static instructions per language, sent as the system prompt; request specific text
+# (context, question) goes in the user turn
+SYSTEM_PROMPTS = {
+    'en': """You are an expert blood donation assistant for America's Blood Centers. Answer based on the provided context.
+
+Instructions:
+- Answer based on the provided context
+- If asked about donation locations, mention the blood center locator
+- Be accurate and helpful
+- If you don't have sufficient information in the context, say so clearly
+- Focus on blood donation, eligibility, and America's Blood Centers information
+- Use markdown formatting when appropriate (lists, bold text, etc.)
+- Organize information clearly and make it easy to read""",
+    'es': """Eres un asistente experto en donación de sangre para America's Blood Centers. Responde en español basándote en el contexto proporcionado.
+
+Instrucciones:
+- Responde SOLO en español
+- Usa la información del contexto proporcionado
+- Si la pregunta es sobre ubicaciones de donación, menciona el localizador de centros de sangre
+- Sé preciso y útil
+- Si no tienes información suficiente en el contexto, dilo claramente
+- Usa formato markdown cuando sea apropiado (listas, texto en negrita, etc.)
+- Organiza la información de manera clara y fácil de leer"""
+}
+
+# Shortest prefix (tokens) each model family caches; a checkpoint on a shorter prefix is
+# ignored. Matched like the usage prices: exact model ID, else the family it contains.
+PROMPT_CACHE_MIN_TOKENS = {
+    'claude-sonnet-4-5': 1024,
+    'claude-haiku-4-5': 4096
+}
+DEFAULT_PROMPT_CACHE_MIN_TOKENS = 1024
+
+# Presigned document URLs are valid for an hour and re-signed once less than the margin remains
+PRESIGNED_URL_EXPIRY_SECONDS = 3600
+PRESIGN_REFRESH_MARGIN_SECONDS = 300
 
-# Initialize DynamoDB table
+# Per-container cache of presigned URLs: (bucket, key) -> (url, expires_at)
+presigned_url_cache: Dict[Tuple[str, str], Tuple[str, float]] = {}
+
+# Per-container generation latency per route, reported in the response metadata
+route_latency = RouteLatency()
+
+# Per-container primary model latencies and hedge budget
+hedger = Hedger(percentile=HEDGE_PERCENTILE, max_rate=HEDGE_MAX_RATE, default_delay_ms=HEDGE_DEFAULT_DELAY_MS)
+
+# Backoff (seconds) between direct DynamoDB write attempts; kept short since the user is waiting
+PERSIST_RETRY_DELAYS = (0.05, 0.2)
+
+# DynamoDB tables, also created on first use
+chat_table = aws_clients.table(dynamodb, CHAT_HISTORY_TABLE) if CHAT_HISTORY_TABLE else None
+stats_table = aws_clients.table(dynamodb, CONVERSATION_STATS_TABLE) if CONVERSATION_STATS_TABLE else None
+
+# Local BM25 index built at deploy time (scripts/build_lexical_index.py); memory-mapped, so
+# loading it costs almost nothing. Retrieval works without it, just without the fallback.
 try:
-    chat_table = dynamodb.Table(CHAT_HISTORY_TABLE)
-    logger.info(f"Successfully initialized DynamoDB table: {CHAT_HISTORY_TABLE}")
+    lexical_index = LexicalIndex(LEXICAL_INDEX_PATH)
+    logger.info(f"Loaded lexical index: {lexical_index.doc_count} passages, {lexical_index.term_count} terms")
 except Exception as e:
-    logger.error(f"Could not initialize DynamoDB table {CHAT_HISTORY_TABLE}: {e}")
-    chat_table = None
+    logger.warning(f"Lexical index not available at {LEXICAL_INDEX_PATH}: {e}")
+    lexical_index = None
+
+# Per-container multi-turn history, refreshed from session-timestamp-index
+session_memory = SessionMemory(chat_table)
+
+# Initialize answer cache (disabled when no cache table is configured, since the table
+# also carries the invalidation signal from completed ingestion jobs)
+answer_cache = None
+faq_store = None
+answer_cache_table = None
+if ANSWER_CACHE_TABLE:
+    answer_cache_table = aws_clients.table(dynamodb, ANSWER_CACHE_TABLE)
+    faq_store = FaqStore(answer_cache_table)
+    answer_cache = AnswerCache(
+        answer_cache_table,
+        ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+        max_entries=ANSWER_CACHE_MAX_ENTRIES,
+        generation_check_seconds=ANSWER_CACHE_GENERATION_CHECK_SECONDS,
+        pending_check_seconds=ANSWER_CACHE_PENDING_CHECK_SECONDS,
+        bedrock_agent=bedrock_agent,
+        knowledge_base_id=KNOWLEDGE_BASE_ID
+    )
+
+# Knowledge base data sources by role (pdf/web/daily) for the admin sync endpoint
+data_source_registry = registry_from_environment(bedrock_agent, answer_cache_table)
+
+# Errors that mean the request was rejected rather than the dependency being unhealthy
+BREAKER_IGNORED_ERRORS = ('ValidationException', 'ResourceNotFoundException', 'ConditionalCheckFailedException')
+
+def is_dependency_failure(error: Exception) -> bool:
+    """
+    Whether an error should count against a circuit breaker
+    """
+    response = getattr(error, 'response', None)
+    code = response.get('Error', {}).get('Code') if isinstance(response, dict) else None
+    return code not in BREAKER_IGNORED_ERRORS
+
+# Circuit breakers, shared across containers through the answer cache table
+breakers = {
+    name: CircuitBreaker(
+        name,
+        answer_cache_table,
+        failure_threshold=BREAKER_FAILURE_THRESHOLD,
+        window_seconds=BREAKER_WINDOW_SECONDS,
+        cooldown_seconds=BREAKER_COOLDOWN_SECONDS,
+        is_failure=is_dependency_failure
+    )
+    for name in ('retrieve', 'invoke_model', 'dynamodb_write')
+}
+
+# Cold-start report: module import, client construction and the first invocation. Logged
+# once per container after the first invocation and returned by warm-up invocations.
+IMPORT_MS = round((time.perf_counter() - IMPORT_STARTED) * 1000, 2)
+cold_start_report: Dict[str, Any] = {
+    'initializationType': os.environ.get('AWS_LAMBDA_INITIALIZATION_TYPE', 'on-demand'),
+    'importMs': IMPORT_MS,
+    'clientInitMs': aws_clients.init_timings,
+    'firstCall': None
+}
 
 def convert_dynamodb_item(item: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -64,9 +251,34 @@ def convert_dynamodb_item(item: Dict[str, Any]) -> Dict[str, Any]:
         'sources': convert_value(item.get('sources', []))
     }
 
-def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+def lambda_handler(event: Dict[str, Any], context: Any,
+                   on_delta: Callable[[str], None] = None) -> Dict[str, Any]:
     """
-    Main Lambda handler for Bedrock-based chat
+    Lambda entry point. Warm-up invocations ({"warmup": true}) only prime the container;
+    everything else goes to handle_event. The first invocation completes the cold-start report.
+    The streaming runtime (stream_runtime.py) passes on_delta to receive the answer as it is
+    generated.
+    """
+    started = time.perf_counter()
+    if event.get('warmup'):
+        response = warm_up()
+    else:
+        response = handle_event(event, context, on_delta)
+
+    if cold_start_report['firstCall'] is None:
+        cold_start_report['firstCall'] = {
+            'kind': 'warmup' if event.get('warmup') else (
+                event.get('httpMethod') or event.get('requestContext', {}).get('http', {}).get('method') or 'event'),
+            'ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+        logger.info(f"Cold start report: {json.dumps(cold_start_report)}")
+    return response
+
+def handle_event(event: Dict[str, Any], context: Any,
+                 on_delta: Callable[[str], None] = None) -> Dict[str, Any]:
+    """
+    Main Lambda handler for Bedrock-based chat. With on_delta, the model answer is streamed
+    and each text delta is passed to it before the full response is returned.
     """
 
     # Set response headers for CORS
@@ -120,19 +332,25 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 })
             }
 
+        timings = StageTimings()
+        graph = StageGraph(timings)
+
         # Parse request body
-        if 'body' in event:
-            if isinstance(event['body'], str):
-                body = json.loads(event['body'])
+        with timings.span('parse'):
+            if 'body' in event:
+                if isinstance(event['body'], str):
+                    body = json.loads(event['body'])
+                else:
+                    body = event['body']
             else:
-                body = event['body']
-        else:
-            raise ValueError("Request body is missing")
+                raise ValueError("Request body is missing")
 
         # Extract parameters
         user_message = body.get('message', '').strip()
         language = body.get('language', 'en')
-        session_id = body.get('sessionId', str(uuid.uuid4()))
+        session_id = body.get('sessionId') or str(uuid.uuid4())
+        is_new_session = not body.get('sessionId')
+        budget = RequestBudget.from_context(context)
 
         if not user_message:
             return {
@@ -146,35 +364,95 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
         logger.info(f"Processing chat request (language: {language})")
 
-        # Step 1: Retrieve relevant context from Knowledge Base
-        retrieve_response = bedrock_agent_runtime.retrieve(
-            knowledgeBaseId=KNOWLEDGE_BASE_ID,
-            retrievalQuery={'text': user_message},
-            retrievalConfiguration={
-                'vectorSearchConfiguration': {
-                    'numberOfResults': 20,
-                    'overrideSearchType': 'SEMANTIC'
-                }
-            }
-        )
-
-        context_results = retrieve_response.get('retrievalResults', [])
-        sources = extract_sources(context_results)
-
-        if len(sources) == 0 and len(context_results) > 0:
-            logger.warning(f"No sources extracted despite having {len(context_results)} context results!")
-
-        # Step 2: Generate response using Bedrock LLM
-        response_data = generate_response(user_message, context_results, language)
-
-        # Step 3: Process response for markdown formatting
-        processed_response = process_markdown_response(response_data['response'])
-
-        # Step 4: Add blood center link if asking about donation locations
-        sources = add_blood_center_link_if_needed(user_message, sources)
-
-        # Step 5: Save conversation to DynamoDB
-        conversation_id = save_conversation(session_id, user_message, processed_response, language, sources)
+        # Step 1: Load earlier turns of the session (bounded: rolling summary + last turns)
+        with timings.span('history'):
+            history = None if is_new_session else session_memory.load(session_id)
+        history_turns = len(history.turns) if history else 0
+
+        # Step 2: Serve FAQ and repeated questions from the precomputed FAQ answers or the
+        # answer cache. Follow-up questions depend on the earlier turns, so only opening
+        # questions use them, unless the model's breaker is open: then a standalone answer
+        # still beats the fallback message.
+        cached_answer, cache_tier, cache_generation = None, None, None
+        packed_context = None
+        retrieval_plan = None
+        rerank_stats = None
+        routing = None
+        token_usage = None
+        model_usage = None
+        if answer_cache and (not history_turns or breakers['invoke_model'].state != CLOSED):
+            with timings.span('cache'):
+                cached_answer = faq_store.lookup(user_message, language, answer_cache.current_generation())
+                if cached_answer:
+                    cache_tier = 'faq'
+                else:
+                    cached_answer, cache_tier, cache_generation = answer_cache.lookup(user_message, language)
+
+        if cached_answer:
+            logger.info(f"Answer cache hit ({cache_tier})")
+            processed_response = cached_answer['answer']
+            with timings.span('presign'):
+                sources = refresh_source_urls(cached_answer['sources'])
+            retrieval_count = cached_answer['retrievalResults']
+        else:
+            # Step 3: Retrieve relevant context from Knowledge Base
+            with timings.span('retrieve'):
+                context_results, retrieval_plan = retrieve_context(user_message, budget)
+            retrieval_count = len(context_results)
+
+            # Keep only the results that matter (local CPU-only rerank within a fixed budget);
+            # sources are cited from what actually goes into the prompt
+            with timings.span('rerank'):
+                context_results, rerank_stats = rerank(user_message, context_results, RERANK_TOP_K, RERANK_BUDGET_MS)
+
+            # Source extraction and presigning only feed the final payload, so they run
+            # alongside packing and generation
+            graph.add('sources', extract_sources, context_results, timings, fallback=[])
+
+            # Step 4: Pack the context into the token budget
+            with timings.span('pack'):
+                packed_context = build_context_text(context_results)
+
+            # Step 5: Generate response using Bedrock LLM, with the model and max_tokens picked from the question's complexity
+            routing = select_model(user_message, retrieval_plan, context_results)
+            generate_started = time.monotonic()
+            with timings.span('generate'):
+                if on_delta:
+                    response_data = generate_response_stream(user_message, packed_context['text'], language,
+                                                             on_delta, history, budget, routing['modelId'],
+                                                             routing['maxTokens'])
+                else:
+                    response_data = generate_response(user_message, packed_context['text'], language, history,
+                                                      budget, routing['modelId'], routing['maxTokens'])
+            routing['generateMs'] = round((time.monotonic() - generate_started) * 1000, 1)
+            if response_data['model_response'] is not None:
+                route_latency.record(routing['route'], routing['generateMs'])
+
+            token_usage = response_data['usage']
+            if token_usage:
+                model_usage = {'model': response_data['model'], 'generateMs': routing['generateMs'], **token_usage}
+
+            # Step 6: Process response for markdown formatting
+            with timings.span('markdown'):
+                processed_response = process_markdown_response(response_data['response'])
+
+            # Step 7: Add blood center link if asking about donation locations
+            sources = graph.result('sources')
+            if len(sources) == 0 and len(context_results) > 0:
+                logger.warning(f"No sources extracted despite having {len(context_results)} context results!")
+            sources = add_blood_center_link_if_needed(user_message, sources)
+
+            # Only cache real model answers grounded in knowledge base context, never the
+            # fallback apology or a degraded (lexical-only or context-free) answer
+            if answer_cache and not history_turns and is_cacheable_answer(retrieval_plan, context_results, response_data):
+                graph.add('cacheStore', answer_cache.store, user_message, language, processed_response, sources,
+                          retrieval_count, cache_generation)
+
+        # Step 8: Save conversation to DynamoDB while the response is serialized
+        conversation_id = str(uuid.uuid4())
+        graph.add('persist', save_conversation, session_id, user_message, processed_response, language, sources,
+                  budget, model_usage, conversation_id=conversation_id)
+        response_timings = timings.as_dict()
         
         # Prepare final response
         chat_response = {
@@ -187,22 +465,43 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             "metadata": {
                 "sourceCount": len(sources),
                 "responseLength": len(processed_response),
-                "model": MODEL_ID,
+                "model": response_data['model'] if routing else MODEL_ID,
                 "language": language,
-                "retrievalResults": len(context_results),
-                "hasMarkdown": has_markdown_formatting(processed_response)
+                "retrievalResults": retrieval_count,
+                "hasMarkdown": has_markdown_formatting(processed_response),
+                "cacheHit": cached_answer is not None,
+                "cacheTier": cache_tier,
+                "searchType": retrieval_plan['searchType'] if retrieval_plan else None,
+                "retrievalWidened": retrieval_plan['widened'] if retrieval_plan else None,
+                "retriever": retrieval_plan['retriever'] if retrieval_plan else None,
+                "rawContextTokens": packed_context['rawTokens'] if packed_context else None,
+                "packedContextTokens": packed_context['packedTokens'] if packed_context else None,
+                "rerank": rerank_stats,
+                "usage": token_usage,
+                "historyTurns": history_turns,
+                "routing": {**routing, 'latencyByRoute': route_latency.snapshot()} if routing else None,
+                "hedge": response_data['hedge'] if routing else None,
+                "circuits": {name: breaker.state for name, breaker in breakers.items()},
+                "budget": budget.summary(),
+                "timings": response_timings if RESPONSE_TIMINGS or body.get('timings') else None
             }
         }
 
         # Log what's actually being sent to frontend
         logger.info(f"Response generated successfully with {len(sources)} sources")
 
-        return {
+        response = {
             'statusCode': 200,
             'headers': headers,
             'body': json.dumps(chat_response)
         }
 
+        # Side steps must finish before the handler returns and the container is frozen;
+        # the metrics record includes persist, which ended after the response was built
+        graph.join()
+        publish_metrics(timings.as_dict(), chat_response['metadata'])
+        return response
+
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}")
         return {
@@ -215,6 +514,69 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             })
         }
 
+def warm_up() -> Dict[str, Any]:
+    """
+    Prime the container without calling the model: build every client, open the
+    connection pools with cheap calls and load the answer cache generation, the FAQ
+    entries and the lexical index pages. A step that fails is logged and skipped; the
+    request usually reached the service, so its connection is warm anyway.
+    """
+    steps: Dict[str, Any] = {}
+
+    def run(name: str, step: Callable[[], Any]) -> None:
+        started = time.perf_counter()
+        try:
+            step()
+            steps[name] = round((time.perf_counter() - started) * 1000, 2)
+        except Exception as e:
+            logger.warning(f"Warm-up step {name} failed: {str(e)}")
+            steps[name] = {'error': type(e).__name__, 'ms': round((time.perf_counter() - started) * 1000, 2)}
+
+    # CountTokens goes to the bedrock-runtime endpoint but generates nothing
+    run('bedrockRuntime', lambda: bedrock_runtime.count_tokens(
+        modelId=MODEL_ID,
+        input={'invokeModel': {'body': json.dumps(build_request_body('Hello', '', 'en'))}}
+    ))
+    if KNOWLEDGE_BASE_ID:
+        run('knowledgeBase', lambda: retrieve_knowledge_base('blood donation', 1, 'SEMANTIC'))
+    if answer_cache:
+        run('answerCache', lambda: faq_store.lookup('', 'en', answer_cache.current_generation(refresh=True)))
+    elif chat_table:
+        run('dynamodb', chat_table.load)
+    if CONVERSATION_QUEUE_URL:
+        run('sqs', lambda: sqs_client.get_queue_attributes(QueueUrl=CONVERSATION_QUEUE_URL, AttributeNames=['QueueArn']))
+    # Presigning is local; this loads the credentials and the signer
+    run('s3', lambda: s3_client.generate_presigned_url(
+        'get_object', Params={'Bucket': DOCUMENTS_BUCKET or 'warmup', 'Key': 'warmup'}, ExpiresIn=60
+    ))
+    run('bedrockAgent', bedrock_agent.resolve)
+    if lexical_index:
+        run('lexicalIndex', lambda: lexical_index.retrieve('blood donation eligibility', 3, DOCUMENTS_BUCKET))
+
+    logger.info(f"Warm-up finished: {json.dumps(steps)}")
+    return {'warmed': True, 'steps': steps, 'coldStart': cold_start_report}
+
+def publish_metrics(stage_timings: Dict[str, float], metadata: Dict[str, Any]) -> None:
+    """
+    Emit the stage timings of a chat request as one EMF record. Language, cache tier and
+    route are plain properties (searchable in Logs Insights) so they add no metric cardinality.
+    """
+    if not METRICS_ENABLED:
+        return
+    emit(emf_record(
+        METRICS_NAMESPACE,
+        {'Service': 'chat'},
+        {f"{stage}Ms": ms for stage, ms in stage_timings.items()},
+        properties={
+            'language': metadata['language'],
+            'cacheTier': metadata['cacheTier'],
+            'retriever': metadata['retriever'],
+            'route': (metadata['routing'] or {}).get('route'),
+            'model': metadata['model'],
+            'budgetExceeded': metadata['budget']['exceeded']
+        }
+    ))
+
 def handle_admin_request(event: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
     """
     Handle admin-specific requests
@@ -228,6 +590,10 @@ def handle_admin_request(event: Dict[str, Any], headers: Dict[str, str]) -> Dict
         
         if '/admin/conversations' in path and http_method == 'GET':
             return get_conversations(query_params, headers)
+        elif '/admin/stats' in path and http_method == 'GET':
+            return get_conversation_stats(query_params, headers)
+        elif '/admin/usage' in path and http_method == 'GET':
+            return get_usage_report(query_params, headers)
         elif '/admin/sync' in path and http_method == 'POST':
             return handle_sync_request(event, headers)
         elif '/admin/status' in path and http_method == 'GET':
@@ -255,10 +621,12 @@ def handle_admin_request(event: Dict[str, Any], headers: Dict[str, str]) -> Dict
 
 def get_conversations(query_params: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
     """
-    Get chat conversations with page-based pagination and filtering
+    Get chat conversations with cursor-based pagination and filtering.
+    Query parameters: limit, cursor (nextCursor/prevCursor from a previous page),
+    date (day or prefix), startDate, endDate, language.
     """
     try:
-        if not chat_table:
+        if not chat_table or not chat_table.available:
             return {
                 'statusCode': 503,
                 'headers': headers,
@@ -269,62 +637,32 @@ def get_conversations(query_params: Dict[str, Any], headers: Dict[str, str]) ->
             }
         
         # Parse query parameters
-        page = int(query_params.get('page', 1))
         limit = min(int(query_params.get('limit', 10)), 100)  # Default 10, max 100 items per request
-        date_filter = query_params.get('date')
         language_filter = query_params.get('language')
-        
-        # Calculate offset for page-based pagination
-        offset = (page - 1) * limit
-        
-        # Build scan parameters - we need to get more items to support pagination
-        scan_params = {
-            'Select': 'ALL_ATTRIBUTES'
-        }
-        
-        # Add filters
-        filter_expressions = []
-        expression_values = {}
-        expression_names = {}
-        
-        if date_filter:
-            filter_expressions.append('begins_with(#date, :date)')
-            expression_values[':date'] = date_filter
-            expression_names['#date'] = 'date'
-        
-        if language_filter:
-            filter_expressions.append('#lang = :lang')
-            expression_values[':lang'] = language_filter
-            expression_names['#lang'] = 'language'
-        
-        if filter_expressions:
-            scan_params['FilterExpression'] = ' AND '.join(filter_expressions)
-            scan_params['ExpressionAttributeValues'] = expression_values
-            scan_params['ExpressionAttributeNames'] = expression_names
-        
-        # Scan the table to get all items (for accurate pagination)
-        response = chat_table.scan(**scan_params)
-        items = response.get('Items', [])
-        
-        # Continue scanning if there are more items
-        while 'LastEvaluatedKey' in response:
-            scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
-            response = chat_table.scan(**scan_params)
-            items.extend(response.get('Items', []))
-        
-        # Sort by timestamp (newest first)
-        items.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-        
-        # Calculate pagination
-        total_items = len(items)
-        total_pages = (total_items + limit - 1) // limit  # Ceiling division
-        
-        # Apply pagination
-        paginated_items = items[offset:offset + limit]
+
+        try:
+            days = resolve_day_range(
+                date_filter=query_params.get('date'),
+                start_date=query_params.get('startDate'),
+                end_date=query_params.get('endDate')
+            )
+            cursor = decode_cursor(query_params['cursor']) if query_params.get('cursor') else None
+            items, next_cursor, prev_cursor = query_conversation_page(
+                chat_table, days, limit, language=language_filter, cursor=cursor
+            )
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({
+                    'error': str(e),
+                    'success': False
+                })
+            }
         
         # Format conversations for frontend
         conversations = []
-        for item in paginated_items:
+        for item in items:
             # Convert DynamoDB item to regular Python types
             conversation = convert_dynamodb_item(item)
             conversations.append(conversation)
@@ -333,11 +671,10 @@ def get_conversations(query_params: Dict[str, Any], headers: Dict[str, str]) ->
         response_data = {
             'success': True,
             'conversations': conversations,
-            'page': page,
             'limit': limit,
-            'total': total_items,
-            'totalPages': total_pages,
-            'hasMore': page < total_pages
+            'nextCursor': next_cursor,
+            'prevCursor': prev_cursor,
+            'hasMore': next_cursor is not None
         }
         
         return {
@@ -358,6 +695,124 @@ def get_conversations(query_params: Dict[str, Any], headers: Dict[str, str]) ->
             })
         }
 
+def get_conversation_stats(query_params: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Get conversation totals and a daily time series from the pre-aggregated stats.
+    Query parameters: date (day or prefix), startDate, endDate, language.
+    """
+    try:
+        if not stats_table:
+            return {
+                'statusCode': 503,
+                'headers': headers,
+                'body': json.dumps({
+                    'error': 'Conversation stats not available',
+                    'success': False
+                })
+            }
+
+        language_filter = query_params.get('language')
+        try:
+            days = resolve_day_range(
+                date_filter=query_params.get('date'),
+                start_date=query_params.get('startDate'),
+                end_date=query_params.get('endDate')
+            )
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({
+                    'error': str(e),
+                    'success': False
+                })
+            }
+
+        stats = get_stats(dynamodb, CONVERSATION_STATS_TABLE, days, language=language_filter)
+
+        return {
+            'statusCode': 200,
+            'headers': headers,
+            'body': json.dumps({
+                'success': True,
+                'startDate': days[-1] if days else None,
+                'endDate': days[0] if days else None,
+                'language': language_filter,
+                'totals': stats['totals'],
+                'series': stats['series']
+            })
+        }
+
+    except Exception as e:
+        logger.error(f"Error getting conversation stats: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': headers,
+            'body': json.dumps({
+                'error': 'Failed to retrieve conversation stats',
+                'success': False,
+                'details': str(e) if os.environ.get('DEBUG') == 'true' else None
+            })
+        }
+
+def get_usage_report(query_params: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Get model token usage (tokens/request, output tokens/second, estimated cost) by model,
+    by language and per day from the pre-aggregated stats.
+    Query parameters: date (day or prefix), startDate, endDate.
+    """
+    try:
+        if not stats_table:
+            return {
+                'statusCode': 503,
+                'headers': headers,
+                'body': json.dumps({
+                    'error': 'Conversation stats not available',
+                    'success': False
+                })
+            }
+
+        try:
+            days = resolve_day_range(
+                date_filter=query_params.get('date'),
+                start_date=query_params.get('startDate'),
+                end_date=query_params.get('endDate')
+            )
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({
+                    'error': str(e),
+                    'success': False
+                })
+            }
+
+        usage = get_usage(dynamodb, CONVERSATION_STATS_TABLE, days, MODEL_PRICES)
+
+        return {
+            'statusCode': 200,
+            'headers': headers,
+            'body': json.dumps({
+                'success': True,
+                'startDate': days[-1] if days else None,
+                'endDate': days[0] if days else None,
+                **usage
+            })
+        }
+
+    except Exception as e:
+        logger.error(f"Error getting usage report: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': headers,
+            'body': json.dumps({
+                'error': 'Failed to retrieve usage report',
+                'success': False,
+                'details': str(e) if os.environ.get('DEBUG') == 'true' else None
+            })
+        }
+
 def handle_sync_request(event: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
     """
     Handle data sync requests - triggers ingestion jobs for knowledge base data sources
@@ -375,37 +830,18 @@ def handle_sync_request(event: Dict[str, Any], headers: Dict[str, str]) -> Dict[
         sync_type = body.get('sync_type', 'manual')  # 'manual' or 'daily'
         data_source_type = body.get('data_source_type', 'both')  # 'both', 'pdf', 'web', or 'daily'
         
-        # Initialize Bedrock Agent client
-        bedrock_agent = boto3.client('bedrock-agent')
-        
-        # Get all data sources
-        data_sources_response = bedrock_agent.list_data_sources(
-            knowledgeBaseId=KNOWLEDGE_BASE_ID
-        )
-        
-        data_sources = data_sources_response.get('dataSourceSummaries', [])
-        
-        # Determine which data sources to sync
-        sources_to_sync = []
-        
+        # Determine which data sources to sync (registry of data sources by role)
         if sync_type == 'daily' or data_source_type == 'daily':
             # Only sync the daily sync data source
-            for ds in data_sources:
-                if 'DailySync' in ds.get('name', ''):
-                    sources_to_sync.append(ds)
-                    break
+            roles = [DAILY]
+        elif data_source_type == 'both':
+            # Sync all except daily sync (that runs automatically), PDF documents first
+            roles = [PDF, WEB]
+        elif data_source_type in (PDF, WEB):
+            roles = [data_source_type]
         else:
-            # Manual sync - sync based on data_source_type
-            for ds in data_sources:
-                ds_name = ds.get('name', '')
-                if data_source_type == 'both':
-                    # Sync all except daily sync (that runs automatically)
-                    if 'DailySync' not in ds_name:
-                        sources_to_sync.append(ds)
-                elif data_source_type == 'pdf' and 'Documents' in ds_name:
-                    sources_to_sync.append(ds)
-                elif data_source_type == 'web' and 'Website' in ds_name:
-                    sources_to_sync.append(ds)
+            roles = []
+        sources_to_sync = [source.to_dict() for source in data_source_registry.by_roles(roles)]
         
         if not sources_to_sync:
             return {
@@ -423,13 +859,6 @@ def handle_sync_request(event: Dict[str, Any], headers: Dict[str, str]) -> Dict[
         
         # For "both" sync type, we want to sync PDF first, then website
         if data_source_type == 'both':
-            # Sort data sources to ensure PDF documents sync first
-            pdf_sources = [ds for ds in sources_to_sync if 'Documents' in ds.get('name', '')]
-            web_sources = [ds for ds in sources_to_sync if 'Website' in ds.get('name', '')]
-            
-            # Combine in order: PDF first, then website
-            sources_to_sync = pdf_sources + web_sources
-            
             # For manual "both" sync, recommend using sequential sync instead
             if len(sources_to_sync) > 1:
                 return {
@@ -452,6 +881,7 @@ def handle_sync_request(event: Dict[str, Any], headers: Dict[str, str]) -> Dict[
                 )
                 
                 job_id = response['ingestionJob']['ingestionJobId']
+                track_ingestion_job(ds['dataSourceId'], job_id)
                 started_jobs.append({
                     'dataSourceName': ds['name'],
                     'dataSourceId': ds['dataSourceId'],
@@ -460,6 +890,9 @@ def handle_sync_request(event: Dict[str, Any], headers: Dict[str, str]) -> Dict[
                 
             except Exception as e:
                 logger.error(f"Failed to start ingestion job for {ds['name']}: {str(e)}")
+                if isinstance(e, bedrock_agent.exceptions.ResourceNotFoundException):
+                    # The cached data source is gone (e.g. replaced by a redeploy); list again next time
+                    data_source_registry.invalidate()
                 failed_jobs.append({
                     'dataSourceName': ds['name'],
                     'error': str(e)
@@ -505,6 +938,17 @@ def handle_sync_request(event: Dict[str, Any], headers: Dict[str, str]) -> Dict[
             })
         }
 
+def track_ingestion_job(data_source_id: str, job_id: str) -> None:
+    """
+    Register a started ingestion job so the answer cache is invalidated when it completes
+    """
+    if not answer_cache:
+        return
+    try:
+        register_ingestion_job(answer_cache.table, data_source_id, job_id)
+    except Exception as e:
+        logger.error(f"Failed to register ingestion job {job_id} with answer cache: {str(e)}")
+
 def get_system_status(headers: Dict[str, str]) -> Dict[str, Any]:
     """
     Get system status (existing functionality)
@@ -521,390 +965,585 @@ def get_system_status(headers: Dict[str, str]) -> Dict[str, Any]:
         })
     }
 
-def save_conversation(session_id: str, question: str, answer: str, language: str, sources: List[Dict[str, Any]]) -> str:
+def save_conversation(session_id: str, question: str, answer: str, language: str, sources: List[Dict[str, Any]],
+                      budget: RequestBudget = None, usage: Dict[str, Any] = None, conversation_id: str = None) -> str:
     """
-    Save conversation to DynamoDB
+    Save conversation to DynamoDB. When a persistence queue is configured the item is handed
+    to SQS and written in batches by the conversation writer Lambda, so the chat reply never
+    waits on DynamoDB. The conversation ID is generated up front (or passed in by a caller
+    that saves in the background) either way.
     """
+    conversation_id = conversation_id or str(uuid.uuid4())
+    started = time.monotonic()
     try:
-        if not chat_table:
+        item = build_conversation_item(conversation_id, session_id, question, answer, language, sources, usage)
+        session_memory.record(session_id, question, answer, item['timestamp'])
+
+        if CONVERSATION_QUEUE_URL and enqueue_conversation(item):
+            return conversation_id
+
+        if not chat_table or not chat_table.available:
             logger.error("Chat table not available, skipping conversation save")
-            return str(uuid.uuid4())
-        
-        conversation_id = str(uuid.uuid4())
-        timestamp = datetime.utcnow().isoformat()
-        date = datetime.utcnow().strftime('%Y-%m-%d')
-        
-        # Clean sources for DynamoDB storage
-        cleaned_sources = []
-        for source in sources:
-            cleaned_source = {
-                "title": source.get("title", ""),
-                "url": source.get("url", ""),
-                "type": source.get("type", "WEB")
-            }
-            cleaned_sources.append(cleaned_source)
-        
-        item = {
-            'conversation_id': conversation_id,
-            'session_id': session_id,
-            'timestamp': timestamp,
-            'date': date,
-            'question': question,
-            'answer': answer,
-            'language': language,
-            'sources': cleaned_sources,
-            'ttl': int((datetime.utcnow() + timedelta(days=90)).timestamp())
-        }
-        
-        # Attempt to save to DynamoDB with retry logic
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                response = chat_table.put_item(Item=item)
-                logger.info(f"Successfully saved conversation {conversation_id} to DynamoDB")
-                return conversation_id
-            except Exception as put_error:
-                logger.error(f"Put item attempt {attempt + 1} failed: {put_error}")
-                if attempt == max_retries - 1:
-                    raise put_error
-                import time
-                time.sleep(1)
-        
+            return conversation_id
+
+        put_conversation_item(item, budget)
+
     except Exception as e:
         logger.error(f"Error saving conversation to DynamoDB: {str(e)}")
-        return str(uuid.uuid4())
+
+    finally:
+        if budget:
+            budget.record('persist', time.monotonic() - started)
+
+    return conversation_id
+
+def build_conversation_item(conversation_id: str, session_id: str, question: str, answer: str,
+                            language: str, sources: List[Dict[str, Any]],
+                            usage: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    Build the chat history item stored in DynamoDB. Model token usage is stored with it
+    when the answer came from the model (not from the answer cache or a fallback).
+    """
+    now = datetime.utcnow()
+
+    # Clean sources for DynamoDB storage
+    cleaned_sources = []
+    for source in sources:
+        cleaned_source = {
+            "title": source.get("title", ""),
+            "url": source.get("url", ""),
+            "type": source.get("type", "WEB")
+        }
+        cleaned_sources.append(cleaned_source)
+
+    item = {
+        'conversation_id': conversation_id,
+        'session_id': session_id,
+        'timestamp': now.isoformat(),
+        'date': now.strftime('%Y-%m-%d'),
+        'date_language': date_language_key(now.strftime('%Y-%m-%d'), language),
+        'question': question,
+        'answer': answer,
+        'language': language,
+        'sources': cleaned_sources,
+        'ttl': int((now + timedelta(days=90)).timestamp())
+    }
+    if usage:
+        # Integers only: the DynamoDB resource API rejects floats
+        item['usage'] = {
+            'model': usage['model'],
+            'input_tokens': usage['inputTokens'],
+            'output_tokens': usage['outputTokens'],
+            'cache_read_input_tokens': usage['cacheReadInputTokens'],
+            'cache_write_input_tokens': usage['cacheWriteInputTokens'],
+            'generate_ms': int(usage['generateMs'])
+        }
+    return item
+
+def enqueue_conversation(item: Dict[str, Any]) -> bool:
+    """
+    Hand a conversation item to the persistence queue. Returns False so the caller can
+    fall back to a direct write if the queue is unavailable.
+    """
+    try:
+        sqs_client.send_message(
+            QueueUrl=CONVERSATION_QUEUE_URL,
+            MessageBody=json.dumps(item)
+        )
+        logger.info(f"Queued conversation {item['conversation_id']} for persistence")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to queue conversation {item['conversation_id']}: {str(e)}")
+        return False
+
+def put_conversation_item(item: Dict[str, Any], budget: RequestBudget = None) -> None:
+    """
+    Write a conversation item directly with short, bounded backoff between attempts.
+    Retries stop once the request budget has no time left for them, and no write is
+    attempted while the DynamoDB write breaker is open.
+    """
+    for attempt, delay in enumerate(PERSIST_RETRY_DELAYS + (None,)):
+        try:
+            breakers['dynamodb_write'].call(chat_table.put_item, Item=item)
+            logger.info(f"Successfully saved conversation {item['conversation_id']} to DynamoDB")
+            record_conversations(stats_table, [item])
+            return
+        except Exception as put_error:
+            logger.error(f"Put item attempt {attempt + 1} failed: {put_error}")
+            if delay is None or isinstance(put_error, CircuitOpen):
+                raise put_error
+            if budget and budget.stage_timeout('persist') <= delay:
+                budget.record('persist', 0.0, exceeded=True)
+                raise put_error
+            time.sleep(delay)
+
+def parse_s3_uri(s3_uri: str) -> Tuple[str, str]:
+    """
+    Split an s3://bucket/key URI into (bucket, key)
+    """
+    bucket_name, _, object_key = s3_uri[5:].partition('/')
+    return bucket_name, object_key
 
 def generate_presigned_url(s3_uri: str) -> str:
     """
-    Generate a presigned URL for S3 objects to make them accessible to users
+    Generate a presigned URL for S3 objects to make them accessible to users.
+    URLs are cached per container and reused until PRESIGN_REFRESH_MARGIN_SECONDS
+    before they expire, so popular documents are signed once per hour at most.
     """
     try:
         # Parse S3 URI (s3://bucket-name/key)
         if not s3_uri.startswith('s3://'):
             return s3_uri  # Return as-is if not an S3 URI
 
-        # Remove s3:// prefix and split bucket and key
-        s3_path = s3_uri[5:]  # Remove 's3://'
-        bucket_name = s3_path.split('/')[0]
-        object_key = '/'.join(s3_path.split('/')[1:])
+        cache_key = parse_s3_uri(s3_uri)
+        now = time.time()
+        cached = presigned_url_cache.get(cache_key)
+        if cached and cached[1] - now > PRESIGN_REFRESH_MARGIN_SECONDS:
+            return cached[0]
+
+        bucket_name, object_key = cache_key
 
         # Generate presigned URL (valid for 1 hour)
         presigned_url = s3_client.generate_presigned_url(
             'get_object',
             Params={'Bucket': bucket_name, 'Key': object_key},
-            ExpiresIn=3600  # 1 hour
+            ExpiresIn=PRESIGNED_URL_EXPIRY_SECONDS
         )
+        presigned_url_cache[cache_key] = (presigned_url, now + PRESIGNED_URL_EXPIRY_SECONDS)
 
-        logger.info(f"Generated presigned URL for {object_key}")
+        logger.debug(f"Generated presigned URL for {object_key}")
         return presigned_url
 
     except Exception as e:
         logger.error(f"Error generating presigned URL for {s3_uri}: {str(e)}")
         return s3_uri  # Return original URI if generation fails
 
+def generate_presigned_urls(s3_uris: List[str]) -> Dict[str, str]:
+    """
+    Sign a list of S3 URIs in one pass (each distinct object at most once).
+    Returns a mapping of S3 URI to accessible URL.
+    """
+    return {s3_uri: generate_presigned_url(s3_uri) for s3_uri in dict.fromkeys(s3_uris)}
+
+def refresh_source_urls(sources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Re-sign S3 sources of a cached answer, since stored presigned URLs may have expired
+    """
+    refreshed = [dict(source) for source in sources]
+    sign_sources(refreshed)
+    return refreshed
 
-def generate_response(user_message: str, context_results: List[Dict[str, Any]], language: str) -> Dict[str, Any]:
+def sign_sources(sources: List[Dict[str, Any]]) -> None:
     """
-    Generate response using Bedrock Foundation Model with retrieved context
+    Replace the URL of every S3-backed source with a presigned URL, in place
     """
+    signed_urls = generate_presigned_urls([
+        source['uri'] for source in sources if source.get('uri', '').startswith('s3://')
+    ])
+    for source in sources:
+        if source.get('uri') in signed_urls:
+            source['url'] = signed_urls[source['uri']]
+
+def generate_response(user_message: str, context_text: str, language: str,
+                      history: SessionHistory = None, budget: RequestBudget = None,
+                      model_id: str = None, max_tokens: int = None) -> Dict[str, Any]:
+    """
+    Generate response using Bedrock Foundation Model with retrieved context. With a request
+    budget the call gives up when the generate stage runs out of time. The model and
+    max_tokens default to MODEL_ID and MAX_TOKENS.
+    """
+    model_id = model_id or MODEL_ID
     try:
-        # Build context from retrieval results
-        context_text = build_context_text(context_results)
-        
-        # Create prompt based on language
-        prompt = create_prompt(user_message, context_text, language)
+        request_body = build_request_body(user_message, context_text, language, history, max_tokens, model_id)
 
-        logger.info(f"Generating response using model: {MODEL_ID}")
+        logger.info(f"Generating response using model: {model_id}")
 
-        # Prepare request body for Claude models
-        request_body = {
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "max_tokens": MAX_TOKENS,
-            "temperature": TEMPERATURE,
-            "anthropic_version": "bedrock-2023-05-31"
-        }
+        def invoke_model(model: str) -> Dict[str, Any]:
+            response = bedrock_runtime.invoke_model(
+                modelId=model,
+                body=json.dumps(request_body),
+                contentType='application/json',
+                accept='application/json'
+            )
+            return json.loads(response['body'].read())
 
-        # Invoke the model
-        response = bedrock_runtime.invoke_model(
-            modelId=MODEL_ID,
-            body=json.dumps(request_body),
-            contentType='application/json',
-            accept='application/json'
-        )
+        def invoke() -> Tuple[Dict[str, Any], Dict[str, Any]]:
+            return hedged_invoke(model_id, invoke_model)
 
-        # Parse response
-        response_body = json.loads(response['body'].read())
+        # Invoke the model
+        response_body, hedge = budget.call('generate', invoke) if budget else invoke()
         generated_text = response_body['content'][0]['text']
 
         logger.info(f"Response generated successfully: {len(generated_text)} characters")
 
         return {
             'response': generated_text,
-            'model_response': response_body
+            'model_response': response_body,
+            'usage': summarize_usage(response_body.get('usage', {})),
+            'model': hedge['modelId'],
+            'hedge': hedge
+        }
+
+    except CircuitOpen as e:
+        logger.warning(f"Skipping generation, {str(e)}")
+        return {
+            'response': get_fallback_response(language),
+            'model_response': None,
+            'usage': None,
+            'model': model_id,
+            'hedge': None
+        }
+
+    except StageTimeout as e:
+        logger.error(f"Model did not answer in time: {str(e)}")
+        return {
+            'response': get_timeout_response(language),
+            'model_response': None,
+            'usage': None,
+            'model': model_id,
+            'hedge': None
         }
 
     except Exception as e:
         logger.error(f"Error generating response: {str(e)}")
         return {
             'response': get_fallback_response(language),
-            'model_response': None
+            'model_response': None,
+            'usage': None,
+            'model': model_id,
+            'hedge': None
         }
 
-def build_context_text(context_results: List[Dict[str, Any]]) -> str:
+def generate_response_stream(user_message: str, context_text: str, language: str,
+                             on_delta: Callable[[str], None], history: SessionHistory = None,
+                             budget: RequestBudget = None, model_id: str = None,
+                             max_tokens: int = None) -> Dict[str, Any]:
     """
-    Build context text from retrieval results
+    Generate response with the Bedrock response-stream API, passing each text delta to
+    on_delta as the model writes it. Returns the same shape as generate_response. Streams
+    are not hedged (the client would see both answers); with a request budget the stream is
+    cut off when the generate stage runs out of time, keeping the text already sent.
     """
-    if not context_results:
-        return "No specific context available."
+    model_id = model_id or MODEL_ID
+    timeout = budget.stage_timeout('generate') if budget else None
+    started = time.monotonic()
+    text_parts: List[str] = []
+    usage: Dict[str, Any] = {}
+    outcome = {'stopReason': None, 'timedOut': False}
+
+    def stream(model: str) -> None:
+        response = bedrock_runtime.invoke_model_with_response_stream(
+            modelId=model,
+            body=json.dumps(request_body),
+            contentType='application/json',
+            accept='application/json'
+        )
+        events = response['body']
+        for stream_event in events:
+            chunk = stream_event.get('chunk')
+            if chunk:
+                payload = json.loads(chunk['bytes'])
+                payload_type = payload.get('type')
+                if payload_type == 'content_block_delta' and payload['delta'].get('type') == 'text_delta':
+                    text_parts.append(payload['delta']['text'])
+                    on_delta(payload['delta']['text'])
+                elif payload_type == 'message_start':
+                    usage.update(payload['message'].get('usage', {}))
+                elif payload_type == 'message_delta':
+                    usage.update(payload.get('usage', {}))
+                    outcome['stopReason'] = payload.get('delta', {}).get('stop_reason')
+            if timeout is not None and time.monotonic() - started > timeout:
+                outcome['timedOut'] = True
+                events.close()
+                return
+
+    fallback = None
+    try:
+        request_body = build_request_body(user_message, context_text, language, history, max_tokens, model_id)
 
-    context_parts = []
-    for i, result in enumerate(context_results, 1):
-        content = result.get('content', {}).get('text', '')
-        if content:
-            context_parts.append(f"Context {i}: {content}")
+        logger.info(f"Streaming response using model: {model_id}")
 
-    return "\n\n".join(context_parts)
+        if timeout is not None and timeout <= 0:
+            outcome['timedOut'] = True
+        else:
+            breakers['invoke_model'].call(stream, model_id)
 
-def create_prompt(user_message: str, context: str, language: str) -> str:
-    """
-    Create appropriate prompt based on language and context
-    """
-    if language == 'es':
-        return f"""Eres un asistente experto en donación de sangre para America's Blood Centers. Responde en español basándote en el contexto proporcionado.
+    except CircuitOpen as e:
+        logger.warning(f"Skipping generation, {str(e)}")
+        fallback = get_fallback_response(language)
 
-Contexto:
-{context}
+    except Exception as e:
+        logger.error(f"Error streaming response: {str(e)}")
+        fallback = get_fallback_response(language)
+
+    if budget:
+        budget.record('generate', time.monotonic() - started, exceeded=outcome['timedOut'])
+    if outcome['timedOut']:
+        logger.error(f"Model stream cut off after the generate budget of {timeout * 1000:.0f} ms")
+        fallback = get_timeout_response(language)
+
+    generated_text = ''.join(text_parts)
+    if fallback is not None:
+        # Keep a partial answer the client has already seen rather than replacing it with an apology
+        return {
+            'response': generated_text or fallback,
+            'model_response': None,
+            'usage': summarize_usage(usage) if usage else None,
+            'model': model_id,
+            'hedge': None
+        }
 
-Pregunta del usuario: {user_message}
+    logger.info(f"Response streamed successfully: {len(generated_text)} characters")
 
-Instrucciones:
-- Responde SOLO en español
-- Usa la información del contexto proporcionado
-- Si la pregunta es sobre ubicaciones de donación, menciona el localizador de centros de sangre
-- Sé preciso y útil
-- Si no tienes información suficiente en el contexto, dilo claramente
-- Usa formato markdown cuando sea apropiado (listas, texto en negrita, etc.)
-- Organiza la información de manera clara y fácil de leer
+    # Same body as the buffered invoke_model response
+    model_response = {
+        'content': [{'type': 'text', 'text': generated_text}],
+        'stop_reason': outcome['stopReason'],
+        'usage': usage
+    }
+    return {
+        'response': generated_text,
+        'model_response': model_response,
+        'usage': summarize_usage(usage),
+        'model': model_id,
+        'hedge': {'hedged': False, 'modelId': model_id}
+    }
 
-Respuesta:"""
-    else:
-        return f"""You are an expert blood donation assistant for America's Blood Centers. Answer based on the provided context.
+def hedge_model_for(model_id: str) -> str:
+    """
+    Secondary model a slow call to model_id is hedged with, or None
+    """
+    secondary = HEDGE_MODEL_ID or (FAST_MODEL_ID if model_id != FAST_MODEL_ID else MODEL_ID)
+    return secondary if secondary and secondary != model_id else None
 
-Context:
-{context}
+def hedged_invoke(model_id: str, invoke: Callable[[str], Any]) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Call invoke(model_id) through the invoke_model breaker, hedged with the secondary model
+    when the primary is slower than its recent latency percentile. Returns (result, hedge
+    info with the model that answered).
+    """
+    breaker = breakers['invoke_model']
+    secondary_id = hedge_model_for(model_id) if HEDGING_ENABLED else None
+    if not secondary_id:
+        return breaker.call(invoke, model_id), {'hedged': False, 'modelId': model_id}
+
+    result, info = hedger.call(model_id, lambda: breaker.call(invoke, model_id),
+                               lambda: breaker.call(invoke, secondary_id))
+    info['modelId'] = secondary_id if info.get('winner') == 'secondary' else model_id
+    return result, info
+
+def select_model(user_message: str, retrieval_plan: Dict[str, Any],
+                 context_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Route the question to FAST_MODEL_ID or MODEL_ID (see model_router). Returns the routing
+    decision with the chosen modelId and maxTokens.
+    """
+    if not MODEL_ROUTING_ENABLED or not FAST_MODEL_ID:
+        return {'route': 'default', 'reasons': [], 'modelId': MODEL_ID, 'maxTokens': MAX_TOKENS}
 
-User question: {user_message}
+    top_score = max((result.get('score', 0) for result in context_results), default=0)
+    routing = route_query(retrieval_plan['features'], user_message, top_score, retrieval_plan['retriever'])
+    if routing['route'] == 'simple':
+        routing.update(modelId=FAST_MODEL_ID, maxTokens=FAST_MAX_TOKENS)
+    else:
+        routing.update(modelId=MODEL_ID, maxTokens=MAX_TOKENS)
 
-Instructions:
-- Answer based on the provided context
-- If asked about donation locations, mention the blood center locator
-- Be accurate and helpful
-- If you don't have sufficient information in the context, say so clearly
-- Focus on blood donation, eligibility, and America's Blood Centers information
-- Use markdown formatting when appropriate (lists, bold text, etc.)
-- Organize information clearly and make it easy to read
+    logger.info(f"Routed question as {routing['route']} to {routing['modelId']} "
+                f"(max_tokens {routing['maxTokens']}, reasons: {routing['reasons']})")
+    return routing
 
-Answer:"""
+def is_cacheable_answer(retrieval_plan: Dict[str, Any], context_results: List[Dict[str, Any]],
+                        response_data: Dict[str, Any]) -> bool:
+    """
+    Whether an answer may be cached or precomputed: a real model answer generated from
+    non-empty knowledge base context
+    """
+    return (response_data['model_response'] is not None
+            and retrieval_plan['retriever'] == 'knowledge_base'
+            and bool(context_results))
 
-def extract_sources(context_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def build_context_text(context_results: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
-    Extract source information from context results with enhanced URL handling and pagination normalization
+    Build context text from retrieval results, packed into CONTEXT_TOKEN_BUDGET with
+    near-duplicate chunks removed. Returns the pack_context result ('text' plus token counts).
     """
-    sources = []
+    packed = pack_context(context_results, CONTEXT_TOKEN_BUDGET, CONTEXT_DUPLICATE_THRESHOLD)
+    if not packed['text']:
+        packed['text'] = "No specific context available."
+    return packed
 
-    for result in context_results:
-        location = result.get('location', {})
-        metadata = result.get('metadata', {})
+def build_system_prompt(language: str) -> List[Dict[str, Any]]:
+    """
+    Stable per-language system prompt
+    """
+    return [{"type": "text", "text": SYSTEM_PROMPTS['es' if language == 'es' else 'en']}]
 
-        # Extract source information from different possible locations
-        source_url = None
-        source_title = None
+def prompt_cache_min_tokens(model_id: str) -> int:
+    """
+    Minimum cacheable prefix of a model
+    """
+    if model_id in PROMPT_CACHE_MIN_TOKENS:
+        return PROMPT_CACHE_MIN_TOKENS[model_id]
+    for family, min_tokens in PROMPT_CACHE_MIN_TOKENS.items():
+        if family in model_id:
+            return min_tokens
+    return DEFAULT_PROMPT_CACHE_MIN_TOKENS
+
+def add_cache_checkpoint(system: List[Dict[str, Any]], messages: List[Dict[str, Any]], model_id: str) -> None:
+    """
+    Mark the end of the reusable prefix (system prompt plus session history, everything
+    before the variable user turn) as a prompt-cache checkpoint, when that prefix is long
+    enough for the model to cache it. A follow-up turn, a retry or a hedged call then
+    reads the prefix from the cache instead of paying for it again.
+    """
+    history = messages[:-1]
+    prefix_tokens = estimate_tokens("\n".join(
+        [block['text'] for block in system] + [message['content'] for message in history]
+    ))
+    if prefix_tokens < prompt_cache_min_tokens(model_id):
+        return
+
+    if history:
+        last = history[-1]
+        last['content'] = [{"type": "text", "text": last['content'], "cache_control": {"type": "ephemeral"}}]
+    else:
+        system[-1]['cache_control'] = {"type": "ephemeral"}
 
-        # Try different ways to get the source URL
-        if 's3Location' in location:
-            # S3 document source
-            s3_uri = location['s3Location'].get('uri', '')
-            if s3_uri:
-                source_url = s3_uri
-                # Extract filename for title
-                if 'pdfs/' in s3_uri:
-                    filename = s3_uri.split('/')[-1]
-                    source_title = filename.replace('.pdf', '')
-                else:
-                    filename = s3_uri.split('/')[-1] if '/' in s3_uri else s3_uri
-                    source_title = filename.replace('.pdf', '')
-
-        elif 'webLocation' in location:
-            # Web crawler source
-            source_url = location['webLocation'].get('url', '')
-            source_title = metadata.get('title', metadata.get('source', 'Web Page'))
-
-        # Fallback: check metadata for source information
-        if not source_url:
-            # Try various metadata fields
-            source_url = (metadata.get('x-amz-bedrock-kb-source-uri') or 
-                         metadata.get('source') or 
-                         metadata.get('uri') or 
-                         metadata.get('url', ''))
-
-            if source_url and 's3://' in source_url:
-                filename = source_url.split('/')[-1] if '/' in source_url else source_url
-                source_title = filename.replace('.pdf', '')
-            else:
-                source_title = metadata.get('title', metadata.get('source', 'Document'))
+def create_prompt(user_message: str, context: str, language: str) -> str:
+    """
+    Create the variable user turn (retrieved context and question) for the given language
+    """
+    if language == 'es':
+        return f"""Contexto:
+{context}
 
-        # Add source if we found a URL
-        if source_url:
-            # Normalize paginated URLs to base URL
-            normalized_url = normalize_paginated_url(source_url)
-            
-            # Determine source type
-            is_document = any(ext in source_url.lower() for ext in ['.pdf', '.docx', '.txt']) or 's3://' in source_url
-
-            # Generate presigned URL for S3 documents
-            accessible_url = normalized_url
-            if source_url.startswith('s3://'):
-                accessible_url = generate_presigned_url(source_url)
-                logger.info(f"Converted S3 URI to presigned URL: {source_url} -> {accessible_url[:100]}...")
-
-            # Update title for normalized URLs
-            if normalized_url != source_url:
-                source_title = get_normalized_title(normalized_url, source_title)
-
-            sources.append({
-                "title": source_title or f"Source {len(sources) + 1}",
-                "url": accessible_url,
-                "uri": source_url,  # Keep original URI for reference
-                "type": "DOCUMENT" if is_document else "WEB",
-                "score": result.get('score', 0)
-            })
+Pregunta del usuario: {user_message}
+
+Respuesta:"""
+    else:
+        return f"""Context:
+{context}
 
-            logger.info(f"Extracted source: {source_title} - {accessible_url[:100]}...")
+User question: {user_message}
 
-    # Enhanced deduplication logic - prefer public URLs over S3 presigned URLs and normalize paginated URLs
-    unique_sources = []
-    seen_documents = {}
+Answer:"""
 
-    for source in sorted(sources, key=lambda x: x.get('score', 0), reverse=True):
-        # Create a unique key for the document (filename-based for S3, normalized URL for web)
-        doc_key = None
+def build_request_body(user_message: str, context_text: str, language: str,
+                       history: SessionHistory = None, max_tokens: int = None,
+                       model_id: str = None) -> Dict[str, Any]:
+    """
+    Anthropic messages request: system prompt, bounded session history, then the
+    variable user turn, with a prompt-cache checkpoint after the history
+    """
+    system = build_system_prompt(language)
+    messages = history_messages(history, language) + [
+        {
+            "role": "user",
+            "content": create_prompt(user_message, context_text, language)
+        }
+    ]
+    if PROMPT_CACHE_ENABLED:
+        add_cache_checkpoint(system, messages, model_id or MODEL_ID)
 
-        # Extract filename for deduplication key
-        if 's3://' in source['uri'] or 'amazonaws.com' in source['url']:
-            # S3 document - extract filename
-            if 's3://' in source['uri']:
-                doc_key = source['uri'].split('/')[-1].lower()
-            else:
-                doc_key = source['url'].split('/')[-1].split('?')[0].lower()  # Remove query params
-        else:
-            # Web URL - use normalized URL as key to deduplicate paginated pages
-            normalized_url = normalize_paginated_url(source['url'])
-            try:
-                from urllib.parse import urlparse
-                parsed = urlparse(normalized_url)
-                doc_key = f"{parsed.netloc}{parsed.path}".lower()
-                # Remove trailing slash for consistency
-                doc_key = doc_key.rstrip('/')
-            except:
-                doc_key = normalized_url.lower()
-
-        if doc_key and doc_key not in seen_documents:
-            unique_sources.append(source)
-            seen_documents[doc_key] = source
-            logger.info(f"Added unique source: {source['title']} (key: {doc_key})")
-        elif doc_key and doc_key in seen_documents:
-            existing_source = seen_documents[doc_key]
-
-            # Prefer public web URLs over S3 presigned URLs
-            is_current_public = not ('amazonaws.com' in source['url'] or 's3://' in source['uri'])
-            is_existing_s3 = 'amazonaws.com' in existing_source['url'] or 's3://' in existing_source['uri']
-
-            if is_current_public and is_existing_s3:
-                # Replace S3 URL with public URL
-                for i, us in enumerate(unique_sources):
-                    if us == existing_source:
-                        unique_sources[i] = source
-                        seen_documents[doc_key] = source
-                        logger.info(f"Replaced S3 URL with public URL: {source['title']} (key: {doc_key})")
-                        break
-            else:
-                logger.info(f"Skipped duplicate source: {source['title']} (key: {doc_key})")
-        else:
-            logger.info(f"Skipped source with no valid key: {source['title']}")
+    return {
+        "system": system,
+        "messages": messages,
+        "max_tokens": max_tokens or MAX_TOKENS,
+        "temperature": TEMPERATURE,
+        "anthropic_version": "bedrock-2023-05-31"
+    }
 
-    logger.info(f"Final sources count: {len(unique_sources)} (reduced from {len(sources)})")
-    return unique_sources
+def summarize_usage(usage: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Token usage reported by the model, including prompt-cache reads and writes
+    """
+    summary = {
+        "inputTokens": int(usage.get('input_tokens', 0) or 0),
+        "outputTokens": int(usage.get('output_tokens', 0) or 0),
+        "cacheReadInputTokens": int(usage.get('cache_read_input_tokens', 0) or 0),
+        "cacheWriteInputTokens": int(usage.get('cache_creation_input_tokens', 0) or 0)
+    }
+    logger.info(f"Model token usage: {summary}")
+    return summary
 
-def normalize_paginated_url(url: str) -> str:
+def retrieve_knowledge_base(query: str, number_of_results: int, search_type: str) -> List[Dict[str, Any]]:
     """
-    Normalize paginated URLs to their base URL
-    Examples:
-    - https://americasblood.org/news/paged-2/5/ -> https://americasblood.org/news/
-    - https://americasblood.org/news/page/2/ -> https://americasblood.org/news/
-    - https://americasblood.org/category/updates/page/3/ -> https://americasblood.org/category/updates/
+    Single knowledge base retrieve call, through the retrieve breaker
     """
-    if not url:
-        return url
-    
-    # Common pagination patterns to remove
-    pagination_patterns = [
-        r'/paged-\d+/\d+/?$',  # /paged-2/5/
-        r'/page/\d+/?$',       # /page/2/
-        r'/p\d+/?$',           # /p2/
-        r'\?page=\d+',         # ?page=2
-        r'&page=\d+',          # &page=2
-        r'\?p=\d+',            # ?p=2
-        r'&p=\d+',             # &p=2
-    ]
-    
-    normalized_url = url
-    for pattern in pagination_patterns:
-        normalized_url = re.sub(pattern, '', normalized_url)
-    
-    # Clean up any trailing slashes or query parameters that might be left
-    normalized_url = normalized_url.rstrip('/')
-    
-    # If we removed pagination and the URL doesn't end with a meaningful path, add trailing slash
-    if normalized_url and not normalized_url.endswith(('.html', '.htm', '.php', '.aspx')):
-        normalized_url += '/'
-    
-    return normalized_url
+    retrieve_response = breakers['retrieve'].call(
+        bedrock_agent_runtime.retrieve,
+        knowledgeBaseId=KNOWLEDGE_BASE_ID,
+        retrievalQuery={'text': query},
+        retrievalConfiguration={
+            'vectorSearchConfiguration': {
+                'numberOfResults': number_of_results,
+                'overrideSearchType': search_type
+            }
+        }
+    )
+    return retrieve_response.get('retrievalResults', [])
 
-def get_normalized_title(normalized_url: str, original_title: str) -> str:
+def retrieve_context(user_message: str, budget: RequestBudget = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
     """
-    Get an appropriate title for a normalized URL
+    Retrieve context with an adaptive depth: a small first retrieval sized from the question,
+    widened to MAX_RESULTS only when its scores are low or flat. Returns (results, plan).
+
+    The local lexical index is searched alongside (well under a millisecond). Knowledge base
+    results that also match lexically are boosted; when the knowledge base fails (throttling,
+    timeouts) or returns nothing, the lexical hits are used instead so the model still gets context.
+    With a request budget, a retrieve that overruns the retrieve stage counts as a failure.
     """
-    if not normalized_url:
-        return original_title
-    
+    def retrieve(number_of_results: int) -> List[Dict[str, Any]]:
+        if budget:
+            return budget.call('retrieve', retrieve_knowledge_base, user_message, number_of_results, plan['searchType'])
+        return retrieve_knowledge_base(user_message, number_of_results, plan['searchType'])
+
+    plan = plan_retrieval(user_message)
+    plan['widened'] = False
+    plan['retriever'] = 'knowledge_base'
+    lexical_results = (lexical_index.retrieve(user_message, plan['numberOfResults'], DOCUMENTS_BUCKET)
+                       if lexical_index else [])
+
     try:
-        from urllib.parse import urlparse
-        parsed = urlparse(normalized_url)
-        path = parsed.path.strip('/')
-        
-        # Create a clean title based on the normalized URL path
-        if '/news' in path:
-            return "America's Blood Centers - News"
-        elif '/for-donors' in path:
-            return "America's Blood Centers - For Donors"
-        elif '/one-pagers-faqs' in path:
-            return "America's Blood Centers - FAQs"
-        elif '/newsroom' in path:
-            return "America's Blood Centers - Newsroom"
-        else:
-            # Use the original title but clean it up
-            if 'Page' in original_title and any(char.isdigit() for char in original_title):
-                # Remove page numbers from titles
-                clean_title = re.sub(r'\s*-?\s*Page\s*\d+.*$', '', original_title, flags=re.IGNORECASE)
-                return clean_title.strip() or original_title
-            return original_title
-    except:
-        return original_title
+        context_results = retrieve(plan['numberOfResults'])
+    except Exception as e:
+        logger.error(f"Knowledge base retrieve failed, falling back to lexical index: {str(e)}")
+        plan['retriever'] = 'lexical'
+        return lexical_results, plan
+
+    scores = [result.get('score', 0) for result in context_results]
+    if scores and should_widen(scores, plan['numberOfResults']):
+        try:
+            context_results = retrieve(MAX_RESULTS)
+            plan['widened'] = True
+        except Exception as e:
+            logger.error(f"Widened retrieve failed, keeping initial results: {str(e)}")
+
+    if not context_results and lexical_results:
+        plan['retriever'] = 'lexical'
+        context_results = lexical_results
+    elif lexical_results:
+        context_results = boost_results(context_results, lexical_results, LEXICAL_BOOST_WEIGHT)
+
+    logger.info(f"Retrieved {len(context_results)} results ({plan['retriever']}, {plan['searchType']}, "
+                f"initial depth {plan['numberOfResults']}, widened: {plan['widened']})")
+    return context_results, plan
+
+def extract_sources(context_results: List[Dict[str, Any]], timings: StageTimings = None) -> List[Dict[str, Any]]:
+    """
+    Extract deduplicated source information from context results and sign the S3 documents among them
+    """
+    timings = timings or StageTimings()
+    with timings.span('extractSources'):
+        sources = [source.to_dict() for source in resolve_sources(context_results)]
+    with timings.span('presign'):
+        sign_sources(sources)
+
+    logger.info(f"Final sources count: {len(sources)} (from {len(context_results)} results)")
+    if logger.isEnabledFor(logging.DEBUG):
+        for source in sources:
+            logger.debug(f"Source: {source['title']} ({source['type']}) {source['url'][:120]}")
+    return sources
 
 def add_blood_center_link_if_needed(user_message: str, sources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
@@ -944,6 +1583,15 @@ def get_fallback_response(language: str) -> str:
     else:
         return "I'm sorry, I'm having trouble responding right now. Please try again later or contact America's Blood Centers directly."
 
+def get_timeout_response(language: str) -> str:
+    """
+    Get fallback response when the model did not answer within the request budget
+    """
+    if language == 'es':
+        return "Lo siento, la respuesta está tardando más de lo normal. Las fuentes a continuación pueden ayudarte, o inténtalo de nuevo en un momento."
+    else:
+        return "I'm sorry, this answer is taking longer than usual. The sources below may help, or please try again in a moment."
+
 def process_markdown_response(response: str) -> str:
     """
     Process the response to ensure proper markdown formatting for the frontend
@@ -989,4 +1637,9 @@ def has_markdown_formatting(text: str) -> bool:
         if re.search(pattern, text, re.MULTILINE):
             return True
     
-    return False
\ No newline at end of file
+    return False
+
+# Provisioned concurrency runs the module outside of any request; finish warming the
+# container here so its first real request finds everything hot
+if cold_start_report['initializationType'] == 'provisioned-concurrency':
+    warm_up()
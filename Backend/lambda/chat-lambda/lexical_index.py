@@ -0,0 +1,247 @@
+"""
+Lexical Index
+Offline-built BM25 index over the data-sources corpus (PDF passages and daily-sync pages),
+used by the chat Lambda as a fallback retriever when the knowledge base is throttled or
+slow, and to boost knowledge base results that also match the question lexically.
+
+The index is a single little-endian binary file that is memory-mapped at load, so a cold
+start only parses the header; term lookups binary-search the sorted term table in place
+and only the postings of the query terms and the passages of the returned hits are read.
+
+Layout:
+    header      MAGIC, doc_count, term_count, avg_doc_length, k1, b, section offsets
+    term index  term_count x (term_offset u32, term_length u32, postings_offset u32, df u32)
+    term blob   utf-8 terms, sorted
+    postings    per term: df x (doc_id u32, tf u32)
+    doc index   doc_count x (length u32, record_offset u32, record_length u32)
+    doc blob    utf-8 JSON records {"uri", "title", "text"}
+"""
+
+import json
+import math
+import mmap
+import re
+import struct
+from collections import Counter
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+MAGIC = b'ABCBM25\x01'
+_HEADER = struct.Struct('<8sIIfff5I')
+_TERM_ENTRY = struct.Struct('<4I')
+_DOC_ENTRY = struct.Struct('<3I')
+
+DEFAULT_K1 = 1.2
+DEFAULT_B = 0.75
+
+_TOKEN_PATTERN = re.compile(r'\w+')
+
+# Function words in English and Spanish carry no retrieval signal
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in is it its me my no not of on or
+our should so that the their there these they this to was we what when where which who why will with you your
+al con de del el en es la las lo los mi mis para pero por que qué se si sin su sus un una uno y o
+cómo como cuál cuáles cuándo dónde puedo tengo hay está son ser
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word tokens without stopwords; hyphenated terms (alpha-gal) also yield the joined form
+    """
+    folded = (text or '').casefold()
+    tokens = [token for token in _TOKEN_PATTERN.findall(folded) if token not in STOPWORDS and len(token) > 1]
+    tokens.extend(part.replace('-', '') for part in re.findall(r'\w+(?:-\w+)+', folded))
+    return tokens
+
+
+def build_index(documents: Iterable[Dict[str, str]], path: str,
+                k1: float = DEFAULT_K1, b: float = DEFAULT_B) -> Dict[str, int]:
+    """
+    Build the index file from passages ({"uri", "title", "text"}). Returns size statistics.
+    """
+    records: List[bytes] = []
+    lengths: List[int] = []
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+
+    for doc_id, document in enumerate(documents):
+        tokens = tokenize(document['text'])
+        lengths.append(len(tokens))
+        records.append(json.dumps(
+            {'uri': document['uri'], 'title': document.get('title', ''), 'text': document['text']},
+            ensure_ascii=False, separators=(',', ':')
+        ).encode('utf-8'))
+        for term, tf in Counter(tokens).items():
+            postings.setdefault(term, []).append((doc_id, tf))
+
+    terms = sorted(postings)
+    term_bytes = [term.encode('utf-8') for term in terms]
+    avg_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+
+    term_index_offset = _HEADER.size
+    term_blob_offset = term_index_offset + _TERM_ENTRY.size * len(terms)
+    postings_offset = term_blob_offset + sum(len(t) for t in term_bytes)
+    postings_offset += -postings_offset % 4
+    doc_index_offset = postings_offset + 8 * sum(len(p) for p in postings.values())
+    doc_blob_offset = doc_index_offset + _DOC_ENTRY.size * len(records)
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(records), len(terms), avg_length, k1, b,
+                             term_index_offset, term_blob_offset, postings_offset,
+                             doc_index_offset, doc_blob_offset))
+
+        term_position = 0
+        posting_position = 0
+        for term, encoded in zip(terms, term_bytes):
+            f.write(_TERM_ENTRY.pack(term_position, len(encoded), posting_position, len(postings[term])))
+            term_position += len(encoded)
+            posting_position += 8 * len(postings[term])
+        for encoded in term_bytes:
+            f.write(encoded)
+        f.write(b'\0' * (-f.tell() % 4))
+
+        for term in terms:
+            f.write(struct.pack(f'<{2 * len(postings[term])}I',
+                                *(value for pair in postings[term] for value in pair)))
+
+        record_position = 0
+        for length, record in zip(lengths, records):
+            f.write(_DOC_ENTRY.pack(length, record_position, len(record)))
+            record_position += len(record)
+        for record in records:
+            f.write(record)
+
+        size = f.tell()
+
+    return {'documents': len(records), 'terms': len(terms), 'bytes': size}
+
+
+class LexicalIndex:
+    """
+    Read-only BM25 index over a memory-mapped index file
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, self.doc_count, self.term_count, self.avg_doc_length, self.k1, self.b,
+         self._term_index, self._term_blob, self._postings, self._doc_index,
+         self._doc_blob) = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a lexical index file")
+
+    def _term_bytes(self, i: int) -> bytes:
+        offset, length, _, _ = _TERM_ENTRY.unpack_from(self._map, self._term_index + i * _TERM_ENTRY.size)
+        start = self._term_blob + offset
+        return self._map[start:start + length]
+
+    def _lookup(self, term: str) -> Optional[Tuple[int, int]]:
+        """
+        (postings_offset, df) of a term, or None when the term is not indexed.
+        Binary search over the sorted term table, directly on the mapped bytes.
+        """
+        encoded = term.encode('utf-8')
+        lo, hi = 0, self.term_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term_bytes(mid) < encoded:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self.term_count or self._term_bytes(lo) != encoded:
+            return None
+        _, _, postings_offset, df = _TERM_ENTRY.unpack_from(self._map, self._term_index + lo * _TERM_ENTRY.size)
+        return postings_offset, df
+
+    def _doc_length(self, doc_id: int) -> int:
+        return _DOC_ENTRY.unpack_from(self._map, self._doc_index + doc_id * _DOC_ENTRY.size)[0]
+
+    def document(self, doc_id: int) -> Dict[str, str]:
+        _, offset, length = _DOC_ENTRY.unpack_from(self._map, self._doc_index + doc_id * _DOC_ENTRY.size)
+        start = self._doc_blob + offset
+        return json.loads(self._map[start:start + length].decode('utf-8'))
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """
+        Top-k (doc_id, bm25_score) for a query, best first
+        """
+        scores: Dict[int, float] = {}
+        lengths: Dict[int, int] = {}
+        avg_length = self.avg_doc_length or 1.0
+
+        for term in set(tokenize(query)):
+            entry = self._lookup(term)
+            if entry is None:
+                continue
+            postings_offset, df = entry
+            idf = math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+            values = struct.unpack_from(f'<{2 * df}I', self._map, self._postings + postings_offset)
+            for doc_id, tf in zip(values[::2], values[1::2]):
+                length = lengths.get(doc_id)
+                if length is None:
+                    length = lengths[doc_id] = self._doc_length(doc_id)
+                norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def retrieve(self, query: str, k: int = 10, documents_bucket: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Search and shape the hits like knowledge base retrievalResults. Scores are scaled
+        into 0-1 relative to the best hit; document passages point at their S3 copy when
+        the bucket is known.
+        """
+        hits = self.search(query, k)
+        if not hits:
+            return []
+
+        best = hits[0][1]
+        results = []
+        for doc_id, score in hits:
+            document = self.document(doc_id)
+            uri = document['uri']
+            if uri.startswith('http'):
+                location = {'type': 'WEB', 'webLocation': {'url': uri}}
+            elif documents_bucket:
+                location = {'type': 'S3', 's3Location': {'uri': f"s3://{documents_bucket}/{uri}"}}
+            else:
+                location = {}
+            results.append({
+                'content': {'text': document['text']},
+                'location': location,
+                'metadata': {'title': document.get('title', ''), 'source': uri, 'retriever': 'lexical'},
+                'score': round(score / best, 4)
+            })
+        return results
+
+
+def source_key(result: Dict[str, Any]) -> str:
+    """
+    Document identity of a retrieval result (file name for S3 documents, URL for web pages)
+    """
+    location = result.get('location', {})
+    if 's3Location' in location:
+        return location['s3Location'].get('uri', '').rsplit('/', 1)[-1].lower()
+    if 'webLocation' in location:
+        return location['webLocation'].get('url', '').rstrip('/').lower()
+    return ''
+
+
+def boost_results(results: List[Dict[str, Any]], lexical_results: List[Dict[str, Any]],
+                  weight: float = 0.1) -> List[Dict[str, Any]]:
+    """
+    Raise the score of knowledge base results whose document is also a lexical hit, in
+    proportion to the lexical score, and re-sort. Boosted copies are returned; the input
+    results are not modified.
+    """
+    lexical_scores: Dict[str, float] = {}
+    for result in lexical_results:
+        key = source_key(result)
+        if key:
+            lexical_scores[key] = max(lexical_scores.get(key, 0.0), result['score'])
+
+    boosted = []
+    for result in results:
+        bonus = weight * lexical_scores.get(source_key(result), 0.0)
+        boosted.append({**result, 'score': result.get('score', 0) + bonus} if bonus else result)
+    return sorted(boosted, key=lambda r: r.get('score', 0), reverse=True)
@@ -0,0 +1,85 @@
+"""
+Metrics
+Per-stage timing spans for the chat pipeline and CloudWatch Embedded Metric Format (EMF)
+output. A span is two perf_counter() reads and a dict update, so timing every stage costs
+about a microsecond per request. EMF records are single JSON lines written to stdout; the
+Lambda log agent turns them into CloudWatch metrics without any API call.
+"""
+
+import json
+import sys
+import time
+from typing import Dict, Any, Optional
+
+
+class Span:
+    """
+    Context manager adding its elapsed time to a stage of a StageTimings
+    """
+    __slots__ = ('_timings', '_stage', '_started')
+
+    def __init__(self, timings: 'StageTimings', stage: str):
+        self._timings = timings
+        self._stage = stage
+
+    def __enter__(self) -> 'Span':
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._timings.add(self._stage, time.perf_counter() - self._started)
+
+
+class StageTimings:
+    """
+    Milliseconds per pipeline stage of one request; repeated spans of a stage add up
+    """
+    __slots__ = ('started', 'stages')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def span(self, stage: str) -> Span:
+        return Span(self, stage)
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds * 1000
+
+    def as_dict(self) -> Dict[str, float]:
+        """
+        Stage milliseconds plus the total since the timings were created
+        """
+        timings = {stage: round(ms, 3) for stage, ms in self.stages.items()}
+        timings['total'] = round((time.perf_counter() - self.started) * 1000, 3)
+        return timings
+
+
+def emf_record(namespace: str, dimensions: Dict[str, str], metrics: Dict[str, float],
+               unit: str = 'Milliseconds', properties: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    One EMF log record: every metric under a single dimension set, properties as plain
+    (searchable, not aggregated) fields
+    """
+    record: Dict[str, Any] = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': namespace,
+                'Dimensions': [list(dimensions)],
+                'Metrics': [{'Name': name, 'Unit': unit} for name in metrics]
+            }]
+        }
+    }
+    record.update(properties or {})
+    record.update(dimensions)
+    record.update(metrics)
+    return record
+
+
+def emit(record: Dict[str, Any]) -> None:
+    """
+    Write an EMF record as its own log line (not through logging, whose prefix would
+    keep CloudWatch from parsing it)
+    """
+    sys.stdout.write(json.dumps(record, default=str) + '\n')
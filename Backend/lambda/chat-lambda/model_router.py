@@ -0,0 +1,82 @@
+"""
+Model Router
+Sends simple questions to a faster, cheaper model with a tighter max_tokens and keeps the
+large model for everything else. A question is simple when it is short and single-part,
+asks for a fact rather than an explanation or comparison, and the knowledge base found a
+chunk that clearly matches it. Anything uncertain goes to the large model.
+
+Per-route generation latency is tracked per container so the effect of routing shows up
+in the response metadata.
+"""
+
+import re
+from collections import deque
+from typing import Dict, Any, Deque, List
+
+from retrieval_policy import SHORT_QUERY_WORDS
+
+# Retrieval score the best knowledge base result needs for a question to count as simple
+CONFIDENT_TOP_SCORE = 0.6
+
+# Questions asking for explanations, comparisons or procedures need the large model
+_COMPLEX_INTENT_PATTERN = re.compile(
+    r'\b(why|explain|compare|comparison|difference|differences|versus|vs|pros|cons|steps|process|'
+    r'impact|affect|affects|relationship|should i|por qué|porque|explica|explicar|compara|comparar|'
+    r'diferencia|diferencias|pasos|proceso|impacto|afecta|debería)\b',
+    re.IGNORECASE
+)
+
+# Latency samples kept per route
+LATENCY_WINDOW = 200
+
+
+def route_query(features: Dict[str, Any], query: str, top_score: float, retriever: str) -> Dict[str, Any]:
+    """
+    Classify a question as 'simple' or 'complex' from the retrieval plan features, its
+    intent keywords and the retrieval confidence. Returns the route and the reasons it
+    was not simple.
+    """
+    reasons: List[str] = []
+    if features.get('words', 0) > SHORT_QUERY_WORDS:
+        reasons.append('long')
+    if features.get('multiPart'):
+        reasons.append('multiPart')
+    if _COMPLEX_INTENT_PATTERN.search(query):
+        reasons.append('intent')
+    if retriever != 'knowledge_base':
+        # Lexical scores are relative to the best hit and say nothing about confidence
+        reasons.append('fallbackRetriever')
+    elif top_score < CONFIDENT_TOP_SCORE:
+        reasons.append('lowConfidence')
+
+    return {
+        'route': 'complex' if reasons else 'simple',
+        'reasons': reasons
+    }
+
+
+class RouteLatency:
+    """
+    Rolling window of generation latencies per route
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, route: str, latency_ms: float) -> None:
+        self._samples.setdefault(route, deque(maxlen=self.window)).append(latency_ms)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """
+        count, p50 and p95 in milliseconds per route, over the window
+        """
+        summary = {}
+        for route, samples in self._samples.items():
+            ordered = sorted(samples)
+            summary[route] = {
+                'count': len(ordered),
+                'p50Ms': round(ordered[len(ordered) // 2], 1),
+                'p95Ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1)
+            }
+        return summary
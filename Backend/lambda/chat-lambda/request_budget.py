@@ -0,0 +1,127 @@
+"""
+Request Budget
+Per-request deadline for the chat Lambda, split across the retrieve, generate and persist
+stages. The deadline is the Lambda's remaining time, capped by the API Gateway integration
+limit, minus a margin to build and return the response.
+
+Each stage may use whatever is left of the deadline except what is reserved for the stages
+after it, so time a fast retrieve does not use goes to generation. A stage that runs over
+raises StageTimeout and the caller degrades (lexical context, fallback answer, skipped
+retries) instead of letting the gateway time out with nothing to show.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, Any, Callable, List, Optional
+
+# Configure logging
+logger = logging.getLogger()
+
+# API Gateway closes the integration after 29 s, whatever the Lambda timeout
+API_GATEWAY_TIMEOUT_SECONDS = 29.0
+
+# Kept back from the budget to build, serialize and return the response
+RESPONSE_MARGIN_SECONDS = 1.0
+
+# Stages in request order and the fraction of the budget each one can count on
+STAGES = ('retrieve', 'generate', 'persist')
+STAGE_SHARES = {
+    'retrieve': 0.2,
+    'generate': 0.7,
+    'persist': 0.1,
+}
+
+# Runs calls that must give up after their stage timeout. An abandoned call keeps its worker
+# until the client's own read timeout ends it, so the pool is larger than one request needs.
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='stage')
+
+
+class StageTimeout(Exception):
+    """
+    A stage ran out of its share of the request budget
+    """
+
+    def __init__(self, stage: str, timeout: float):
+        super().__init__(f"{stage} exceeded its budget of {timeout * 1000:.0f} ms")
+        self.stage = stage
+        self.timeout = timeout
+
+
+class RequestBudget:
+    """
+    Deadline of one request and the time spent per stage
+    """
+
+    def __init__(self, remaining_ms: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        available = API_GATEWAY_TIMEOUT_SECONDS
+        if remaining_ms is not None:
+            available = min(available, remaining_ms / 1000.0)
+        self.total = max(available - RESPONSE_MARGIN_SECONDS, 0.0)
+        self._clock = clock
+        self.deadline = clock() + self.total
+        self.elapsed: Dict[str, float] = {}
+        self.exceeded: List[str] = []
+
+    @classmethod
+    def from_context(cls, context: Any) -> 'RequestBudget':
+        """
+        Budget from the Lambda context; the gateway limit alone when there is no context
+        (local runs, direct invocations from other code)
+        """
+        if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+            return cls(context.get_remaining_time_in_millis())
+        return cls()
+
+    def remaining(self) -> float:
+        """
+        Seconds left until the deadline
+        """
+        return max(self.deadline - self._clock(), 0.0)
+
+    def stage_timeout(self, stage: str) -> float:
+        """
+        Seconds the stage may still take: the remaining time less the shares of later stages
+        """
+        later = STAGES[STAGES.index(stage) + 1:]
+        reserved = sum(STAGE_SHARES[name] for name in later) * self.total
+        return max(self.remaining() - reserved, 0.0)
+
+    def record(self, stage: str, seconds: float, exceeded: bool = False) -> None:
+        self.elapsed[stage] = self.elapsed.get(stage, 0.0) + seconds
+        if exceeded and stage not in self.exceeded:
+            self.exceeded.append(stage)
+
+    def call(self, stage: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run fn within the stage's timeout. The call runs on a worker thread so the request can
+        move on when it overruns; the abandoned call finishes (or times out) in the background.
+        """
+        timeout = self.stage_timeout(stage)
+        started = self._clock()
+        if timeout <= 0:
+            self.record(stage, 0.0, exceeded=True)
+            raise StageTimeout(stage, timeout)
+
+        future = _executor.submit(fn, *args, **kwargs)
+        try:
+            result = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            self.record(stage, self._clock() - started, exceeded=True)
+            logger.warning(f"Stage {stage} exceeded its budget of {timeout * 1000:.0f} ms")
+            raise StageTimeout(stage, timeout)
+        except Exception:
+            self.record(stage, self._clock() - started)
+            raise
+        self.record(stage, self._clock() - started)
+        return result
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Budget and per-stage milliseconds for the response metadata
+        """
+        return {
+            'budgetMs': round(self.total * 1000),
+            'stagesMs': {stage: round(seconds * 1000, 1) for stage, seconds in self.elapsed.items()},
+            'exceeded': self.exceeded
+        }
@@ -0,0 +1,127 @@
+"""
+Reranker
+CPU-only reranking of retrieval results before context packing. Each result gets a
+combined score from its retrieval score, how much of the question it covers lexically,
+a prior for its source type, and a recency bonus for the daily-sync pages when the
+question is time-sensitive. Only the top results that score close enough to the best
+one are kept, so low-value chunks no longer take prompt tokens.
+
+Scoring stops when the per-request time budget (wall clock, so time the Lambda spends
+descheduled counts too) is spent; results not scored by then keep their retrieval order
+behind the scored ones. The packer keeps the returned order.
+"""
+
+import logging
+import re
+import time
+from typing import Dict, Any, List, Tuple
+
+from lexical_index import tokenize
+
+# Configure logging
+logger = logging.getLogger()
+
+# Weights of the combined score
+RETRIEVAL_WEIGHT = 0.55
+OVERLAP_WEIGHT = 0.35
+RECENCY_WEIGHT = 0.10
+
+# Multipliers per source type: curated PDFs are the most reliable, listing pages the least
+SOURCE_PRIORS = {
+    'pdf': 1.0,
+    'daily': 1.0,
+    'web': 0.95,
+    'listing': 0.8,
+}
+
+# Pages refreshed by the daily sync (data-sources/daily-sync.txt)
+DAILY_SYNC_PATHS = ('/for-donors/americas-blood-supply',)
+
+# Paginated listing pages mostly repeat teasers of articles indexed on their own
+_LISTING_PATTERN = re.compile(r'/page/\d+|/paged-\d+|[?&]page=\d+')
+
+# Questions about the current state of things favor the freshest content
+_TIME_SENSITIVE_PATTERN = re.compile(
+    r'\b(current|currently|today|now|latest|status|shortage|this week|actual|actualmente|hoy|ahora|estado)\b',
+    re.IGNORECASE
+)
+
+# Results scoring below this fraction of the best combined score are dropped
+MIN_RELATIVE_SCORE = 0.5
+
+
+def source_type(result: Dict[str, Any]) -> str:
+    """
+    Classify a retrieval result as pdf, daily, listing or web
+    """
+    location = result.get('location', {})
+    if 's3Location' in location:
+        return 'pdf'
+    url = location.get('webLocation', {}).get('url', '') or result.get('metadata', {}).get('source', '')
+    if any(path in url for path in DAILY_SYNC_PATHS):
+        return 'daily'
+    if _LISTING_PATTERN.search(url):
+        return 'listing'
+    return 'web'
+
+
+def lexical_overlap(query_terms: set, text: str) -> float:
+    """
+    Fraction of the question's terms found in the chunk. Substring containment is used
+    instead of tokenizing the chunk: it is far cheaper and also matches inflected forms
+    (donate / donated / donation).
+    """
+    if not query_terms:
+        return 0.0
+    folded = text.casefold()
+    return sum(1 for term in query_terms if term in folded) / len(query_terms)
+
+
+def rerank(query: str, results: List[Dict[str, Any]], top_k: int = 8,
+           budget_ms: float = 3.0) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Rerank retrieval results and cut them to the ones that matter.
+    Returns (results, stats); the results are the original dicts, reordered and trimmed.
+    """
+    started = time.perf_counter()
+    deadline = started + budget_ms / 1000.0
+
+    query_terms = set(tokenize(query))
+    time_sensitive = bool(_TIME_SENSITIVE_PATTERN.search(query))
+    best_retrieval = max((r.get('score', 0) for r in results), default=0) or 1.0
+
+    scored: List[Tuple[float, int]] = []
+    position = 0
+    for position, result in enumerate(results):
+        if time.perf_counter() > deadline:
+            break
+        kind = source_type(result)
+        score = (RETRIEVAL_WEIGHT * result.get('score', 0) / best_retrieval
+                 + OVERLAP_WEIGHT * lexical_overlap(query_terms, result.get('content', {}).get('text', '')))
+        if kind == 'daily' and time_sensitive:
+            score += RECENCY_WEIGHT
+        scored.append((score * SOURCE_PRIORS[kind], position))
+    else:
+        position = len(results)
+
+    budget_exhausted = position < len(results)
+    scored.sort(key=lambda item: item[0], reverse=True)
+
+    kept = []
+    if scored:
+        floor = scored[0][0] * MIN_RELATIVE_SCORE
+        kept = [results[i] for score, i in scored[:top_k] if score >= floor]
+    if budget_exhausted:
+        # Unscored results keep retrieval order behind the scored ones
+        kept.extend(results[position:position + max(top_k - len(kept), 0)])
+
+    stats = {
+        'inputResults': len(results),
+        'keptResults': len(kept),
+        'scoredResults': len(scored),
+        'budgetExhausted': budget_exhausted,
+        'elapsedMs': round((time.perf_counter() - started) * 1000, 3)
+    }
+    logger.info(f"Reranked {stats['scoredResults']}/{stats['inputResults']} results, kept {stats['keptResults']} "
+                f"({stats['elapsedMs']} ms)")
+    return kept, stats
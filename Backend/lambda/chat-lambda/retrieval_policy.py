@@ -0,0 +1,81 @@
+"""
+Retrieval Policy
+Chooses knowledge base retrieval depth and search type per query instead of always
+asking for 20 semantic results. Common short FAQ questions get a small first retrieval;
+the depth is only widened when the scores of that first retrieval are low or flat, i.e.
+when no chunk clearly answers the question.
+"""
+
+import re
+from typing import Dict, Any, List
+
+# First retrieval depth for short questions and for longer / multi-part questions
+INITIAL_RESULTS_SHORT = 6
+INITIAL_RESULTS_LONG = 10
+MAX_RESULTS = 20
+
+# A question with at most this many words counts as short
+SHORT_QUERY_WORDS = 12
+
+# Widen when the best score is below MIN_TOP_SCORE, or when the first and last scores of
+# the initial retrieval are within FLAT_SCORE_SPREAD of each other (relative to the best)
+MIN_TOP_SCORE = 0.45
+FLAT_SCORE_SPREAD = 0.08
+
+# Lexical signals that embeddings handle poorly: acronyms (IDA, FDA, MSM), hyphenated
+# terms (alpha-gal, COVID-19) and codes or numbers
+_ACRONYM_PATTERN = re.compile(r'\b[A-Z]{2,6}s?\b')
+_HYPHENATED_PATTERN = re.compile(r'\b\w+-\w+\b')
+_NUMBER_PATTERN = re.compile(r'\d')
+_WORD_PATTERN = re.compile(r'\w+')
+_MULTI_PART_PATTERN = re.compile(r'\?.+\?|\b(and|also|y|también)\b.*\?', re.IGNORECASE)
+
+# Domain terms that should always get lexical matching, whatever their casing
+_LEXICAL_TERMS = ('alpha-gal', 'alpha gal', 'ida', 'msm', 'hiv', 'prep', 'fda', 'nat', 'cjd', 'vcjd')
+
+
+def query_features(query: str) -> Dict[str, Any]:
+    """
+    Cheap features of the question used to plan the retrieval
+    """
+    words = _WORD_PATTERN.findall(query)
+    lowered = f" {query.casefold()} "
+    lexical_terms = [term for term in _LEXICAL_TERMS if re.search(rf'\b{re.escape(term)}\b', lowered)]
+    return {
+        'words': len(words),
+        'acronyms': len(_ACRONYM_PATTERN.findall(query)),
+        'hyphenated': len(_HYPHENATED_PATTERN.findall(query)),
+        'hasNumbers': bool(_NUMBER_PATTERN.search(query)),
+        'lexicalTerms': len(lexical_terms),
+        'multiPart': bool(_MULTI_PART_PATTERN.search(query))
+    }
+
+
+def plan_retrieval(query: str) -> Dict[str, Any]:
+    """
+    Pick the initial numberOfResults and the search type for a question
+    """
+    features = query_features(query)
+    lexical = features['acronyms'] or features['hyphenated'] or features['lexicalTerms'] or features['hasNumbers']
+    short = features['words'] <= SHORT_QUERY_WORDS and not features['multiPart']
+
+    return {
+        'numberOfResults': INITIAL_RESULTS_SHORT if short else INITIAL_RESULTS_LONG,
+        'searchType': 'HYBRID' if lexical else 'SEMANTIC',
+        'features': features
+    }
+
+
+def should_widen(scores: List[float], requested: int) -> bool:
+    """
+    Decide from the initial retrieval whether a deeper retrieval is worth its cost.
+    A result set shorter than requested already holds everything the index had to offer.
+    """
+    if requested >= MAX_RESULTS or len(scores) < requested:
+        return False
+
+    ranked = sorted(scores, reverse=True)
+    top = ranked[0]
+    if top < MIN_TOP_SCORE:
+        return True
+    return (top - ranked[-1]) / top < FLAT_SCORE_SPREAD
@@ -0,0 +1,166 @@
+"""
+Session Memory
+Bounded multi-turn history for the chat Lambda. Earlier turns of a session are read with
+a Query on session-timestamp-index and kept per session in the warm container. Only the
+last few turns are sent verbatim; older turns are folded into a compact rolling summary
+with a fixed size cap, so the history part of the prompt stays flat as a conversation
+grows instead of growing with every turn.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+# Configure logging
+logger = logging.getLogger()
+
+SESSION_INDEX = 'session-timestamp-index'
+
+# Most recent turns sent verbatim; older turns only survive in the summary
+RECENT_TURNS = 3
+
+# Caps on what one turn and the rolling summary may contribute to the prompt
+TURN_ANSWER_CHARS = 600
+SUMMARY_QUESTION_CHARS = 160
+SUMMARY_MAX_CHARS = 1200
+
+# At most this many items are read when a session is loaded cold
+LOAD_LIMIT = 20
+
+
+def _clip(text: str, limit: int) -> str:
+    text = ' '.join((text or '').split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + '...'
+
+
+class SessionHistory:
+    """
+    History of one session: a rolling summary of older questions plus the recent turns
+    """
+    __slots__ = ('summary_lines', 'turns', 'last_timestamp', 'touched_at')
+
+    def __init__(self):
+        self.summary_lines: List[str] = []
+        self.turns: List[Dict[str, str]] = []
+        self.last_timestamp = ''
+        self.touched_at = time.time()
+
+    def add_turn(self, question: str, answer: str, timestamp: str) -> None:
+        """
+        Append a turn; the oldest recent turn is folded into the summary once there are too many
+        """
+        self.turns.append({
+            'question': _clip(question, TURN_ANSWER_CHARS),
+            'answer': _clip(answer, TURN_ANSWER_CHARS)
+        })
+        while len(self.turns) > RECENT_TURNS:
+            oldest = self.turns.pop(0)
+            self.summary_lines.append(f"- {_clip(oldest['question'], SUMMARY_QUESTION_CHARS)}")
+            while sum(len(line) + 1 for line in self.summary_lines) > SUMMARY_MAX_CHARS:
+                self.summary_lines.pop(0)
+        if timestamp > self.last_timestamp:
+            self.last_timestamp = timestamp
+
+    @property
+    def summary(self) -> str:
+        return '\n'.join(self.summary_lines)
+
+
+class SessionMemory:
+    """
+    Per-container LRU of session histories. A cached session is refreshed with a Query
+    for turns newer than the last one it holds, which usually returns nothing, so turns
+    answered by other containers are still picked up.
+    """
+
+    def __init__(self, table: Any, max_sessions: int = 512, idle_seconds: int = 1800):
+        self.table = table
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions: 'OrderedDict[str, SessionHistory]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _query_turns(self, session_id: str, after: Optional[str]) -> List[Dict[str, Any]]:
+        """
+        Read the latest turns of a session (optionally only those after a timestamp), oldest first
+        """
+        query_params = {
+            'IndexName': SESSION_INDEX,
+            'KeyConditionExpression': 'session_id = :sid',
+            'ExpressionAttributeValues': {':sid': session_id},
+            'ProjectionExpression': 'question, answer, #ts',
+            'ExpressionAttributeNames': {'#ts': 'timestamp'},
+            'ScanIndexForward': False,
+            'Limit': LOAD_LIMIT
+        }
+        if after:
+            query_params['KeyConditionExpression'] += ' AND #ts > :after'
+            query_params['ExpressionAttributeValues'][':after'] = after
+
+        items = self.table.query(**query_params).get('Items', [])
+        items.reverse()
+        return items
+
+    def load(self, session_id: str) -> SessionHistory:
+        """
+        Get the history of a session, reading from DynamoDB only what the container has not seen.
+        Errors leave the history as it was; a missing history only costs context, not the answer.
+        """
+        now = time.time()
+        with self._lock:
+            history = self._sessions.get(session_id)
+            if history and now - history.touched_at > self.idle_seconds:
+                history = None
+            if history is None:
+                history = SessionHistory()
+            self._sessions[session_id] = history
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+        if not self.table:
+            return history
+
+        try:
+            for item in self._query_turns(session_id, history.last_timestamp or None):
+                history.add_turn(item.get('question', ''), item.get('answer', ''), item.get('timestamp', ''))
+        except Exception as e:
+            logger.error(f"Could not load history for session {session_id}: {str(e)}")
+
+        history.touched_at = now
+        return history
+
+    def record(self, session_id: str, question: str, answer: str, timestamp: str) -> None:
+        """
+        Add the turn just answered, since it may reach the table only after the next request
+        """
+        with self._lock:
+            history = self._sessions.get(session_id)
+            if history is None:
+                # First turn of a new session: nothing older exists in the table
+                history = self._sessions[session_id] = SessionHistory()
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+        history.add_turn(question, answer, timestamp)
+        history.touched_at = time.time()
+
+
+def history_messages(history: Optional[SessionHistory], language: str) -> List[Dict[str, Any]]:
+    """
+    Prior turns as alternating user/assistant messages, led by the rolling summary when there is one
+    """
+    if not history or not history.turns:
+        return []
+
+    messages = []
+    for i, turn in enumerate(history.turns):
+        question = turn['question']
+        if i == 0 and history.summary_lines:
+            heading = ("Preguntas anteriores en esta conversación:" if language == 'es'
+                       else "Earlier questions in this conversation:")
+            question = f"{heading}\n{history.summary}\n\n{question}"
+        messages.append({"role": "user", "content": question})
+        messages.append({"role": "assistant", "content": turn['answer'] or '...'})
+    return messages
@@ -0,0 +1,189 @@
+"""
+Source Resolver
+Single-pass resolution of Bedrock retrieval results into deduplicated citation sources.
+Each distinct URL is normalized and parsed once (memoized per container, since the same
+knowledge base documents come back request after request) and duplicates are resolved
+through an index map, so a result set costs one sort plus O(n) work.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlparse
+
+# All pagination forms collapsed by normalize_paginated_url, in one precompiled pattern:
+# /paged-2/5/, /page/2/, /p2/ at the end of the path, and page/p query parameters
+_PAGINATION_PATTERN = re.compile(r'/paged-\d+/\d+/?$|/page/\d+/?$|/p\d+/?$|[?&]page=\d+|[?&]p=\d+')
+_PAGE_TITLE_PATTERN = re.compile(r'\s*-?\s*Page\s*\d+.*$', re.IGNORECASE)
+_DOCUMENT_PATTERN = re.compile(r'\.(?:pdf|docx|txt)', re.IGNORECASE)
+_MEANINGFUL_EXTENSIONS = ('.html', '.htm', '.php', '.aspx')
+
+_SECTION_TITLES = (
+    ('/news', "America's Blood Centers - News"),
+    ('/for-donors', "America's Blood Centers - For Donors"),
+    ('/one-pagers-faqs', "America's Blood Centers - FAQs"),
+    ('/newsroom', "America's Blood Centers - Newsroom"),
+)
+
+
+class Source:
+    """
+    Compact citation record; converted to the API dict shape with to_dict()
+    """
+    __slots__ = ('title', 'url', 'uri', 'type', 'score', 'key', 'is_s3')
+
+    def __init__(self, title: str, url: str, uri: str, source_type: str, score: float, key: str, is_s3: bool):
+        self.title = title
+        self.url = url
+        self.uri = uri
+        self.type = source_type
+        self.score = score
+        self.key = key
+        self.is_s3 = is_s3
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "title": self.title,
+            "url": self.url,
+            "uri": self.uri,
+            "type": self.type,
+            "score": self.score
+        }
+
+
+def normalize_paginated_url(url: str) -> str:
+    """
+    Normalize paginated URLs to their base URL
+    Examples:
+    - https://americasblood.org/news/paged-2/5/ -> https://americasblood.org/news/
+    - https://americasblood.org/news/page/2/ -> https://americasblood.org/news/
+    - https://americasblood.org/category/updates/page/3/ -> https://americasblood.org/category/updates/
+    """
+    if not url:
+        return url
+
+    normalized_url = _PAGINATION_PATTERN.sub('', url).rstrip('/')
+
+    # If the URL doesn't end with a meaningful file, add trailing slash
+    if normalized_url and not normalized_url.endswith(_MEANINGFUL_EXTENSIONS):
+        normalized_url += '/'
+
+    return normalized_url
+
+
+def _section_title(path: str) -> Optional[str]:
+    """
+    Title for well-known site sections, based on the normalized URL path
+    """
+    for marker, title in _SECTION_TITLES:
+        if marker in path:
+            return title
+    return None
+
+
+def _strip_page_number(title: str) -> str:
+    """
+    Remove page numbers from titles of paginated pages
+    """
+    if title and 'Page' in title and any(char.isdigit() for char in title):
+        return _PAGE_TITLE_PATTERN.sub('', title).strip() or title
+    return title
+
+
+def _locate(result: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Find the source URL and a title for a retrieval result
+    """
+    location = result.get('location', {})
+    metadata = result.get('metadata', {})
+
+    if 's3Location' in location:
+        s3_uri = location['s3Location'].get('uri', '')
+        if s3_uri:
+            return s3_uri, s3_uri.rsplit('/', 1)[-1].replace('.pdf', '')
+    elif 'webLocation' in location:
+        web_url = location['webLocation'].get('url', '')
+        if web_url:
+            return web_url, metadata.get('title', metadata.get('source', 'Web Page'))
+
+    # Fallback: check metadata for source information
+    source_url = (metadata.get('x-amz-bedrock-kb-source-uri') or
+                  metadata.get('source') or
+                  metadata.get('uri') or
+                  metadata.get('url', ''))
+    if source_url and 's3://' in source_url:
+        return source_url, source_url.rsplit('/', 1)[-1].replace('.pdf', '')
+    return source_url, metadata.get('title', metadata.get('source', 'Document'))
+
+
+@lru_cache(maxsize=4096)
+def _analyze_url(source_url: str) -> Tuple[str, bool, str, bool, bool, Optional[str]]:
+    """
+    Everything about a source that depends only on its URL, computed with one regex pass
+    and one urlparse: (normalized_url, was_normalized, dedupe_key, is_document, is_s3, section_title).
+    The dedupe key is the filename for documents (S3 or presigned) and host + normalized
+    path for web pages.
+    """
+    normalized_url = normalize_paginated_url(source_url)
+    in_s3 = 's3://' in source_url
+    is_s3 = in_s3 or 'amazonaws.com' in normalized_url
+    is_document = in_s3 or _DOCUMENT_PATTERN.search(source_url) is not None
+
+    try:
+        parsed = urlparse(normalized_url)
+    except ValueError:
+        parsed = None
+
+    if in_s3:
+        key = source_url.rsplit('/', 1)[-1].lower()
+    elif is_s3:
+        key = normalized_url.rsplit('/', 1)[-1].split('?')[0].lower()
+    elif parsed is not None:
+        key = f"{parsed.netloc}{parsed.path}".lower().rstrip('/')
+    else:
+        key = normalized_url.lower()
+
+    section_title = _section_title(parsed.path.strip('/')) if parsed is not None else None
+    return normalized_url, normalized_url != source_url, key, is_document, is_s3, section_title
+
+
+def resolve_sources(context_results: List[Dict[str, Any]]) -> List[Source]:
+    """
+    Resolve retrieval results into unique sources, highest score first.
+
+    A document seen several times keeps its best-scoring entry, except that a public web
+    URL replaces an S3 copy of the same document in place. S3 sources keep their s3://
+    URI as url; signing is left to the caller so only surviving sources are signed.
+    """
+    unique: List[Source] = []
+    index_by_key: Dict[str, int] = {}
+
+    ranked = sorted(context_results, key=lambda r: r.get('score', 0), reverse=True)
+    for position, result in enumerate(ranked, 1):
+        source_url, source_title = _locate(result)
+        if not source_url:
+            continue
+
+        normalized_url, was_normalized, key, is_document, is_s3, section_title = _analyze_url(source_url)
+        if was_normalized:
+            source_title = section_title or _strip_page_number(source_title)
+
+        source = Source(
+            title=source_title or f"Source {position}",
+            url=source_url if source_url.startswith('s3://') else normalized_url,
+            uri=source_url,
+            source_type="DOCUMENT" if is_document else "WEB",
+            score=result.get('score', 0),
+            key=key,
+            is_s3=is_s3
+        )
+
+        existing_index = index_by_key.get(key)
+        if existing_index is None:
+            index_by_key[key] = len(unique)
+            unique.append(source)
+        elif not source.is_s3 and unique[existing_index].is_s3:
+            # Prefer public web URLs over S3 documents
+            unique[existing_index] = source
+
+    return unique
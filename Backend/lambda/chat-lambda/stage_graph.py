@@ -0,0 +1,70 @@
+"""
+Stage Graph
+Runs the independent steps of one chat request concurrently. The request thread keeps the
+critical path (retrieve, generate, respond) and hands side steps such as source
+extraction, presigning and persistence to a small thread pool; a step may wait for steps
+it depends on. A failing side step is isolated: its result becomes the fallback it was
+added with and the error is logged, so it never breaks the answer.
+"""
+
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Callable, Iterable, Optional
+
+from metrics import StageTimings
+
+# Configure logging
+logger = logging.getLogger()
+
+# Own pool: the request-budget and hedging pools block on model calls, and a side step must
+# never wait behind them. A request runs at most a few side steps at a time.
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='side')
+
+
+class StageGraph:
+    """
+    Side steps of one request, by name
+    """
+
+    def __init__(self, timings: Optional[StageTimings] = None):
+        self.timings = timings or StageTimings()
+        self._futures: Dict[str, Future] = {}
+        self._fallbacks: Dict[str, Any] = {}
+        self.failed: Dict[str, str] = {}
+
+    def add(self, name: str, fn: Callable[..., Any], *args, after: Iterable[str] = (),
+            fallback: Any = None, **kwargs) -> None:
+        """
+        Start fn(*args, **kwargs) once the steps in `after` have finished (whether or not
+        they failed). Its time is recorded as the stage `name`.
+        """
+        dependencies = [self._futures[dependency] for dependency in after]
+
+        def run() -> Any:
+            for dependency in dependencies:
+                dependency.exception()
+            with self.timings.span(name):
+                return fn(*args, **kwargs)
+
+        self._fallbacks[name] = fallback
+        self._futures[name] = _executor.submit(run)
+
+    def result(self, name: str, timeout: Optional[float] = None) -> Any:
+        """
+        Result of a step, waiting for it if needed; the fallback if it failed or did not
+        finish within timeout seconds
+        """
+        try:
+            return self._futures[name].result(timeout=timeout)
+        except Exception as e:
+            if name not in self.failed:
+                self.failed[name] = type(e).__name__
+                logger.error(f"Side step {name} failed, using its fallback: {str(e) or type(e).__name__}")
+            return self._fallbacks[name]
+
+    def join(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Wait for every step (Lambda freezes the container once the handler returns) and
+        return their results by name
+        """
+        return {name: self.result(name, timeout) for name in self._futures}
@@ -0,0 +1,273 @@
+"""
+Streaming Runtime
+Runtime loop of the streaming chat Lambda. The managed Python runtime only returns buffered
+responses, so stream-bootstrap (set as AWS_LAMBDA_EXEC_WRAPPER) starts this loop in its
+place. It takes invocations from the Lambda Runtime API and posts each response in streaming
+mode, which the function URL (InvokeMode RESPONSE_STREAM) passes on as it is written:
+
+    prelude   {"statusCode", "headers"} of the HTTP response, then 8 NUL bytes
+    delta     "event: delta" with {"text"} for each piece of the answer as the model writes it
+    done      "event: done" with the full chat payload: the markdown-processed message,
+              sources and metadata, which are only final once generation has finished
+
+A successful chat request always gets a text/event-stream response; the prelude goes out
+with the first delta, so a request rejected before generation (bad body, wrong method)
+still gets its status code and JSON body. Admin routes are only served through API Gateway,
+where they are authorized, never by this function's public URL.
+"""
+
+import base64
+import http.client
+import json
+import logging
+import os
+import sys
+import time
+import traceback
+from typing import Dict, Any, Callable, Tuple
+
+# Configure logging (the managed runtime that normally sets up the handler is not running)
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s]\t%(asctime)s\t%(message)s')
+logger = logging.getLogger()
+
+RUNTIME_API_VERSION = '2018-06-01'
+
+# Response body format of a streamed function URL response: JSON prelude, separator, body
+HTTP_INTEGRATION_CONTENT_TYPE = 'application/vnd.awslambda.http-integration-response'
+PRELUDE_SEPARATOR = b'\x00' * 8
+
+EVENT_STREAM_HEADERS = {
+    'Content-Type': 'text/event-stream',
+    'Cache-Control': 'no-cache',
+}
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+
+def format_sse_event(event_name: str, data: Dict[str, Any]) -> bytes:
+    """
+    Format a single server-sent event frame
+    """
+    return f"event: {event_name}\ndata: {json.dumps(data)}\n\n".encode('utf-8')
+
+
+def error_payload(error: Exception) -> Dict[str, Any]:
+    """
+    Runtime API error document
+    """
+    return {
+        'errorMessage': str(error),
+        'errorType': type(error).__name__,
+        'stackTrace': traceback.format_tb(error.__traceback__)
+    }
+
+
+class InvocationContext:
+    """
+    The parts of the Lambda context object the chat handler uses
+    """
+
+    def __init__(self, aws_request_id: str, deadline_ms: int, invoked_function_arn: str):
+        self.aws_request_id = aws_request_id
+        self.invoked_function_arn = invoked_function_arn
+        self.function_name = os.environ.get('AWS_LAMBDA_FUNCTION_NAME')
+        self.function_version = os.environ.get('AWS_LAMBDA_FUNCTION_VERSION')
+        self.memory_limit_in_mb = os.environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE')
+        self._deadline_ms = deadline_ms
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(int(self._deadline_ms - time.time() * 1000), 0)
+
+
+class ResponseStream:
+    """
+    Chunked, streaming-mode response of one invocation to the Runtime API
+    """
+
+    def __init__(self, connection: http.client.HTTPConnection, path: str):
+        connection.putrequest('POST', path, skip_accept_encoding=True)
+        connection.putheader('Lambda-Runtime-Function-Response-Mode', 'streaming')
+        connection.putheader('Transfer-Encoding', 'chunked')
+        connection.putheader('Content-Type', HTTP_INTEGRATION_CONTENT_TYPE)
+        connection.putheader('Trailer', 'Lambda-Runtime-Function-Error-Type, Lambda-Runtime-Function-Error-Body')
+        connection.endheaders()
+        self._connection = connection
+
+    def write(self, data: bytes) -> None:
+        if data:
+            self._connection.send(b'%X\r\n%s\r\n' % (len(data), data))
+
+    def close(self, error: Exception = None) -> None:
+        """
+        End the response; an error after the stream started is reported in the trailers
+        """
+        trailers = b''
+        if error is not None:
+            error_body = base64.b64encode(json.dumps(error_payload(error)).encode('utf-8')).decode('ascii')
+            trailers = (f"Lambda-Runtime-Function-Error-Type: {type(error).__name__}\r\n"
+                        f"Lambda-Runtime-Function-Error-Body: {error_body}\r\n").encode('utf-8')
+        self._connection.send(b'0\r\n' + trailers + b'\r\n')
+        self._connection.getresponse().read()
+        self._connection.close()
+
+
+class RuntimeClient:
+    """
+    Lambda Runtime API calls of the loop (one local connection per call)
+    """
+
+    def __init__(self, address: str):
+        host, _, port = address.partition(':')
+        self.host = host
+        self.port = int(port or 80)
+
+    def _connection(self) -> http.client.HTTPConnection:
+        return http.client.HTTPConnection(self.host, self.port)
+
+    def next_invocation(self) -> Tuple[Dict[str, Any], InvocationContext]:
+        """
+        Wait for the next event; returns it with its context
+        """
+        connection = self._connection()
+        connection.request('GET', f"/{RUNTIME_API_VERSION}/runtime/invocation/next")
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+
+        trace_id = response.getheader('Lambda-Runtime-Trace-Id')
+        if trace_id:
+            os.environ['_X_AMZN_TRACE_ID'] = trace_id
+        context = InvocationContext(
+            response.getheader('Lambda-Runtime-Aws-Request-Id'),
+            int(response.getheader('Lambda-Runtime-Deadline-Ms')),
+            response.getheader('Lambda-Runtime-Invoked-Function-Arn')
+        )
+        return json.loads(body), context
+
+    def open_response(self, request_id: str) -> ResponseStream:
+        return ResponseStream(self._connection(), f"/{RUNTIME_API_VERSION}/runtime/invocation/{request_id}/response")
+
+    def _post_error(self, path: str, error: Exception) -> None:
+        connection = self._connection()
+        connection.request('POST', path, json.dumps(error_payload(error)), {
+            'Content-Type': 'application/json',
+            'Lambda-Runtime-Function-Error-Type': 'Unhandled'
+        })
+        connection.getresponse().read()
+        connection.close()
+
+    def invocation_error(self, request_id: str, error: Exception) -> None:
+        self._post_error(f"/{RUNTIME_API_VERSION}/runtime/invocation/{request_id}/error", error)
+
+    def init_error(self, error: Exception) -> None:
+        self._post_error(f"/{RUNTIME_API_VERSION}/runtime/init/error", error)
+
+
+class EventStreamResponse:
+    """
+    HTTP response of one invocation; the prelude is sent with the first write
+    """
+
+    def __init__(self, runtime: RuntimeClient, request_id: str):
+        self._runtime = runtime
+        self._request_id = request_id
+        self._stream = None
+
+    @property
+    def started(self) -> bool:
+        return self._stream is not None
+
+    def _start(self, status_code: int, headers: Dict[str, str]) -> None:
+        self._stream = self._runtime.open_response(self._request_id)
+        prelude = json.dumps({'statusCode': status_code, 'headers': headers}).encode('utf-8')
+        self._stream.write(prelude + PRELUDE_SEPARATOR)
+
+    def delta(self, text: str) -> None:
+        """
+        Send one piece of the answer
+        """
+        if not self.started:
+            self._start(200, EVENT_STREAM_HEADERS)
+        self._stream.write(format_sse_event('delta', {'text': text}))
+
+    def finish(self, response: Dict[str, Any]) -> None:
+        """
+        End the stream with the handler's response: a 'done' event carrying the chat payload,
+        an 'error' event if the request failed after deltas were sent, or the plain response
+        if it failed before
+        """
+        status_code = response.get('statusCode', 200)
+        body = response.get('body') or '{}'
+        if status_code == 200:
+            if not self.started:
+                self._start(200, EVENT_STREAM_HEADERS)
+            self._stream.write(format_sse_event('done', json.loads(body)))
+        elif self.started:
+            self._stream.write(format_sse_event('error', json.loads(body)))
+        else:
+            self._start(status_code, {**(response.get('headers') or {}), **JSON_HEADERS})
+            self._stream.write(body.encode('utf-8'))
+        self._stream.close()
+
+    def send_json(self, status_code: int, payload: Dict[str, Any]) -> None:
+        """
+        Buffered JSON response (routes this function does not stream)
+        """
+        self._start(status_code, JSON_HEADERS)
+        self._stream.write(json.dumps(payload).encode('utf-8'))
+        self._stream.close()
+
+    def fail(self, error: Exception) -> None:
+        """
+        End a started stream after an unhandled error
+        """
+        self._stream.close(error)
+
+
+def handle_invocation(handler: Callable[..., Dict[str, Any]], event: Dict[str, Any],
+                      context: InvocationContext, response: EventStreamResponse) -> None:
+    """
+    Stream the answer to a chat request (function URL event); warm-up events are passed
+    through, anything else is refused
+    """
+    if event.get('warmup'):
+        response.send_json(200, handler(event, context))
+        return
+
+    http_context = event.get('requestContext', {}).get('http', {})
+    method = http_context.get('method')
+    path = event.get('rawPath') or http_context.get('path', '')
+    if method != 'POST' or '/admin/' in path:
+        response.send_json(404, {'error': 'Not found. The streaming endpoint only accepts chat requests (POST).',
+                                 'success': False})
+        return
+
+    if event.get('isBase64Encoded') and event.get('body'):
+        event = {**event, 'body': base64.b64decode(event['body']).decode('utf-8'), 'isBase64Encoded': False}
+    response.finish(handler(event, context, on_delta=response.delta))
+
+
+def main() -> None:
+    runtime = RuntimeClient(os.environ['AWS_LAMBDA_RUNTIME_API'])
+    try:
+        import lambda_function
+    except Exception as e:
+        logger.exception("Failed to initialize the chat handler")
+        runtime.init_error(e)
+        sys.exit(1)
+
+    while True:
+        event, context = runtime.next_invocation()
+        response = EventStreamResponse(runtime, context.aws_request_id)
+        try:
+            handle_invocation(lambda_function.lambda_handler, event, context, response)
+        except Exception as e:
+            logger.exception(f"Unhandled error in invocation {context.aws_request_id}")
+            if response.started:
+                response.fail(e)
+            else:
+                runtime.invocation_error(context.aws_request_id, e)
+
+
+if __name__ == '__main__':
+    main()
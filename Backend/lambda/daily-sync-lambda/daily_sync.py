@@ -9,6 +9,8 @@ import os
 import boto3
 from botocore.exceptions import ClientError
 from datetime import datetime
+from data_source_registry import registry_from_environment, DAILY
+import cache_generation
 
 # Configure logging
 logger = logging.getLogger()
@@ -16,10 +18,16 @@ logger.setLevel(logging.INFO)
 
 # Initialize AWS clients
 bedrock_agent = boto3.client('bedrock-agent')
+dynamodb = boto3.resource('dynamodb')
 
 # Environment variables
 KNOWLEDGE_BASE_ID = os.environ.get('KNOWLEDGE_BASE_ID')
-DAILY_SYNC_DATA_SOURCE_NAME = 'BloodCentersDailySync-v2'
+ANSWER_CACHE_TABLE = os.environ.get('ANSWER_CACHE_TABLE')
+
+# Data sources by role; the daily role is the BloodCentersDailySync crawler
+data_source_registry = registry_from_environment(
+    bedrock_agent, dynamodb.Table(ANSWER_CACHE_TABLE) if ANSWER_CACHE_TABLE else None
+)
 
 def lambda_handler(event, context):
     """
@@ -28,19 +36,16 @@ def lambda_handler(event, context):
     logger.info("Starting daily sync automation")
     
     try:
-        # Get the daily sync data source ID by name
-        daily_sync_data_source_id = get_data_source_id_by_name(
-            KNOWLEDGE_BASE_ID, 
-            DAILY_SYNC_DATA_SOURCE_NAME
-        )
+        # Get the daily sync data source ID from the registry
+        daily_sync_data_source_id = get_daily_sync_data_source_id()
         
         if not daily_sync_data_source_id:
-            logger.error(f"Daily sync data source '{DAILY_SYNC_DATA_SOURCE_NAME}' not found")
+            logger.error("Daily sync data source not found")
             return {
                 'statusCode': 404,
                 'body': json.dumps({
                     'success': False,
-                    'error': f'Data source {DAILY_SYNC_DATA_SOURCE_NAME} not found'
+                    'error': f"Data source {data_source_registry.role_names[DAILY]} not found"
                 })
             }
         
@@ -52,6 +57,7 @@ def lambda_handler(event, context):
         
         if ingestion_job_id:
             logger.info(f"Daily sync ingestion job started successfully: {ingestion_job_id}")
+            register_ingestion_job(daily_sync_data_source_id, ingestion_job_id)
             return {
                 'statusCode': 200,
                 'body': json.dumps({
@@ -64,6 +70,8 @@ def lambda_handler(event, context):
             }
         else:
             logger.error("Failed to start daily sync ingestion job")
+            # The cached ID may belong to a replaced data source; list again on the next run
+            data_source_registry.invalidate()
             return {
                 'statusCode': 500,
                 'body': json.dumps({
@@ -82,21 +90,17 @@ def lambda_handler(event, context):
             })
         }
 
-def get_data_source_id_by_name(knowledge_base_id, data_source_name):
+def get_daily_sync_data_source_id():
     """
-    Get data source ID by name
+    Get the ID of the data source with the daily role
     """
     try:
-        response = bedrock_agent.list_data_sources(
-            knowledgeBaseId=knowledge_base_id
-        )
+        data_source = data_source_registry.get(DAILY)
+        if data_source:
+            logger.info(f"Found data source '{data_source.name}' with ID: {data_source.data_source_id}")
+            return data_source.data_source_id
         
-        for data_source in response.get('dataSourceSummaries', []):
-            if data_source.get('name') == data_source_name:
-                logger.info(f"Found data source '{data_source_name}' with ID: {data_source['dataSourceId']}")
-                return data_source['dataSourceId']
-        
-        logger.warning(f"Data source '{data_source_name}' not found")
+        logger.warning("No data source with the daily role")
         return None
         
     except ClientError as e:
@@ -121,4 +125,16 @@ def start_daily_sync_ingestion(knowledge_base_id, data_source_id):
         
     except ClientError as e:
         logger.error(f"Error starting daily sync ingestion job: {str(e)}")
-        return None
\ No newline at end of file
+        return None
+
+def register_ingestion_job(data_source_id, ingestion_job_id):
+    """
+    Record the started ingestion job in the answer cache table. The chat Lambda polls
+    pending jobs and invalidates cached answers once the job completes.
+    """
+    if not ANSWER_CACHE_TABLE:
+        return
+    try:
+        cache_generation.register_ingestion_job(dynamodb.Table(ANSWER_CACHE_TABLE), data_source_id, ingestion_job_id)
+    except ClientError as e:
+        logger.error(f"Failed to register ingestion job with answer cache: {str(e)}")
@@ -0,0 +1,77 @@
+"""
+Cache Generation
+The answer cache generation protocol, shared by the chat, sync operations and daily sync
+Lambdas (deployed as a Lambda layer). One reserved item of the answer cache table holds
+the current generation and the set of in-flight ingestion jobs:
+
+    register   a Lambda that starts an ingestion job adds it to pending_jobs
+    complete   whichever Lambda first sees the job finish removes it and bumps the
+               generation, in one conditional update, so each job bumps it exactly once
+
+Cached answers are stamped with the generation they were computed under, so answers
+generated before a sync are never served after it. Every terminal job bumps the
+generation (a failed or stopped job may have ingested part of its documents); only a
+COMPLETE one also bumps content_generation, which the FAQ refresher uses to tell a sync
+that changed the knowledge base from one that failed.
+"""
+
+import logging
+from typing import Any, Optional
+
+# Configure logging
+logger = logging.getLogger()
+
+# Reserved item holding the current generation and the set of in-flight ingestion jobs
+GENERATION_KEY = '__generation__'
+TERMINAL_JOB_STATUSES = ('COMPLETE', 'FAILED', 'STOPPED')
+
+
+def make_job_ref(data_source_id: str, job_id: str) -> str:
+    """
+    Identify an ingestion job inside the pending_jobs string set
+    """
+    return f"{data_source_id}:{job_id}"
+
+
+def register_ingestion_job(table: Any, data_source_id: str, job_id: str) -> None:
+    """
+    Record a started ingestion job so its completion invalidates the cache
+    """
+    table.update_item(
+        Key={'cache_key': GENERATION_KEY},
+        UpdateExpression='ADD pending_jobs :job',
+        ExpressionAttributeValues={':job': {make_job_ref(data_source_id, job_id)}}
+    )
+
+
+def complete_ingestion_job(table: Any, data_source_id: str, job_id: str,
+                           status: str = 'COMPLETE') -> Optional[int]:
+    """
+    Remove a finished ingestion job and bump the cache generation (and, for a COMPLETE
+    job, the content generation).
+    The update is conditional so a job is only counted once, whichever Lambda notices it first.
+    Returns the new generation, or None if the job was already completed.
+    """
+    job_ref = make_job_ref(data_source_id, job_id)
+    counters = 'generation :one, content_generation :one' if status == 'COMPLETE' else 'generation :one'
+    try:
+        response = table.update_item(
+            Key={'cache_key': GENERATION_KEY},
+            UpdateExpression=f"ADD {counters} DELETE pending_jobs :job",
+            ConditionExpression='contains(pending_jobs, :job_ref)',
+            ExpressionAttributeValues={':one': 1, ':job': {job_ref}, ':job_ref': job_ref},
+            ReturnValues='UPDATED_NEW'
+        )
+        generation = int(response['Attributes']['generation'])
+        logger.info(f"Ingestion job {job_ref} ended {status}, answer cache generation is now {generation}")
+        return generation
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return None
+
+
+def read_content_generation(table: Any) -> int:
+    """
+    Number of ingestion jobs that completed successfully so far
+    """
+    item = table.get_item(Key={'cache_key': GENERATION_KEY}).get('Item') or {}
+    return int(item.get('content_generation', 0))
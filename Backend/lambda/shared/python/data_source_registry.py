@@ -0,0 +1,218 @@
+"""
+Data Source Registry
+Knowledge base data sources by role, shared by the chat, sync operations and daily sync
+Lambdas (deployed as a Lambda layer). The data sources are listed once, following
+nextToken through every page, and mapped to typed roles:
+
+    pdf    S3 documents (BloodCentersDocuments)
+    web    website crawler (BloodCentersWebsite)
+    daily  daily-sync crawler for frequently updated pages (BloodCentersDailySync)
+
+The listing is cached per container for ttl_seconds and, when a table is given, in one
+item of the answer cache table (cache_key 'registry#data_sources') so a cold container
+or another Lambda reuses it instead of calling the Bedrock control plane again.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Callable, List, Optional
+
+# Configure logging
+logger = logging.getLogger()
+
+REGISTRY_CACHE_KEY = 'registry#data_sources'
+
+PDF = 'pdf'
+WEB = 'web'
+DAILY = 'daily'
+ROLES = (PDF, WEB, DAILY)
+
+# Data source names as deployed by the CDK stack (overridable with DATA_SOURCE_NAMES)
+DEFAULT_ROLE_NAMES = {
+    PDF: 'BloodCentersDocuments',
+    WEB: 'BloodCentersWebsite',
+    DAILY: 'BloodCentersDailySync',
+}
+
+# Name fragments for data sources that do not carry their exact name (e.g. a renamed
+# '-v2' copy); checked in order, so the daily crawler is never taken for the website one
+_ROLE_NAME_FRAGMENTS = ((DAILY, 'DailySync'), (PDF, 'Documents'), (WEB, 'Website'))
+
+
+class DataSource:
+    """
+    One knowledge base data source and its role (None when it has none)
+    """
+    __slots__ = ('data_source_id', 'name', 'status', 'role')
+
+    def __init__(self, data_source_id: str, name: str, status: Optional[str] = None, role: Optional[str] = None):
+        self.data_source_id = data_source_id
+        self.name = name
+        self.status = status
+        self.role = role
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'dataSourceId': self.data_source_id,
+            'name': self.name,
+            'status': self.status,
+            'role': self.role
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'DataSource':
+        return cls(data['dataSourceId'], data.get('name', ''), data.get('status'), data.get('role'))
+
+
+def assign_roles(sources: List[DataSource], role_names: Dict[str, str]) -> None:
+    """
+    Give each role to the data source with its exact name, or else to the first one whose
+    name contains the role's fragment. A data source gets at most one role.
+    """
+    taken = set()
+    for role in ROLES:
+        for source in sources:
+            if source.name == role_names.get(role) and source.data_source_id not in taken:
+                source.role = role
+                taken.add(source.data_source_id)
+                break
+
+    assigned = {source.role for source in sources if source.role}
+    for role, fragment in _ROLE_NAME_FRAGMENTS:
+        if role in assigned:
+            continue
+        for source in sources:
+            if source.data_source_id not in taken and fragment in source.name:
+                logger.warning(f"Data source '{role_names.get(role)}' not found, using '{source.name}' as {role}")
+                source.role = role
+                taken.add(source.data_source_id)
+                assigned.add(role)
+                break
+
+
+class DataSourceRegistry:
+    """
+    Cached, paginated listing of a knowledge base's data sources
+    """
+
+    def __init__(self, bedrock_agent: Any, knowledge_base_id: str, table: Any = None,
+                 ttl_seconds: float = 300, role_names: Optional[Dict[str, str]] = None,
+                 clock: Callable[[], float] = time.time):
+        self.bedrock_agent = bedrock_agent
+        self.knowledge_base_id = knowledge_base_id
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.role_names = {**DEFAULT_ROLE_NAMES, **(role_names or {})}
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sources: Optional[List[DataSource]] = None
+        self._expires_at = 0.0
+
+    def _list_all(self) -> List[DataSource]:
+        """
+        Every data source of the knowledge base, page by page
+        """
+        sources = []
+        request = {'knowledgeBaseId': self.knowledge_base_id, 'maxResults': 100}
+        while True:
+            response = self.bedrock_agent.list_data_sources(**request)
+            for summary in response.get('dataSourceSummaries', []):
+                sources.append(DataSource(summary['dataSourceId'], summary.get('name', ''), summary.get('status')))
+            if not response.get('nextToken'):
+                break
+            request['nextToken'] = response['nextToken']
+
+        assign_roles(sources, self.role_names)
+        logger.info(f"Listed {len(sources)} data source(s): "
+                    f"{', '.join(f'{source.name}={source.role}' for source in sources)}")
+        return sources
+
+    def _read_shared(self, now: float) -> Optional[List[DataSource]]:
+        if not self.table:
+            return None
+        try:
+            item = self.table.get_item(Key={'cache_key': REGISTRY_CACHE_KEY}).get('Item')
+        except Exception as e:
+            logger.warning(f"Could not read the shared data source registry: {str(e)}")
+            return None
+        if not item or item.get('knowledge_base_id') != self.knowledge_base_id or int(item.get('expires_at', 0)) <= now:
+            return None
+        self._expires_at = float(item['expires_at'])
+        return [DataSource.from_dict(source) for source in item.get('sources', [])]
+
+    def _write_shared(self, sources: List[DataSource], now: float) -> None:
+        if not self.table:
+            return
+        try:
+            self.table.put_item(Item={
+                'cache_key': REGISTRY_CACHE_KEY,
+                'knowledge_base_id': self.knowledge_base_id,
+                'sources': [{key: value for key, value in source.to_dict().items() if value is not None}
+                            for source in sources],
+                'expires_at': int(now + self.ttl_seconds),
+                'ttl': int(now + self.ttl_seconds)
+            })
+        except Exception as e:
+            logger.warning(f"Could not share the data source registry: {str(e)}")
+
+    def all(self) -> List[DataSource]:
+        """
+        All data sources, from the container cache, the shared cache or a fresh listing
+        """
+        with self._lock:
+            now = self._clock()
+            if self._sources is not None and now < self._expires_at:
+                return self._sources
+
+            sources = self._read_shared(now)
+            if sources is None:
+                sources = self._list_all()
+                self._expires_at = now + self.ttl_seconds
+                self._write_shared(sources, now)
+            self._sources = sources
+            return sources
+
+    def get(self, role: str) -> Optional[DataSource]:
+        """
+        The data source with a role, or None
+        """
+        for source in self.all():
+            if source.role == role:
+                return source
+        return None
+
+    def by_roles(self, roles: List[str]) -> List[DataSource]:
+        """
+        The data sources of the given roles, in the order of the roles
+        """
+        return [source for source in (self.get(role) for role in roles) if source]
+
+    def invalidate(self) -> None:
+        """
+        Forget the cached listing (e.g. after a data source was not found)
+        """
+        with self._lock:
+            self._sources = None
+            self._expires_at = 0.0
+        if self.table:
+            try:
+                self.table.delete_item(Key={'cache_key': REGISTRY_CACHE_KEY})
+            except Exception as e:
+                logger.warning(f"Could not clear the shared data source registry: {str(e)}")
+
+
+def registry_from_environment(bedrock_agent: Any, table: Any = None) -> DataSourceRegistry:
+    """
+    Registry configured from KNOWLEDGE_BASE_ID, DATA_SOURCE_NAMES (JSON role -> name) and
+    DATA_SOURCE_CACHE_SECONDS
+    """
+    return DataSourceRegistry(
+        bedrock_agent,
+        os.environ.get('KNOWLEDGE_BASE_ID'),
+        table=table,
+        ttl_seconds=float(os.environ.get('DATA_SOURCE_CACHE_SECONDS', '300')),
+        role_names=json.loads(os.environ.get('DATA_SOURCE_NAMES') or '{}')
+    )
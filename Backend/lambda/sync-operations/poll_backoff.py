@@ -0,0 +1,110 @@
+"""
+Poll Backoff
+Recommends how long the sync workflow should wait before checking an ingestion job
+again, learned from how long earlier jobs of the same data source took.
+
+    with history     wait until the median duration of the recent completed jobs, then
+                     poll every BACKOFF_FACTOR of the elapsed time
+    without history  poll every COLD_BACKOFF_FACTOR of the elapsed time from the start
+
+Either way the wait stays between min_delay and max_delay seconds, so a 30-second daily
+sync is picked up within seconds and a long PDF job costs a handful of polls instead of
+one every two minutes. Durations come from ListIngestionJobs and are cached per data
+source; jobs the workflow sees finish are added to the cache right away.
+"""
+
+import logging
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+# Configure logging
+logger = logging.getLogger()
+
+# Share of the elapsed time to wait once a job runs past its expected duration; the
+# overshoot after completion is at most this share of the job's duration
+BACKOFF_FACTOR = 0.25
+
+# Share of the elapsed time to wait when nothing is known about the data source yet
+COLD_BACKOFF_FACTOR = 0.5
+
+# Completed jobs per data source the expected duration is taken from
+HISTORY_SIZE = 10
+
+
+class PollBackoff:
+    """
+    Next-poll delays for ingestion jobs, per data source
+    """
+
+    def __init__(self, bedrock_agent: Any, knowledge_base_id: str, min_delay: float = 15,
+                 max_delay: float = 600, cache_seconds: float = 3600,
+                 clock: Callable[[], float] = time.time):
+        self.bedrock_agent = bedrock_agent
+        self.knowledge_base_id = knowledge_base_id
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.cache_seconds = cache_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._durations: Dict[str, Deque[float]] = {}
+        self._loaded_at: Dict[str, float] = {}
+
+    def _load(self, data_source_id: str) -> Deque[float]:
+        """
+        Durations in seconds of the most recent completed jobs of a data source
+        """
+        durations: Deque[float] = deque(maxlen=HISTORY_SIZE)
+        try:
+            response = self.bedrock_agent.list_ingestion_jobs(
+                knowledgeBaseId=self.knowledge_base_id,
+                dataSourceId=data_source_id,
+                filters=[{'attribute': 'STATUS', 'operator': 'EQ', 'values': ['COMPLETE']}],
+                sortBy={'attribute': 'STARTED_AT', 'order': 'DESCENDING'},
+                maxResults=HISTORY_SIZE
+            )
+            for job in reversed(response.get('ingestionJobSummaries', [])):
+                if job.get('startedAt') and job.get('updatedAt'):
+                    durations.append((job['updatedAt'] - job['startedAt']).total_seconds())
+        except Exception as e:
+            logger.warning(f"Could not list past ingestion jobs of {data_source_id}: {str(e)}")
+        return durations
+
+    def _history(self, data_source_id: str) -> Deque[float]:
+        with self._lock:
+            now = self._clock()
+            if now - self._loaded_at.get(data_source_id, float('-inf')) >= self.cache_seconds:
+                self._durations[data_source_id] = self._load(data_source_id)
+                self._loaded_at[data_source_id] = now
+            return self._durations[data_source_id]
+
+    def expected_duration(self, data_source_id: str) -> Optional[float]:
+        """
+        Median duration of the recent completed jobs, or None without history
+        """
+        durations = self._history(data_source_id)
+        return statistics.median(durations) if durations else None
+
+    def record(self, data_source_id: str, duration: float) -> None:
+        """
+        Add the duration of a job that just completed
+        """
+        history = self._history(data_source_id)
+        with self._lock:
+            history.append(duration)
+
+    def next_delay(self, data_source_id: str, elapsed: float) -> int:
+        """
+        Whole seconds to wait before the next status check of a job running for `elapsed`
+        seconds (Step Functions waits take integer seconds)
+        """
+        expected = self.expected_duration(data_source_id)
+        if expected is None:
+            delay = elapsed * COLD_BACKOFF_FACTOR
+        elif expected - elapsed > self.min_delay:
+            delay = expected - elapsed
+        else:
+            delay = elapsed * BACKOFF_FACTOR
+        return int(round(min(max(delay, self.min_delay), self.max_delay)))
@@ -7,7 +7,10 @@ import json
 import logging
 import os
 import boto3
-from datetime import datetime
+from datetime import datetime, timezone
+from data_source_registry import registry_from_environment, ROLES
+import cache_generation
+from poll_backoff import PollBackoff
 
 # Configure logging
 logger = logging.getLogger()
@@ -15,9 +18,24 @@ logger.setLevel(logging.INFO)
 
 # Initialize AWS clients
 bedrock_agent = boto3.client('bedrock-agent')
+dynamodb = boto3.resource('dynamodb')
 
 # Environment variables
 KNOWLEDGE_BASE_ID = os.environ.get('KNOWLEDGE_BASE_ID')
+ANSWER_CACHE_TABLE = os.environ.get('ANSWER_CACHE_TABLE')
+
+answer_cache_table = dynamodb.Table(ANSWER_CACHE_TABLE) if ANSWER_CACHE_TABLE else None
+
+# Data sources by role (pdf/web/daily), cached across the start/check loop of a workflow
+data_source_registry = registry_from_environment(bedrock_agent, answer_cache_table)
+
+# Wait before the next status check, learned from past job durations per data source
+poll_backoff = PollBackoff(
+    bedrock_agent,
+    KNOWLEDGE_BASE_ID,
+    min_delay=float(os.environ.get('POLL_MIN_SECONDS', '15')),
+    max_delay=float(os.environ.get('POLL_MAX_SECONDS', '600'))
+)
 
 def lambda_handler(event, context):
     """
@@ -49,27 +67,12 @@ def start_sync_job(event):
     """
     source_type = event.get('source_type')  # 'pdf', 'daily', 'web'
     
-    # Get all data sources
-    data_sources = get_all_data_sources()
-    if not data_sources:
-        return {
-            'success': False,
-            'error': 'No data sources found'
-        }
-    
-    # Find the specific data source
-    target_source = None
-    for ds in data_sources:
-        name = ds.get('name', '')
-        if source_type == 'pdf' and 'Documents' in name:
-            target_source = ds
-            break
-        elif source_type == 'daily' and 'DailySync' in name:
-            target_source = ds
-            break
-        elif source_type == 'web' and 'Website' in name and 'DailySync' not in name:
-            target_source = ds
-            break
+    # Find the data source for the type
+    try:
+        target_source = data_source_registry.get(source_type)
+    except Exception as e:
+        logger.error(f"Error listing data sources: {str(e)}")
+        target_source = None
     
     if not target_source:
         return {
@@ -81,22 +84,34 @@ def start_sync_job(event):
         # Start the ingestion job
         response = bedrock_agent.start_ingestion_job(
             knowledgeBaseId=KNOWLEDGE_BASE_ID,
-            dataSourceId=target_source['dataSourceId'],
+            dataSourceId=target_source.data_source_id,
             description=f"Step Functions sync - {source_type} - {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')}"
         )
         
         job_id = response['ingestionJob']['ingestionJobId']
-        logger.info(f"Started sync job for {target_source['name']}: {job_id}")
+        logger.info(f"Started sync job for {target_source.name}: {job_id}")
+        register_ingestion_job(target_source.data_source_id, job_id)
         
         return {
             'success': True,
             'source_type': source_type,
-            'dataSourceName': target_source['name'],
-            'dataSourceId': target_source['dataSourceId'],
+            'dataSourceName': target_source.name,
+            'dataSourceId': target_source.data_source_id,
             'jobId': job_id,
-            'status': 'STARTED'
+            'status': 'STARTED',
+            'expectedSeconds': poll_backoff.expected_duration(target_source.data_source_id),
+            'nextPollSeconds': poll_backoff.next_delay(target_source.data_source_id, 0)
         }
         
+    except bedrock_agent.exceptions.ResourceNotFoundException as e:
+        # The cached data source is gone (e.g. replaced by a redeploy); list again next time
+        logger.error(f"Data source {target_source.name} not found: {str(e)}")
+        data_source_registry.invalidate()
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
     except Exception as e:
         logger.error(f"Failed to start sync job: {str(e)}")
         return {
@@ -106,7 +121,8 @@ def start_sync_job(event):
 
 def check_job_status(event):
     """
-    Check the status of a sync job
+    Check the status of a sync job. Returns the job's document statistics and, for the
+    workflow's next wait, the recommended seconds until the next check.
     """
     data_source_id = event.get('dataSourceId')
     job_id = event.get('jobId')
@@ -121,14 +137,26 @@ def check_job_status(event):
         
         job = response.get('ingestionJob', {})
         status = job.get('status', 'UNKNOWN')
+        is_complete = status in cache_generation.TERMINAL_JOB_STATUSES
+        started_at = job.get('startedAt')
+        elapsed = (datetime.now(timezone.utc) - started_at).total_seconds() if started_at else 0
+        
+        if is_complete:
+            complete_ingestion_job(data_source_id, job_id, status)
+            if status == 'COMPLETE' and started_at and job.get('updatedAt'):
+                poll_backoff.record(data_source_id, (job['updatedAt'] - started_at).total_seconds())
         
         return {
             'success': True,
             'source_type': source_type,
             'jobId': job_id,
             'status': status,
-            'isComplete': status in ['COMPLETE', 'FAILED', 'STOPPED'],
-            'isSuccess': status == 'COMPLETE'
+            'isComplete': is_complete,
+            'isSuccess': status == 'COMPLETE',
+            'statistics': summarize_statistics(job.get('statistics', {})),
+            'elapsedSeconds': int(elapsed),
+            'expectedSeconds': poll_backoff.expected_duration(data_source_id),
+            'nextPollSeconds': poll_backoff.next_delay(data_source_id, elapsed)
         }
         
     except Exception as e:
@@ -138,22 +166,27 @@ def check_job_status(event):
             'error': str(e)
         }
 
+def summarize_statistics(statistics):
+    """
+    Document counts of an ingestion job
+    """
+    return {
+        'scanned': statistics.get('numberOfDocumentsScanned', 0),
+        'indexed': statistics.get('numberOfNewDocumentsIndexed', 0) + statistics.get('numberOfModifiedDocumentsIndexed', 0),
+        'deleted': statistics.get('numberOfDocumentsDeleted', 0),
+        'failed': statistics.get('numberOfDocumentsFailed', 0)
+    }
+
 def list_data_sources():
     """
     List all available data sources
     """
     try:
-        data_sources = get_all_data_sources()
-        
         source_map = {}
-        for ds in data_sources:
-            name = ds.get('name', '')
-            if 'Documents' in name:
-                source_map['pdf'] = ds
-            elif 'Website' in name and 'DailySync' not in name:
-                source_map['web'] = ds
-            elif 'DailySync' in name:
-                source_map['daily'] = ds
+        for role in ROLES:
+            source = data_source_registry.get(role)
+            if source:
+                source_map[role] = source.to_dict()
         
         return {
             'success': True,
@@ -167,15 +200,25 @@ def list_data_sources():
             'error': str(e)
         }
 
-def get_all_data_sources():
+def register_ingestion_job(data_source_id, job_id):
     """
-    Get all data sources from the knowledge base
+    Record a started ingestion job so the chat answer cache is invalidated when it completes
     """
+    if not answer_cache_table:
+        return
     try:
-        response = bedrock_agent.list_data_sources(
-            knowledgeBaseId=KNOWLEDGE_BASE_ID
-        )
-        return response.get('dataSourceSummaries', [])
+        cache_generation.register_ingestion_job(answer_cache_table, data_source_id, job_id)
     except Exception as e:
-        logger.error(f"Error listing data sources: {str(e)}")
-        return []
\ No newline at end of file
+        logger.error(f"Failed to register ingestion job {job_id} with answer cache: {str(e)}")
+
+def complete_ingestion_job(data_source_id, job_id, status):
+    """
+    Bump the answer cache generation for a finished ingestion job (only once per job)
+    """
+    if not answer_cache_table:
+        return
+    try:
+        if cache_generation.complete_ingestion_job(answer_cache_table, data_source_id, job_id, status) is None:
+            logger.info(f"Answer cache already invalidated for ingestion job {job_id}")
+    except Exception as e:
+        logger.error(f"Failed to invalidate answer cache for ingestion job {job_id}: {str(e)}")
@@ -8,6 +8,8 @@ import * as targets from 'aws-cdk-lib/aws-events-targets';
 import * as s3deploy from 'aws-cdk-lib/aws-s3-deployment';
 import * as bedrock from 'aws-cdk-lib/aws-bedrock';
 import * as dynamodb from 'aws-cdk-lib/aws-dynamodb';
+import * as sqs from 'aws-cdk-lib/aws-sqs';
+import * as lambdaEventSources from 'aws-cdk-lib/aws-lambda-event-sources';
 import * as os from 'os';
 import * as cognito from 'aws-cdk-lib/aws-cognito';
 import * as stepfunctions from 'aws-cdk-lib/aws-stepfunctions';
@@ -139,6 +141,53 @@ export class BedrockChatbotStack extends cdk.Stack {
       sortKey: { name: 'timestamp', type: dynamodb.AttributeType.STRING },
     });
 
+    // Day + language partitions (date_language = "YYYY-MM-DD#en") so the admin
+    // language filter is a Query instead of a filtered read of every item
+    chatHistoryTable.addGlobalSecondaryIndex({
+      indexName: 'date-language-timestamp-index',
+      partitionKey: { name: 'date_language', type: dynamodb.AttributeType.STRING },
+      sortKey: { name: 'timestamp', type: dynamodb.AttributeType.STRING },
+    });
+
+    // ===== DynamoDB Table for Conversation Stats =====
+    // Per-day and per-day-per-language counters maintained as conversations are persisted
+    const conversationStatsTable = new dynamodb.Table(this, 'ConversationStatsTable', {
+      tableName: `${projectName}-conversation-stats-${this.account}-${this.region}`,
+      partitionKey: { name: 'stat_key', type: dynamodb.AttributeType.STRING },
+      billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
+      removalPolicy: cdk.RemovalPolicy.DESTROY,
+      timeToLiveAttribute: 'ttl',
+      pointInTimeRecovery: false, // Disabled for cost optimization
+    });
+
+    // ===== SQS Queue for Asynchronous Conversation Persistence =====
+    // The chat Lambda enqueues history items instead of writing them on the response path
+    const conversationDeadLetterQueue = new sqs.Queue(this, 'ConversationDeadLetterQueue', {
+      queueName: `${projectName}-conversation-dlq`,
+      retentionPeriod: cdk.Duration.days(14),
+    });
+
+    const conversationQueue = new sqs.Queue(this, 'ConversationQueue', {
+      queueName: `${projectName}-conversation-queue`,
+      visibilityTimeout: cdk.Duration.seconds(180), // 6x the writer timeout, as recommended for SQS sources
+      deadLetterQueue: {
+        queue: conversationDeadLetterQueue,
+        maxReceiveCount: 5,
+      },
+    });
+
+    // ===== DynamoDB Table for Answer Cache =====
+    // Shared tier of the chat answer cache. Also holds the cache generation record that
+    // the sync Lambdas bump when a knowledge base ingestion job completes.
+    const answerCacheTable = new dynamodb.Table(this, 'AnswerCacheTable', {
+      tableName: `${projectName}-answer-cache-${this.account}-${this.region}`,
+      partitionKey: { name: 'cache_key', type: dynamodb.AttributeType.STRING },
+      billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
+      removalPolicy: cdk.RemovalPolicy.DESTROY,
+      timeToLiveAttribute: 'ttl',
+      pointInTimeRecovery: false, // Cache data can always be regenerated
+    });
+
     // ===== Lambda Role for Chat Function =====
     const chatLambdaRole = new iam.Role(this, 'ChatLambdaRole', {
       assumedBy: new iam.ServicePrincipal('lambda.amazonaws.com'),
@@ -155,6 +204,8 @@ export class BedrockChatbotStack extends cdk.Stack {
               actions: [
                 'bedrock:InvokeModel',
                 'bedrock-runtime:InvokeModel',
+                'bedrock:InvokeModelWithResponseStream', // Streaming chat Lambda
+                'bedrock:CountTokens', // Warm-up invocations prime the connection without generating
               ],
               resources: [
                 `arn:aws:bedrock:${this.region}::foundation-model/${modelId}`,
@@ -636,26 +687,151 @@ export class BedrockChatbotStack extends cdk.Stack {
       })
     );
 
+    // ===== Shared Lambda Layer =====
+    // Modules used by more than one Lambda code asset (data source registry, cache generation)
+    const sharedLayer = new lambda.LayerVersion(this, 'SharedLambdaLayer', {
+      code: lambda.Code.fromAsset('lambda/shared'),
+      compatibleRuntimes: [lambda.Runtime.PYTHON_3_11],
+      description: 'Shared modules for the Blood Centers Lambdas',
+    });
+
+    // Data source names by role, so the Lambdas find them without guessing from names
+    const dataSourceNames = JSON.stringify({
+      pdf: dataSource.name,
+      web: webCrawlerDataSource.name,
+      daily: dailySyncDataSource.name,
+    });
+
     // ===== Chat Lambda Function =====
+    // Shared with the FAQ refresher, which runs the same answer pipeline offline
+    const chatLambdaEnvironment = {
+      KNOWLEDGE_BASE_ID: knowledgeBase.attrKnowledgeBaseId,
+      MODEL_ID: modelId,
+      EMBEDDING_MODEL_ID: embeddingModelId,
+      MAX_TOKENS: '1000', // Increased for better responses with Claude Sonnet
+      FAST_MODEL_ID: 'global.anthropic.claude-haiku-4-5-20251001-v1:0', // Simple questions (model_router.py)
+      FAST_MAX_TOKENS: '400',
+      TEMPERATURE: '0.1',
+      DOCUMENTS_BUCKET: documentsBucket.bucketName,
+      CHAT_HISTORY_TABLE: chatHistoryTable.tableName,
+      CONVERSATION_QUEUE_URL: conversationQueue.queueUrl,
+      CONVERSATION_STATS_TABLE: conversationStatsTable.tableName,
+      ANSWER_CACHE_TABLE: answerCacheTable.tableName,
+      ANSWER_CACHE_TTL_SECONDS: '86400',
+      CONTEXT_TOKEN_BUDGET: '3000', // Approximate prompt tokens for retrieved context
+      DATA_SOURCE_NAMES: dataSourceNames,
+    };
+
     const chatLambda = new lambda.Function(this, 'ChatLambdaFunction', {
       runtime: lambda.Runtime.PYTHON_3_11,
       handler: 'lambda_function.lambda_handler',
       code: lambda.Code.fromAsset('lambda/chat-lambda'),  // Use chat-lambda subdirectory in lambda folder
+      layers: [sharedLayer],
+      role: chatLambdaRole,
+      timeout: cdk.Duration.seconds(30),
+      memorySize: 512,
+      environment: chatLambdaEnvironment,
+      description: 'America\'s Blood Centers Bedrock Chat Handler',
+    });
+
+    // Keeps a chat container hot between bursts: {"warmup": true} builds the clients and
+    // opens their connections without calling the model
+    const chatWarmupRule = new events.Rule(this, 'ChatWarmupRule', {
+      ruleName: `${projectName}-chat-warmup-rule`,
+      description: 'Keeps the chat Lambda warm with warm-up invocations',
+      schedule: events.Schedule.rate(cdk.Duration.minutes(5)),
+      enabled: true,
+    });
+
+    chatWarmupRule.addTarget(new targets.LambdaFunction(chatLambda, {
+      event: events.RuleTargetInput.fromObject({ warmup: true }),
+    }));
+
+    // ===== Streaming Chat Lambda Function =====
+    // Same code and role as the chat Lambda, but answers stream to the browser as the model
+    // writes them. The managed Python runtime cannot stream, so stream-bootstrap replaces its
+    // runtime loop with stream_runtime.py, which posts responses in streaming mode; the
+    // function URL passes them on (API Gateway buffers whole responses).
+    const streamingChatLambda = new lambda.Function(this, 'StreamingChatLambdaFunction', {
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: 'lambda_function.lambda_handler', // Called by stream_runtime.py
+      code: lambda.Code.fromAsset('lambda/chat-lambda'),
+      layers: [sharedLayer],
       role: chatLambdaRole,
       timeout: cdk.Duration.seconds(30),
       memorySize: 512,
       environment: {
-        KNOWLEDGE_BASE_ID: knowledgeBase.attrKnowledgeBaseId,
-        MODEL_ID: modelId,
-        EMBEDDING_MODEL_ID: embeddingModelId,
-        MAX_TOKENS: '1000', // Increased for better responses with Claude Sonnet
-        TEMPERATURE: '0.1',
-        DOCUMENTS_BUCKET: documentsBucket.bucketName,
+        ...chatLambdaEnvironment,
+        AWS_LAMBDA_EXEC_WRAPPER: '/var/task/stream-bootstrap',
+      },
+      description: 'America\'s Blood Centers Bedrock Chat Handler (streamed answers)',
+    });
+
+    // Chat requests only: stream_runtime.py refuses admin routes, which stay behind API Gateway
+    const chatStreamUrl = streamingChatLambda.addFunctionUrl({
+      authType: lambda.FunctionUrlAuthType.NONE,
+      invokeMode: lambda.InvokeMode.RESPONSE_STREAM,
+      cors: {
+        allowedOrigins: ['*'],
+        allowedMethods: [lambda.HttpMethod.POST],
+        allowedHeaders: ['Content-Type'],
+        maxAge: cdk.Duration.hours(1),
+      },
+    });
+
+    chatWarmupRule.addTarget(new targets.LambdaFunction(streamingChatLambda, {
+      event: events.RuleTargetInput.fromObject({ warmup: true }),
+    }));
+
+    // ===== FAQ Refresher Lambda Function =====
+    // Regenerates the precomputed FAQ answers once the answer cache generation moves
+    // (i.e. after an ingestion job completed); a no-op run costs two DynamoDB reads
+    const faqRefresherLambda = new lambda.Function(this, 'FaqRefresherLambdaFunction', {
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: 'faq_refresher.lambda_handler',
+      code: lambda.Code.fromAsset('lambda/chat-lambda'),  // Reuses the chat answer pipeline
+      layers: [sharedLayer],
+      role: chatLambdaRole,
+      timeout: cdk.Duration.minutes(5),
+      memorySize: 512,
+      environment: chatLambdaEnvironment,
+      description: 'Regenerates precomputed answers for FAQ and frequent questions after ingestion',
+    });
+
+    const faqRefreshRule = new events.Rule(this, 'FaqRefreshRule', {
+      ruleName: `${projectName}-faq-refresh-rule`,
+      description: 'Regenerates precomputed FAQ answers when the knowledge base changed',
+      schedule: events.Schedule.rate(cdk.Duration.minutes(15)),
+      enabled: true,
+    });
+
+    faqRefreshRule.addTarget(new targets.LambdaFunction(faqRefresherLambda));
+
+    // ===== Conversation Writer Lambda Function =====
+    const conversationWriterLambda = new lambda.Function(this, 'ConversationWriterLambdaFunction', {
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: 'conversation_writer.lambda_handler',
+      code: lambda.Code.fromAsset('lambda/chat-lambda'),  // Shares the conversation stats module with the chat handler
+      timeout: cdk.Duration.seconds(30),
+      memorySize: 256,
+      environment: {
         CHAT_HISTORY_TABLE: chatHistoryTable.tableName,
+        CONVERSATION_STATS_TABLE: conversationStatsTable.tableName,
       },
-      description: 'America\'s Blood Centers Bedrock Chat Handler',
+      description: 'Batch-writes queued chat conversations to the chat history table',
     });
 
+    conversationWriterLambda.addEventSource(new lambdaEventSources.SqsEventSource(conversationQueue, {
+      batchSize: 25, // One BatchWriteItem call per SQS batch
+      maxBatchingWindow: cdk.Duration.seconds(5),
+      reportBatchItemFailures: true,
+    }));
+
+    chatHistoryTable.grantWriteData(conversationWriterLambda);
+    conversationStatsTable.grantReadWriteData(conversationWriterLambda);
+    conversationStatsTable.grantReadWriteData(chatLambda);
+    conversationQueue.grantSendMessages(chatLambda);
+
     // ===== Sync Operations Lambda Function =====
     const syncOperationsLambdaRole = new iam.Role(this, 'SyncOperationsLambdaRole', {
       assumedBy: new iam.ServicePrincipal('lambda.amazonaws.com'),
@@ -695,15 +871,21 @@ export class BedrockChatbotStack extends cdk.Stack {
       runtime: lambda.Runtime.PYTHON_3_11,
       handler: 'sync_operations.lambda_handler',
       code: lambda.Code.fromAsset('lambda/sync-operations'),
+      layers: [sharedLayer],
       role: syncOperationsLambdaRole,
       timeout: cdk.Duration.minutes(5), // Short timeout for simple operations
       memorySize: 256,
       environment: {
         KNOWLEDGE_BASE_ID: knowledgeBase.attrKnowledgeBaseId,
+        ANSWER_CACHE_TABLE: answerCacheTable.tableName,
+        DATA_SOURCE_NAMES: dataSourceNames,
       },
       description: 'Simple sync operations for Step Functions workflow',
     });
 
+    // Sync operations invalidate the chat answer cache when ingestion jobs complete
+    answerCacheTable.grantReadWriteData(syncOperationsLambda);
+
     // ===== Step Functions State Machine for Sequential Sync =====
     
     // Define Lambda tasks for Step Functions
@@ -756,13 +938,22 @@ export class BedrockChatbotStack extends cdk.Stack {
       resultPath: '$.websiteResult',
     });
 
-    // Define wait states
+    // Define wait states. The sync operations Lambda recommends each wait (nextPollSeconds),
+    // learned from how long past jobs of the data source took (poll_backoff.py)
+    const waitForPdfStart = new stepfunctions.Wait(this, 'WaitForPdfStart', {
+      time: stepfunctions.WaitTime.secondsPath('$.pdfResult.Payload.nextPollSeconds'),
+    });
+
     const waitForPdf = new stepfunctions.Wait(this, 'WaitForPdf', {
-      time: stepfunctions.WaitTime.duration(cdk.Duration.minutes(2)),
+      time: stepfunctions.WaitTime.secondsPath('$.pdfStatus.Payload.nextPollSeconds'),
+    });
+
+    const waitForDailyStart = new stepfunctions.Wait(this, 'WaitForDailyStart', {
+      time: stepfunctions.WaitTime.secondsPath('$.dailyResult.Payload.nextPollSeconds'),
     });
 
     const waitForDaily = new stepfunctions.Wait(this, 'WaitForDaily', {
-      time: stepfunctions.WaitTime.duration(cdk.Duration.minutes(2)),
+      time: stepfunctions.WaitTime.secondsPath('$.dailyStatus.Payload.nextPollSeconds'),
     });
 
     // Define success and failure states
@@ -775,15 +966,18 @@ export class BedrockChatbotStack extends cdk.Stack {
     });
 
     // Build the workflow
+    waitForPdf.next(checkPdfStatus);
+    waitForDaily.next(checkDailyStatus);
+
     const definition = startPdfSync
-      .next(waitForPdf)
+      .next(waitForPdfStart)
       .next(checkPdfStatus)
       .next(new stepfunctions.Choice(this, 'IsPdfComplete?')
         .when(stepfunctions.Condition.booleanEquals('$.pdfStatus.Payload.isComplete', true),
           new stepfunctions.Choice(this, 'IsPdfSuccess?')
             .when(stepfunctions.Condition.booleanEquals('$.pdfStatus.Payload.isSuccess', true),
               startDailySync
-                .next(waitForDaily)
+                .next(waitForDailyStart)
                 .next(checkDailyStatus)
                 .next(new stepfunctions.Choice(this, 'IsDailyComplete?')
                   .when(stepfunctions.Condition.booleanEquals('$.dailyStatus.Payload.isComplete', true),
@@ -847,15 +1041,21 @@ export class BedrockChatbotStack extends cdk.Stack {
       runtime: lambda.Runtime.PYTHON_3_11,
       handler: 'daily_sync.lambda_handler',
       code: lambda.Code.fromAsset('lambda/daily-sync-lambda'),  // Use daily-sync-lambda subdirectory in lambda folder
+      layers: [sharedLayer],
       role: dailySyncLambdaRole,
       timeout: cdk.Duration.seconds(60),
       memorySize: 256,
       environment: {
         KNOWLEDGE_BASE_ID: knowledgeBase.attrKnowledgeBaseId,
+        ANSWER_CACHE_TABLE: answerCacheTable.tableName,
+        DATA_SOURCE_NAMES: dataSourceNames,
       },
       description: 'Daily Sync Automation for Blood Centers Daily Data Source',
     });
 
+    // Daily sync registers its ingestion jobs so the chat answer cache is invalidated on completion
+    answerCacheTable.grantReadWriteData(dailySyncLambda);
+
     // ===== EventBridge Rule for Daily Sync =====
     const dailySyncRule = new events.Rule(this, 'DailySyncRule', {
       ruleName: `${projectName}-daily-sync-rule`,
@@ -955,6 +1155,7 @@ export class BedrockChatbotStack extends cdk.Stack {
     // Grant documents bucket access to chat Lambda only
     documentsBucket.grantReadWrite(chatLambda);
     supplementalBucket.grantReadWrite(chatLambda);
+    answerCacheTable.grantReadWriteData(chatLambda);
 
     // ===== Amplify App =====
     const amplifyApp = new amplify.App(this, 'AmplifyApp', {
@@ -963,6 +1164,7 @@ export class BedrockChatbotStack extends cdk.Stack {
       environmentVariables: {
         'REACT_APP_API_BASE_URL': api.url,
         'REACT_APP_CHAT_ENDPOINT': api.url,
+        'REACT_APP_CHAT_STREAM_URL': chatStreamUrl.url,
         'REACT_APP_HEALTH_ENDPOINT': api.url,
         'REACT_APP_USER_POOL_ID': adminUserPool.userPoolId,
         'REACT_APP_USER_POOL_CLIENT_ID': adminUserPoolClient.userPoolClientId,
@@ -990,6 +1192,7 @@ export class BedrockChatbotStack extends cdk.Stack {
       environmentVariables: {
         'REACT_APP_API_BASE_URL': api.url,
         'REACT_APP_CHAT_ENDPOINT': api.url,
+        'REACT_APP_CHAT_STREAM_URL': chatStreamUrl.url,
         'REACT_APP_HEALTH_ENDPOINT': api.url,
         'REACT_APP_USER_POOL_ID': adminUserPool.userPoolId,
         'REACT_APP_USER_POOL_CLIENT_ID': adminUserPoolClient.userPoolClientId,
@@ -1003,6 +1206,11 @@ export class BedrockChatbotStack extends cdk.Stack {
       description: 'Chat API Gateway URL',
     });
 
+    new cdk.CfnOutput(this, 'ChatStreamUrl', {
+      value: chatStreamUrl.url,
+      description: 'Function URL streaming chat answers as server-sent events',
+    });
+
     new cdk.CfnOutput(this, 'DocumentsBucketName', {
       value: documentsBucket.bucketName,
       description: 'S3 Documents Bucket Name',
@@ -1053,6 +1261,26 @@ export class BedrockChatbotStack extends cdk.Stack {
       description: 'Chat Lambda Function Name',
     });
 
+    new cdk.CfnOutput(this, 'StreamingChatLambdaFunctionName', {
+      value: streamingChatLambda.functionName,
+      description: 'Streaming Chat Lambda Function Name',
+    });
+
+    new cdk.CfnOutput(this, 'ConversationWriterLambdaFunctionName', {
+      value: conversationWriterLambda.functionName,
+      description: 'Conversation Writer Lambda Function Name',
+    });
+
+    new cdk.CfnOutput(this, 'FaqRefresherLambdaFunctionName', {
+      value: faqRefresherLambda.functionName,
+      description: 'FAQ Refresher Lambda Function Name',
+    });
+
+    new cdk.CfnOutput(this, 'ConversationDeadLetterQueueUrl', {
+      value: conversationDeadLetterQueue.queueUrl,
+      description: 'Dead-letter queue for conversations that could not be persisted',
+    });
+
     new cdk.CfnOutput(this, 'SequentialSyncStateMachineArn', {
       value: sequentialSyncStateMachine.stateMachineArn,
       description: 'Step Functions State Machine ARN for Sequential Sync',
@@ -0,0 +1,127 @@
+"""
+Backfill Chat History
+One-off backfill for conversations saved before the admin dashboard moved to the
+date-partitioned indexes and pre-aggregated stats:
+
+- sets date_language ("YYYY-MM-DD#<lang>") on chat history items that lack it, so
+  language-filtered /admin/conversations pages include them
+- with --stats-table, folds every stored conversation into the conversation stats;
+  conversations that were already counted carry a marker and are skipped
+
+Both steps leave already-backfilled items alone, so the script can be rerun safely.
+
+    python scripts/backfill_chat_history.py --table <ChatHistoryTableName> \\
+        [--stats-table <ConversationStatsTableName>] [--dry-run]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+
+import boto3
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'lambda', 'chat-lambda'))
+
+from conversation_pages import date_language_key  # noqa: E402
+from conversation_stats import record_conversations  # noqa: E402
+
+# Conversations folded into the stats per call
+STATS_BATCH_SIZE = 25
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger()
+
+
+def backfill_segment(table: Any, segment: int, total_segments: int, dry_run: bool) -> Dict[str, int]:
+    """
+    Scan one segment for items without date_language and set it
+    """
+    counts = {'scanned': 0, 'updated': 0}
+    scan_params = {
+        'Segment': segment,
+        'TotalSegments': total_segments,
+        'FilterExpression': 'attribute_not_exists(date_language) AND attribute_exists(#date)',
+        'ProjectionExpression': 'conversation_id, #ts, #date, #lang',
+        'ExpressionAttributeNames': {'#date': 'date', '#ts': 'timestamp', '#lang': 'language'}
+    }
+    while True:
+        response = table.scan(**scan_params)
+        counts['scanned'] += response.get('ScannedCount', 0)
+        for item in response.get('Items', []):
+            if not dry_run:
+                try:
+                    table.update_item(
+                        Key={'conversation_id': item['conversation_id'], 'timestamp': item['timestamp']},
+                        UpdateExpression='SET date_language = :dl',
+                        ConditionExpression='attribute_exists(conversation_id) AND attribute_not_exists(date_language)',
+                        ExpressionAttributeValues={':dl': date_language_key(item['date'], item.get('language', 'en'))}
+                    )
+                except table.meta.client.exceptions.ConditionalCheckFailedException:
+                    continue
+            counts['updated'] += 1
+        if 'LastEvaluatedKey' not in response:
+            return counts
+        scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def backfill_stats_segment(table: Any, stats_table: Any, segment: int, total_segments: int,
+                           dry_run: bool) -> Dict[str, int]:
+    """
+    Fold the unexpired conversations of one segment into the conversation stats
+    """
+    counts = {'scanned': 0, 'updated': 0}
+    now = int(time.time())
+    scan_params = {'Segment': segment, 'TotalSegments': total_segments}
+    while True:
+        response = table.scan(**scan_params)
+        counts['scanned'] += response.get('ScannedCount', 0)
+        # TTL deletion lags; expired conversations are no longer in the dashboard
+        items = [item for item in response.get('Items', []) if int(item.get('ttl', now + 1)) > now]
+        for start in range(0, len(items), STATS_BATCH_SIZE):
+            if not dry_run:
+                record_conversations(stats_table, items[start:start + STATS_BATCH_SIZE])
+        counts['updated'] += len(items)
+        if 'LastEvaluatedKey' not in response:
+            return counts
+        scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--table', default=os.environ.get('CHAT_HISTORY_TABLE', 'BloodCentersChatHistory'))
+    parser.add_argument('--stats-table', default=os.environ.get('CONVERSATION_STATS_TABLE'),
+                        help='also backfill the conversation stats in this table')
+    parser.add_argument('--segments', type=int, default=4, help='parallel scan segments')
+    parser.add_argument('--dry-run', action='store_true', help='count the items without updating them')
+    args = parser.parse_args()
+
+    dynamodb = boto3.resource('dynamodb')
+    table = dynamodb.Table(args.table)
+    action = 'would update' if args.dry_run else 'updated'
+
+    with ThreadPoolExecutor(max_workers=args.segments) as pool:
+        results = list(pool.map(lambda segment: backfill_segment(table, segment, args.segments, args.dry_run),
+                                range(args.segments)))
+    scanned = sum(result['scanned'] for result in results)
+    updated = sum(result['updated'] for result in results)
+    logger.info(f"Scanned {scanned} item(s), {action} {updated} without date_language")
+
+    if args.stats_table:
+        stats_table = dynamodb.Table(args.stats_table)
+        with ThreadPoolExecutor(max_workers=args.segments) as pool:
+            results = list(pool.map(
+                lambda segment: backfill_stats_segment(table, stats_table, segment, args.segments, args.dry_run),
+                range(args.segments)))
+        counted = sum(result['updated'] for result in results)
+        action = 'would fold' if args.dry_run else 'folded'
+        logger.info(f"{action.capitalize()} {counted} stored conversation(s) into {args.stats_table} "
+                    f"(already counted ones are skipped)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Build Lexical Index
+Builds the BM25 fallback index for the chat Lambda (lambda/chat-lambda/lexical_index.bin)
+from the PDFs in data-sources/pdfs and the pages listed in data-sources/daily-sync.txt.
+PDF text extraction needs pypdf (build-time only, not a Lambda dependency).
+
+    pip install pypdf
+    python scripts/build_lexical_index.py [--skip-web] [--output PATH]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import urllib.request
+from html.parser import HTMLParser
+from typing import Dict, Iterator, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHAT_LAMBDA_DIR = os.path.join(BACKEND_DIR, 'lambda', 'chat-lambda')
+sys.path.insert(0, CHAT_LAMBDA_DIR)
+
+from lexical_index import build_index  # noqa: E402
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger()
+
+PDF_DIR = os.path.join(BACKEND_DIR, 'data-sources', 'pdfs')
+DAILY_SYNC_URLS = os.path.join(BACKEND_DIR, 'data-sources', 'daily-sync.txt')
+DEFAULT_OUTPUT = os.path.join(CHAT_LAMBDA_DIR, 'lexical_index.bin')
+
+# Passage size and overlap in words, close to the knowledge base chunk size
+PASSAGE_WORDS = 200
+PASSAGE_OVERLAP = 40
+
+
+def passages(text: str) -> Iterator[str]:
+    """
+    Split a document into overlapping word windows
+    """
+    words = text.split()
+    step = PASSAGE_WORDS - PASSAGE_OVERLAP
+    for start in range(0, max(len(words) - PASSAGE_OVERLAP, 1), step):
+        window = words[start:start + PASSAGE_WORDS]
+        if window:
+            yield ' '.join(window)
+
+
+def pdf_documents() -> Iterator[Dict[str, str]]:
+    """
+    Passages of every PDF; uri is the key under the documents bucket (pdfs/<file>)
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        sys.exit("pypdf is required to build the index: pip install pypdf")
+
+    for name in sorted(os.listdir(PDF_DIR)):
+        if not name.lower().endswith('.pdf'):
+            continue
+        reader = PdfReader(os.path.join(PDF_DIR, name))
+        text = '\n'.join(page.extract_text() or '' for page in reader.pages)
+        count = 0
+        for passage in passages(text):
+            count += 1
+            yield {'uri': f"pdfs/{name}", 'title': name.replace('.pdf', ''), 'text': passage}
+        logger.info(f"{name}: {len(reader.pages)} pages, {count} passages")
+
+
+class _TextExtractor(HTMLParser):
+    """
+    Visible text and title of an HTML page
+    """
+    SKIPPED_TAGS = {'script', 'style', 'noscript', 'nav', 'footer', 'header', 'svg'}
+
+    def __init__(self):
+        super().__init__()
+        self.parts: List[str] = []
+        self.title = ''
+        self._skip_depth = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self._skip_depth += 1
+        self._in_title = tag == 'title'
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        self._in_title = False
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data.strip()
+        elif not self._skip_depth and data.strip():
+            self.parts.append(data.strip())
+
+
+def web_documents() -> Iterator[Dict[str, str]]:
+    """
+    Passages of the daily-sync pages, fetched live
+    """
+    with open(DAILY_SYNC_URLS) as f:
+        urls = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+    for url in urls:
+        try:
+            request = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0 (compatible; ABC-Chatbot-Indexer)'})
+            with urllib.request.urlopen(request, timeout=30) as response:
+                html = response.read().decode('utf-8', errors='replace')
+        except Exception as e:
+            logger.warning(f"Skipping {url}: {str(e)}")
+            continue
+
+        extractor = _TextExtractor()
+        extractor.feed(html)
+        count = 0
+        for passage in passages(' '.join(extractor.parts)):
+            count += 1
+            yield {'uri': url, 'title': extractor.title or url, 'text': passage}
+        logger.info(f"{url}: {count} passages")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--skip-web', action='store_true', help='index the PDFs only (no network access)')
+    args = parser.parse_args()
+
+    documents = list(pdf_documents())
+    if not args.skip_web:
+        documents.extend(web_documents())
+
+    stats = build_index(documents, args.output)
+    logger.info(f"Wrote {args.output}: {stats['documents']} passages, {stats['terms']} terms, "
+                f"{stats['bytes'] / 1024:.0f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+"""
+Test setup: the Lambda modules are imported the way the Lambda runtime does, from the
+chat Lambda code asset and the shared layer.
+"""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'lambda', 'shared', 'python'))
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'lambda', 'chat-lambda'))
@@ -0,0 +1,94 @@
+"""
+Circuit breaker tests against an in-memory stand-in for the answer cache table
+"""
+
+import circuit_breaker
+from circuit_breaker import CircuitBreaker, CLOSED, OPEN
+
+
+class ConditionalCheckFailedException(Exception):
+    pass
+
+
+class FakeTable:
+    """
+    Answer cache table holding breaker items; counts the calls per operation
+    """
+
+    class meta:
+        class client:
+            class exceptions:
+                ConditionalCheckFailedException = ConditionalCheckFailedException
+
+    def __init__(self):
+        self.items = {}
+        self.calls = {'get_item': 0, 'put_item': 0, 'update_item': 0}
+
+    def get_item(self, Key):
+        self.calls['get_item'] += 1
+        item = self.items.get(Key['cache_key'])
+        return {'Item': dict(item)} if item else {}
+
+    def put_item(self, Item):
+        self.calls['put_item'] += 1
+        self.items[Item['cache_key']] = dict(Item)
+
+    def update_item(self, Key, UpdateExpression, ConditionExpression, ExpressionAttributeValues):
+        self.calls['update_item'] += 1
+        item = self.items.setdefault(Key['cache_key'], dict(Key))
+        if item.get('probe_until', float('-inf')) >= ExpressionAttributeValues[':now']:
+            raise ConditionalCheckFailedException()
+        item['probe_until'] = ExpressionAttributeValues[':until']
+
+
+def drain():
+    # Wait for the background refreshes and publishes submitted so far
+    circuit_breaker._executor.submit(lambda: None).result()
+
+
+def make_breaker(table, now):
+    return CircuitBreaker('invoke_model', table, failure_threshold=1, cooldown_seconds=30,
+                          sync_seconds=5, clock=lambda: now[0])
+
+
+def test_lost_probe_claim_does_not_reclaim_on_every_call():
+    table = FakeTable()
+    now = [1000.0]
+    breaker = make_breaker(table, now)
+    breaker.record_failure()
+    drain()
+    assert breaker.state == OPEN
+
+    # Another container claimed the probe for the rest of the cooldown
+    table.items['breaker#invoke_model']['probe_until'] = 1100
+    now[0] = 1031.0
+    assert breaker.allow() is False
+    drain()
+    assert table.calls['update_item'] == 1
+
+    for _ in range(10):
+        assert breaker.allow() is False
+    drain()
+    assert table.calls['update_item'] == 1
+    assert table.calls['get_item'] <= 2
+
+    # After sync_seconds the container may try to claim again
+    now[0] += 5
+    breaker.allow()
+    drain()
+    assert table.calls['update_item'] == 2
+
+
+def test_won_probe_claim_closes_on_success():
+    table = FakeTable()
+    now = [1000.0]
+    breaker = make_breaker(table, now)
+    breaker.record_failure()
+    now[0] = 1031.0
+
+    assert breaker.allow() is True
+    assert breaker.allow() is False
+    breaker.record_success()
+    drain()
+    assert breaker.state == CLOSED
+    assert table.items['breaker#invoke_model']['state'] == CLOSED
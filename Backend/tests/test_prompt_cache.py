@@ -0,0 +1,74 @@
+"""
+Placement of the prompt-cache checkpoint in the model request body
+"""
+
+import os
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import lambda_function as chat  # noqa: E402
+from session_memory import SessionHistory  # noqa: E402
+
+SONNET = 'global.anthropic.claude-sonnet-4-5-20250929-v1:0'
+HAIKU = 'global.anthropic.claude-haiku-4-5-20251001-v1:0'
+
+# Three clipped turns come to ~600 estimated tokens, below the real Sonnet minimum; the
+# placement tests lower it so the prefix qualifies
+LOW_MINIMUM = {'claude-sonnet-4-5': 256, 'claude-haiku-4-5': 4096}
+
+
+def history_of(turns, answer_chars=600):
+    history = SessionHistory()
+    for i in range(turns):
+        history.add_turn(f"Question {i} about donating blood?", f"Answer {i} " + 'x' * answer_chars, f"t{i}")
+    return history
+
+
+def checkpoints(body):
+    """
+    (location, index) of every block carrying cache_control
+    """
+    found = [('system', i) for i, block in enumerate(body['system']) if 'cache_control' in block]
+    for i, message in enumerate(body['messages']):
+        if isinstance(message['content'], list):
+            found += [('messages', i) for block in message['content'] if 'cache_control' in block]
+    return found
+
+
+def test_short_prefix_has_no_checkpoint():
+    body = chat.build_request_body('How often can I donate?', 'context', 'en', model_id=SONNET)
+    assert checkpoints(body) == []
+
+
+def test_bounded_history_stays_below_the_sonnet_minimum():
+    body = chat.build_request_body('And platelets?', 'context', 'en', history_of(3), model_id=SONNET)
+    assert checkpoints(body) == []
+
+
+def test_checkpoint_follows_the_history(monkeypatch):
+    monkeypatch.setattr(chat, 'PROMPT_CACHE_MIN_TOKENS', LOW_MINIMUM)
+    body = chat.build_request_body('And platelets?', 'context', 'en', history_of(3), model_id=SONNET)
+    # Three turns of history: the last assistant turn is message 5, the new question message 6
+    assert checkpoints(body) == [('messages', 5)]
+    assert body['messages'][5]['role'] == 'assistant'
+    assert isinstance(body['messages'][6]['content'], str)
+    assert 'cache_control' not in body['system'][0]
+
+
+def test_checkpoint_respects_the_model_minimum(monkeypatch):
+    monkeypatch.setattr(chat, 'PROMPT_CACHE_MIN_TOKENS', LOW_MINIMUM)
+    body = chat.build_request_body('And platelets?', 'context', 'en', history_of(3), model_id=HAIKU)
+    assert checkpoints(body) == []
+
+
+def test_long_system_prefix_without_history_is_marked(monkeypatch):
+    monkeypatch.setitem(chat.SYSTEM_PROMPTS, 'en', 'Instructions. ' * 400)
+    body = chat.build_request_body('How often can I donate?', 'context', 'en', model_id=SONNET)
+    assert checkpoints(body) == [('system', 0)]
+
+
+def test_checkpoint_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(chat, 'PROMPT_CACHE_MIN_TOKENS', LOW_MINIMUM)
+    monkeypatch.setattr(chat, 'PROMPT_CACHE_ENABLED', False)
+    body = chat.build_request_body('And platelets?', 'context', 'en', history_of(3), model_id=SONNET)
+    assert checkpoints(body) == []
@@ -0,0 +1,114 @@
+"""
+Streamed generation against a stand-in for the Bedrock response stream
+"""
+
+import json
+import os
+import time
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import lambda_function as chat  # noqa: E402
+from request_budget import RequestBudget  # noqa: E402
+
+MODEL = 'global.anthropic.claude-haiku-4-5-20251001-v1:0'
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeEventStream:
+    """
+    Anthropic stream events as invoke_model_with_response_stream delivers them; before an
+    event, the clock moves to the time given for it
+    """
+
+    def __init__(self, payloads, clock=None, times=None):
+        self.payloads = payloads
+        self.clock = clock
+        self.times = times or {}
+        self.closed = False
+
+    def __iter__(self):
+        for index, payload in enumerate(self.payloads):
+            if self.closed:
+                return
+            if index in self.times:
+                self.clock.now = self.times[index]
+            yield {'chunk': {'bytes': json.dumps(payload).encode('utf-8')}}
+
+    def close(self):
+        self.closed = True
+
+
+class FakeBedrockRuntime:
+    def __init__(self, stream=None, error=None):
+        self.stream = stream
+        self.error = error
+        self.requests = []
+
+    def invoke_model_with_response_stream(self, **kwargs):
+        self.requests.append(kwargs)
+        if self.error:
+            raise self.error
+        return {'body': self.stream}
+
+
+def answer_events(*texts):
+    return ([{'type': 'message_start', 'message': {'usage': {'input_tokens': 900, 'output_tokens': 1}}}]
+            + [{'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'text_delta', 'text': text}}
+               for text in texts]
+            + [{'type': 'message_delta', 'delta': {'stop_reason': 'end_turn'}, 'usage': {'output_tokens': 12}},
+               {'type': 'message_stop'}])
+
+
+def test_deltas_reach_the_client_as_they_arrive(monkeypatch):
+    bedrock = FakeBedrockRuntime(FakeEventStream(answer_events('Yes, ', 'every 56 days.')))
+    monkeypatch.setattr(chat, 'bedrock_runtime', bedrock)
+    deltas = []
+
+    result = chat.generate_response_stream('How often can I donate?', 'context', 'en', deltas.append,
+                                           model_id=MODEL)
+
+    assert deltas == ['Yes, ', 'every 56 days.']
+    assert result['response'] == 'Yes, every 56 days.'
+    assert result['model_response']['stop_reason'] == 'end_turn'
+    assert result['usage']['inputTokens'] == 900
+    assert result['usage']['outputTokens'] == 12
+    assert json.loads(bedrock.requests[0]['body'])['messages'][-1]['role'] == 'user'
+    assert bedrock.requests[0]['modelId'] == MODEL
+
+
+def test_failure_before_any_text_falls_back(monkeypatch):
+    monkeypatch.setattr(chat, 'bedrock_runtime', FakeBedrockRuntime(error=RuntimeError('throttled')))
+    deltas = []
+
+    result = chat.generate_response_stream('How often can I donate?', 'context', 'en', deltas.append,
+                                           model_id=MODEL)
+
+    assert deltas == []
+    assert result['response'] == chat.get_fallback_response('en')
+    assert result['model_response'] is None
+
+
+def test_stream_is_cut_off_at_the_generate_budget(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, 'monotonic', clock)
+    budget = RequestBudget(remaining_ms=20000, clock=clock)
+    # The third event arrives after the generate stage's share of the budget has run out
+    stream = FakeEventStream(answer_events('Yes, ', 'every ', '56 days.'), clock, times={2: 18.0})
+    monkeypatch.setattr(chat, 'bedrock_runtime', FakeBedrockRuntime(stream))
+    deltas = []
+
+    result = chat.generate_response_stream('How often can I donate?', 'context', 'en', deltas.append,
+                                           budget=budget, model_id=MODEL)
+
+    assert deltas == ['Yes, ', 'every ']
+    assert stream.closed
+    assert result['response'] == 'Yes, every '
+    assert result['model_response'] is None
+    assert budget.exceeded == ['generate']
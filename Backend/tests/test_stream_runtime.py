@@ -0,0 +1,147 @@
+"""
+Streaming runtime loop against a local stand-in for the Lambda Runtime API
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import stream_runtime
+from stream_runtime import EventStreamResponse, RuntimeClient, handle_invocation, PRELUDE_SEPARATOR
+
+REQUEST_ID = 'req-1'
+
+
+class FakeRuntimeApi(BaseHTTPRequestHandler):
+    """
+    Serves one queued event and records the posted responses with their chunked bodies
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = json.dumps(self.server.next_event).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Lambda-Runtime-Aws-Request-Id', REQUEST_ID)
+        self.send_header('Lambda-Runtime-Deadline-Ms', str(self.server.deadline_ms))
+        self.send_header('Lambda-Runtime-Invoked-Function-Arn', 'arn:aws:lambda:us-east-1:123:function:stream')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body, trailers = b'', {}
+        if self.headers.get('Transfer-Encoding') == 'chunked':
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    break
+                body += self.rfile.read(size)
+                self.rfile.readline()
+            while True:
+                line = self.rfile.readline().strip()
+                if not line:
+                    break
+                name, _, value = line.decode('utf-8').partition(':')
+                trailers[name] = value.strip()
+        else:
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.posts.append({'path': self.path, 'headers': dict(self.headers), 'body': body,
+                                  'trailers': trailers})
+        self.send_response(202)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+@pytest.fixture
+def runtime_api():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeRuntimeApi)
+    server.posts = []
+    server.next_event = {}
+    server.deadline_ms = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def run(server, event, handler):
+    runtime = RuntimeClient(f"127.0.0.1:{server.server_address[1]}")
+    response = EventStreamResponse(runtime, REQUEST_ID)
+    handle_invocation(handler, event, None, response)
+    assert len(server.posts) == 1
+    return server.posts[0]
+
+
+def split_response(post):
+    """
+    (prelude, server-sent events) of a streamed response body
+    """
+    prelude, _, body = post['body'].partition(PRELUDE_SEPARATOR)
+    events = []
+    for frame in body.decode('utf-8').split('\n\n'):
+        if frame:
+            name_line, data_line = frame.split('\n')
+            events.append((name_line[len('event: '):], json.loads(data_line[len('data: '):])))
+    return json.loads(prelude), events
+
+
+def chat_event(body, method='POST', path='/'):
+    return {'rawPath': path, 'requestContext': {'http': {'method': method, 'path': path}}, 'body': json.dumps(body)}
+
+
+def test_answer_is_streamed_with_a_trailing_done_event(runtime_api):
+    payload = {'success': True, 'message': '**Yes**, you can donate.', 'sources': [{'title': 'Eligibility'}],
+               'metadata': {'model': 'haiku'}}
+
+    def handler(event, context, on_delta=None):
+        assert json.loads(event['body'])['message'] == 'Can I donate?'
+        on_delta('Yes, ')
+        on_delta('you can donate.')
+        return {'statusCode': 200, 'headers': {}, 'body': json.dumps(payload)}
+
+    post = run(runtime_api, chat_event({'message': 'Can I donate?'}), handler)
+
+    assert post['path'] == f"/2018-06-01/runtime/invocation/{REQUEST_ID}/response"
+    assert post['headers']['Lambda-Runtime-Function-Response-Mode'] == 'streaming'
+    assert post['headers']['Content-Type'] == stream_runtime.HTTP_INTEGRATION_CONTENT_TYPE
+    prelude, events = split_response(post)
+    assert prelude == {'statusCode': 200, 'headers': stream_runtime.EVENT_STREAM_HEADERS}
+    assert events == [('delta', {'text': 'Yes, '}), ('delta', {'text': 'you can donate.'}), ('done', payload)]
+
+
+def test_request_rejected_before_generation_keeps_its_status(runtime_api):
+    def handler(event, context, on_delta=None):
+        return {'statusCode': 400, 'headers': {}, 'body': json.dumps({'error': 'Message is required'})}
+
+    post = run(runtime_api, chat_event({'message': ''}), handler)
+
+    prelude, _, body = post['body'].partition(PRELUDE_SEPARATOR)
+    assert json.loads(prelude)['statusCode'] == 400
+    assert json.loads(body) == {'error': 'Message is required'}
+
+
+def test_admin_routes_are_not_served(runtime_api):
+    def handler(event, context, on_delta=None):
+        raise AssertionError('admin request reached the chat handler')
+
+    post = run(runtime_api, chat_event({}, path='/admin/conversations'), handler)
+
+    prelude, _, _ = post['body'].partition(PRELUDE_SEPARATOR)
+    assert json.loads(prelude)['statusCode'] == 404
+
+
+def test_next_invocation_builds_the_context(runtime_api):
+    runtime_api.next_event = chat_event({'message': 'hi'})
+    runtime_api.deadline_ms = 10 ** 15
+
+    event, context = RuntimeClient(f"127.0.0.1:{runtime_api.server_address[1]}").next_invocation()
+
+    assert event == runtime_api.next_event
+    assert context.aws_request_id == REQUEST_ID
+    assert context.get_remaining_time_in_millis() > 0
@@ -25,6 +25,7 @@ function ChatBody({ currentLanguage, toggleLanguage, showLeftNav, setLeftNav })
   const [messages, setMessages] = useState([])
   const [inputValue, setInputValue] = useState("")
   const [isLoading, setIsLoading] = useState(false)
+  const [sessionId, setSessionId] = useState(null)
   const messagesEndRef = useRef(null)
   const isSmallScreen = useMediaQuery("(max-width:600px)")
   const TEXT = getCurrentText(currentLanguage)
@@ -41,6 +42,75 @@ function ChatBody({ currentLanguage, toggleLanguage, showLeftNav, setLeftNav })
     scrollToBottom()
   }, [messages])
 
+  // Streams the answer from the chat function URL, passing each piece of text to onDelta.
+  // Resolves to the final payload (markdown message, sources, metadata) from the trailing
+  // "done" event, or to null when no streaming endpoint is configured.
+  const streamChat = async (requestBody, onDelta) => {
+    const streamUrl = process.env.REACT_APP_CHAT_STREAM_URL
+    if (!streamUrl) return null
+
+    const response = await fetch(streamUrl, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify(requestBody),
+    })
+
+    const contentType = response.headers.get("Content-Type") || ""
+    if (!response.ok || !response.body || !contentType.includes("text/event-stream")) {
+      throw new Error("Failed to get response")
+    }
+
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ""
+    while (true) {
+      const { value, done } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+
+      // Server-sent events are separated by a blank line
+      let boundary
+      while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+        const frame = buffer.slice(0, boundary)
+        buffer = buffer.slice(boundary + 2)
+        const eventName = frame.match(/^event: (.*)$/m)?.[1]
+        const data = frame.match(/^data: (.*)$/m)?.[1]
+        if (!eventName || data === undefined) continue
+
+        const payload = JSON.parse(data)
+        if (eventName === "delta") {
+          onDelta(payload.text)
+        } else if (eventName === "done") {
+          return payload
+        } else if (eventName === "error") {
+          throw new Error(payload.error || "Failed to get response")
+        }
+      }
+    }
+    throw new Error("Stream ended without an answer")
+  }
+
+  const postChat = async (requestBody) => {
+    // Replace with your actual API endpoint
+    const apiUrl = process.env.REACT_APP_API_BASE_URL || process.env.REACT_APP_CHAT_ENDPOINT
+
+    const response = await fetch(apiUrl, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify(requestBody),
+    })
+
+    if (!response.ok) {
+      throw new Error("Failed to get response")
+    }
+
+    return response.json()
+  }
+
   const handleSendMessage = async (messageText = null) => {
     const messageToSend = messageText || inputValue.trim()
     if (!messageToSend || isLoading) return
@@ -49,34 +119,47 @@ function ChatBody({ currentLanguage, toggleLanguage, showLeftNav, setLeftNav })
     setMessages(prev => [...prev, { type: "user", content: messageToSend }])
     setIsLoading(true)
 
-    try {
-      // Replace with your actual API endpoint
-      const apiUrl = process.env.REACT_APP_API_BASE_URL || process.env.REACT_APP_CHAT_ENDPOINT
-      
-      const response = await fetch(apiUrl, {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-        },
-        body: JSON.stringify({
-          message: messageToSend,
-          language: currentLanguage,
-        }),
-      })
+    const requestBody = {
+      message: messageToSend,
+      language: currentLanguage,
+      // Follow-up questions reuse the session so the backend can include earlier turns
+      ...(sessionId && { sessionId }),
+    }
 
-      if (!response.ok) {
-        throw new Error("Failed to get response")
+    try {
+      // Show the answer as it is generated; the final message replaces the streamed text
+      let streamedText = ""
+      let data = null
+      try {
+        data = await streamChat(requestBody, (text) => {
+          streamedText += text
+          setMessages(prev => {
+            const last = prev[prev.length - 1]
+            if (last && last.streaming) {
+              return [...prev.slice(0, -1), { ...last, content: streamedText }]
+            }
+            return [...prev, { type: "bot", content: streamedText, sources: [], streaming: true }]
+          })
+        })
+      } catch (error) {
+        // Nothing shown yet: ask the buffered endpoint instead
+        if (streamedText) throw error
+      }
+      if (!data) {
+        data = await postChat(requestBody)
       }
 
-      const data = await response.json()
+      if (data.sessionId) {
+        setSessionId(data.sessionId)
+      }
       
-      setMessages(prev => [...prev, { 
+      setMessages(prev => [...prev.filter(message => !message.streaming), { 
         type: "bot", 
         content: data.message || "I'm sorry, I couldn't process your request.",
         sources: data.sources || []
       }])
     } catch (error) {
-      setMessages(prev => [...prev, { 
+      setMessages(prev => [...prev.filter(message => !message.streaming), { 
         type: "bot", 
         content: "I'm sorry, there was an error processing your request. Please try again.",
         sources: []
@@ -278,8 +361,8 @@ function ChatBody({ currentLanguage, toggleLanguage, showLeftNav, setLeftNav })
                 </Box>
               ))}
 
-              {/* Loading Indicator */}
-              {isLoading && (
+              {/* Loading Indicator (until the answer starts streaming in) */}
+              {isLoading && !messages[messages.length - 1].streaming && (
                 <Box sx={{ display: "flex", justifyContent: "center", my: 2 }}>
                   <CircularProgress size={24} sx={{ color: PRIMARY_MAIN }} />
                 </Box>
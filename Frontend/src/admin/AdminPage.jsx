@@ -18,7 +18,6 @@ import {
   Chip,
   TextField,
   MenuItem,
-  Pagination,
   AppBar,
   Toolbar,
   Container,
@@ -46,7 +45,8 @@ const AdminPage = ({ onLogout }) => {
   // Chat history state
   const [conversations, setConversations] = useState([]);
   const [totalConversations, setTotalConversations] = useState(0);
-  const [totalPages, setTotalPages] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [prevCursor, setPrevCursor] = useState(null);
   const [currentPage, setCurrentPage] = useState(1);
   const [pageSize] = useState(10);
   const [dateFilter, setDateFilter] = useState('');
@@ -63,16 +63,16 @@ const AdminPage = ({ onLogout }) => {
   // Get API URL from environment
   const API_URL = process.env.REACT_APP_API_BASE_URL || process.env.REACT_APP_CHAT_ENDPOINT;
 
-  // Fetch chat history with page-based pagination
-  const fetchChatHistory = useCallback(async (page = 1, filters = {}) => {
+  // Fetch chat history with cursor-based pagination
+  const fetchChatHistory = useCallback(async (cursor = null, page = 1, filters = {}) => {
     setIsLoading(true);
     
     try {
       const queryParams = new URLSearchParams({
-        page: page.toString(),
         limit: pageSize.toString(),
         ...filters
       });
+      if (cursor) queryParams.set('cursor', cursor);
 
       const response = await fetch(`${API_URL}/admin/conversations?${queryParams}`, {
         method: 'GET',
@@ -88,8 +88,8 @@ const AdminPage = ({ onLogout }) => {
       const data = await response.json();
       
       setConversations(data.conversations || []);
-      setTotalConversations(data.total || 0);
-      setTotalPages(data.totalPages || 0);
+      setNextCursor(data.nextCursor || null);
+      setPrevCursor(data.prevCursor || null);
       setCurrentPage(page);
       
     } catch (error) {
@@ -99,23 +99,49 @@ const AdminPage = ({ onLogout }) => {
     }
   }, [API_URL, pageSize]);
 
+  // Fetch conversation totals from the pre-aggregated stats
+  const fetchConversationStats = useCallback(async (filters = {}) => {
+    try {
+      const queryParams = new URLSearchParams(filters);
+      const response = await fetch(`${API_URL}/admin/stats?${queryParams}`, {
+        method: 'GET',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+      });
+
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+
+      const data = await response.json();
+      setTotalConversations(data.totals?.conversations || 0);
+    } catch (error) {
+      setTotalConversations(0);
+    }
+  }, [API_URL]);
+
   // Load chat history when tab changes or filters change
   useEffect(() => {
     if (activeTab === 1) { // Chat History tab
       const filters = {};
       if (dateFilter) filters.date = dateFilter;
       if (languageFilter) filters.language = languageFilter;
-      fetchChatHistory(1, filters); // Always start from page 1 when filters change
-      setCurrentPage(1);
+      fetchChatHistory(null, 1, filters); // Always start from the newest page when filters change
+      fetchConversationStats(filters);
     }
-  }, [activeTab, dateFilter, languageFilter, fetchChatHistory]);
+  }, [activeTab, dateFilter, languageFilter, fetchChatHistory, fetchConversationStats]);
 
-  // Handle page change
-  const handlePageChange = (event, page) => {
+  // Handle page change (direction is 'next' or 'prev')
+  const handlePageChange = (direction) => {
     const filters = {};
     if (dateFilter) filters.date = dateFilter;
     if (languageFilter) filters.language = languageFilter;
-    fetchChatHistory(page, filters);
+    if (direction === 'next') {
+      fetchChatHistory(nextCursor, currentPage + 1, filters);
+    } else {
+      fetchChatHistory(prevCursor, currentPage - 1, filters);
+    }
   };
 
   const triggerDataSync = async (syncType, dataSourceType = null) => {
@@ -487,25 +513,35 @@ const AdminPage = ({ onLogout }) => {
             )}
 
             {/* Pagination */}
-            {totalPages > 1 && (
-              <Box sx={{ display: 'flex', justifyContent: 'center', mt: 3 }}>
-                <Pagination
-                  count={totalPages}
-                  page={currentPage}
-                  onChange={handlePageChange}
-                  color="primary"
-                  showFirstButton
-                  showLastButton
-                />
+            {(prevCursor || nextCursor) && (
+              <Box sx={{ display: 'flex', justifyContent: 'center', alignItems: 'center', gap: 2, mt: 3 }}>
+                <Button
+                  variant="outlined"
+                  onClick={() => handlePageChange('prev')}
+                  disabled={!prevCursor || isLoading}
+                >
+                  Previous
+                </Button>
+                <Typography variant="body2">
+                  Page {currentPage}
+                </Typography>
+                <Button
+                  variant="outlined"
+                  onClick={() => handlePageChange('next')}
+                  disabled={!nextCursor || isLoading}
+                >
+                  Next
+                </Button>
               </Box>
             )}
 
             {/* Summary */}
             <Box sx={{ mt: 2, textAlign: 'center' }}>
               <Typography variant="body2" color="textSecondary">
-                {totalConversations > 0 ? (
+                {conversations.length > 0 ? (
                   <>
-                    Showing {((currentPage - 1) * pageSize) + 1} to {Math.min(currentPage * pageSize, totalConversations)} of {totalConversations} conversations
+                    Showing {((currentPage - 1) * pageSize) + 1} to {((currentPage - 1) * pageSize) + conversations.length}
+                    {totalConversations > 0 && <> of {totalConversations}</>} conversations
                   </>
                 ) : (
                   'No conversations to display'